@@ -19,11 +19,58 @@ DB_CONFIG = {
     'ssl_ca': os.path.join(CURRENT_DIR, 'utils', os.getenv('DB_SSL_CA', 'ca.pem')),
     'ssl_verify': os.getenv('DB_SSL_VERIFY', 'true').lower() == 'true'
 }
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))  # Pooled connections shared by all sessions (max 32)
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))  # Seconds to wait for a free pooled connection
+STATS_CACHE_TTL = float(os.getenv('STATS_CACHE_TTL', '30'))  # Seconds the dashboard statistics are cached
 
 # API configuration
 API_KEY = os.getenv('DYNAMIC_MOCKUPS_API_KEY', '')
 API_URL = 'https://api.dynamicmockups.com/v1'
 
+# Mockup rendering configuration
+RENDER_MAX_WORKERS = int(os.getenv('RENDER_MAX_WORKERS', '6'))  # Renders in flight at once
+RENDER_REQUESTS_PER_SECOND = float(os.getenv('RENDER_REQUESTS_PER_SECOND', '4'))  # Per API host
+API_MAX_RETRIES = int(os.getenv('API_MAX_RETRIES', '3'))  # Retries after 429/5xx responses
+MOCKUP_CATALOG_TTL = float(os.getenv('MOCKUP_CATALOG_TTL', '600'))  # Seconds before the mockup catalog is refreshed
+MOCKUP_CATALOG_CACHE_FILE = os.getenv(
+    'MOCKUP_CATALOG_CACHE_FILE', os.path.join(CURRENT_DIR, '.cache', 'mockup_catalog.json')
+)  # On-disk copy of the catalog, survives restarts
+RENDER_CACHE_MAX_ENTRIES = int(os.getenv('RENDER_CACHE_MAX_ENTRIES', '2048'))  # In-memory render cache size
+
+# Local image cache configuration
+IMAGE_CACHE_DIR = os.getenv('IMAGE_CACHE_DIR', os.path.join(CURRENT_DIR, '.cache', 'images'))  # Local copies of S3 images
+IMAGE_CACHE_MAX_MB = int(os.getenv('IMAGE_CACHE_MAX_MB', '512'))  # Disk budget before least recently used images are evicted
+IMAGE_CACHE_REVALIDATE_SECONDS = float(os.getenv('IMAGE_CACHE_REVALIDATE_SECONDS', '300'))  # Serve without an ETag check for this long
+IMAGE_CACHE_MEMORY_ITEMS = int(os.getenv('IMAGE_CACHE_MEMORY_ITEMS', '16'))  # Decoded images kept in memory
+
+# Thumbnail configuration
+THUMBNAIL_WIDTHS = tuple(
+    int(width) for width in os.getenv('THUMBNAIL_WIDTHS', '96,300').split(',') if width.strip()
+)  # WebP thumbnail widths created next to every uploaded image, smallest first
+THUMBNAIL_MAX_WORKERS = int(os.getenv('THUMBNAIL_MAX_WORKERS', '2'))  # Background workers making thumbnails of copied images
+
+# S3 transfer configuration
+S3_MULTIPART_THRESHOLD_MB = int(os.getenv('S3_MULTIPART_THRESHOLD_MB', '16'))  # Uploads above this size go up in parts
+S3_MULTIPART_CHUNKSIZE_MB = int(os.getenv('S3_MULTIPART_CHUNKSIZE_MB', '16'))  # Part size of multipart uploads
+S3_UPLOAD_CONCURRENCY = int(os.getenv('S3_UPLOAD_CONCURRENCY', '16'))  # Parts in flight across all managed uploads
+S3_MAX_POOL_CONNECTIONS = int(os.getenv('S3_MAX_POOL_CONNECTIONS', '32'))  # HTTP connections kept by the shared S3 client
+TRANSFER_MAX_WORKERS = int(os.getenv('TRANSFER_MAX_WORKERS', '8'))  # Concurrent mockup downloads/uploads when saving
+TRANSFER_MAX_RETRIES = int(os.getenv('TRANSFER_MAX_RETRIES', '2'))  # Retries per mockup transfer
+
+# Export configuration
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '2000'))  # Rows fetched per chunk when streaming exports
+
+# FTP upload configuration
+FTP_BLOCKSIZE = int(os.getenv('FTP_BLOCKSIZE', str(256 * 1024)))  # Bytes per FTP data write
+FTP_MAX_RETRIES = int(os.getenv('FTP_MAX_RETRIES', '3'))  # Resume attempts after a dropped FTP upload
+
+# Shared HTTP client configuration
+HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', '10'))  # Number of hosts kept pooled
+HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '32'))  # Keep-alive connections per host
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '5'))
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', '60'))
+HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', '3'))  # Connection errors and 502/503/504 on GET/HEAD
+
 # Storage configuration - S3 is now primary method 
 IMAGES_DIR = 'images'  # Used only if S3 setup fails
 USE_S3_STORAGE = False 
@@ -13,6 +13,10 @@ cd "$APP_DIR" || { echo "App directory not found" >> $LOG_FILE; exit 1; }
 echo "Pulling latest changes..." >> $LOG_FILE
 git pull >> $LOG_FILE 2>&1
 
+# Apply database migrations
+echo "Applying database migrations..." >> $LOG_FILE
+(source venv/bin/activate && python -m utils.migrations) >> $LOG_FILE 2>&1 || { echo "Migrations failed" >> $LOG_FILE; exit 1; }
+
 # Kill existing app instances
 echo "Stopping existing app..." >> $LOG_FILE
 pkill -f "streamlit run app.py" || true
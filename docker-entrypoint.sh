@@ -39,5 +39,9 @@ sys.exit(1)
 # Check MySQL connection
 check_mysql
 
+# Bring the schema up to date before the app starts
+echo "Applying database migrations..."
+python -m utils.migrations
+
 # Execute the provided command
 exec "$@"
@@ -93,23 +93,45 @@ elif st.session_state.get("authentication_status") is True:
         </div>
         """, unsafe_allow_html=True)
 
+    # Generated product statistics
+    col1, col2, col3 = st.columns(3)
+
+    with col1:
+        st.markdown(f"""
+        <div class="stat-card">
+            <h1>{stats['generated_count']}</h1>
+            <p>Generated Products</p>
+        </div>
+        """, unsafe_allow_html=True)
+
+    with col2:
+        st.markdown(f"""
+        <div class="stat-card">
+            <h1>{stats['published_count']} / {stats['unpublished_count']}</h1>
+            <p>Published / Unpublished</p>
+        </div>
+        """, unsafe_allow_html=True)
+
+    with col3:
+        st.markdown(f"""
+        <div class="stat-card">
+            <h1>{stats['variants_per_parent']:.1f}</h1>
+            <p>Variants per Parent</p>
+        </div>
+        """, unsafe_allow_html=True)
+
     # Recent products
     st.subheader("Recent Products")
 
-    # Get recent products
-    products_df = db.get_all_products()
+    # Get the latest 5 products, selecting only the displayed columns
+    display_cols = ['id', 'product_name', 'item_sku', 'parent_child', 'price', 'created_at']
+    recent_products = db.query_frame('products', columns=display_cols, order_by=['created_at DESC'], limit=5)
 
-    if not products_df.empty:
-        # Display recent products (limited to latest 5)
-        recent_products = products_df.head(5)
-        
-        # Format the display columns
-        display_cols = ['id', 'product_name', 'item_sku', 'parent_child', 'price', 'created_at']
-        display_df = recent_products[display_cols].copy()
+    if not recent_products.empty:
+        display_df = recent_products.copy()
         
         # Format the created_at column to a nicer date format
-        if 'created_at' in display_df.columns:
-            display_df['created_at'] = pd.to_datetime(display_df['created_at']).dt.strftime('%Y-%m-%d %H:%M')
+        display_df['created_at'] = display_df['created_at'].dt.strftime('%Y-%m-%d %H:%M')
         
         # Style the dataframe
         st.dataframe(
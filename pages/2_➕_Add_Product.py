@@ -3,7 +3,7 @@ import json
 import random
 import string
 from utils.database import get_database_connection
-from utils.dynamic_mockups import get_mockups
+from utils.mockup_catalog import get_catalog, option_entry
 import yaml
 from yaml.loader import SafeLoader
 import streamlit_authenticator as stauth
@@ -128,14 +128,15 @@ elif st.session_state.get("authentication_status") is True:
             return False
         return prefix.isalpha()
 
-    # Function to generate final SKU based on prefix and product count
+    # Function to generate final SKU from the prefix's SKU sequence
     def generate_final_sku(prefix):
-        """Generate a SKU with format PREFIX-XXXX where XXXX is the product count padded to 4 digits"""
+        """Generate a SKU with format PREFIX-XXXX where XXXX is the next number reserved for the prefix"""
         db = get_database_connection()
         try:
-            product_count = db.get_product_count()  # Get current product count
-            product_count += 1  # Increment for the new product
-            padded_count = f"{product_count:04d}"  # Pad to 4 digits
+            numbers = db.allocate_sku_numbers(prefix.upper(), 1)  # Atomic across sessions
+            if not numbers:
+                return None
+            padded_count = f"{numbers[0]:04d}"  # Pad to 4 digits
             return f"{prefix.upper()}-{padded_count}"
         except Exception as e:
             st.error(f"Error generating SKU: {e}")
@@ -188,7 +189,7 @@ elif st.session_state.get("authentication_status") is True:
             st.session_state.mockup_ids = []
             for mockup in st.session_state.mockup_selections:
                 if mockup and mockup != "":
-                    st.session_state.mockup_ids.append(mockup_id_map.get(mockup, ""))
+                    st.session_state.mockup_ids.append(selected_mockup_id(mockup))
             
             if st.session_state.mockup_selections:
                 st.session_state.mockup_selection = st.session_state.mockup_selections[0]
@@ -205,34 +206,19 @@ elif st.session_state.get("authentication_status") is True:
             st.session_state.item_name = st.session_state.form_item_name
             update_sku()
 
-    # Fetch mockups from API
-    mockups = get_mockups()
-    print(f"Mockups fetched: {mockups}")
-
-    # Create descriptive options for the mockup selection
-    mockup_options = [""]
-    mockup_id_map = {}
-
-    for mockup in mockups:
-        print(f"Processing mockup: {mockup}")
-        mockup_name = mockup.get('name', 'Unnamed Mockup')
-        smart_objects_info = []
-        for so in mockup.get('smart_objects', []):
-            if 'Background' not in so.get('name', ''):
-                so_name = so.get('name', 'Unnamed')
-                option_text = f"{so_name} - {mockup_name}"
-                smart_objects_info.append(option_text)
-                mockup_options.append(option_text)
-                
-                mockup_id = mockup.get('id', mockup.get('uuid', ''))
-                print(f"Mapping '{option_text}' to ID: {mockup_id}")
-                mockup_id_map[option_text] = mockup_id
-        
-        if not smart_objects_info and 'Background' not in mockup_name:
-            option_text = f"No printable objects - {mockup_name}"
-            mockup_options.append(option_text)
-            mockup_id = mockup.get('id', mockup.get('uuid', ''))
-            mockup_id_map[option_text] = mockup_id
+    # Mockups come from the shared catalog cache instead of the API on every rerun;
+    # the picker options and their lookup index are built once per catalog version
+    try:
+        mockup_catalog = get_catalog()
+    except Exception as e:
+        st.error(f"Error fetching mockups: {e}")
+        mockup_catalog = {'version': 0, 'fetched_at': 0, 'mockups': [], 'options': [""], 'option_index': {}}
+    mockup_options = mockup_catalog['options']
+
+    def selected_mockup_id(option_text):
+        """Template UUID behind a picker option, empty when it is unknown"""
+        entry = option_entry(mockup_catalog, option_text)
+        return entry['mockup_id'] if entry else ""
 
     # Create a function to handle mockup selection outside the form
     def handle_mockup_selection():
@@ -353,7 +339,7 @@ elif st.session_state.get("authentication_status") is True:
         st.subheader("Selected Mockups")
         if st.session_state.mockup_selections:
             for i, mockup in enumerate(st.session_state.mockup_selections):
-                mockup_id = mockup_id_map.get(mockup, "")
+                mockup_id = selected_mockup_id(mockup)
                 st.text_input(
                     f"Mockup {i+1}: {mockup}",
                     value=mockup_id,
@@ -381,7 +367,7 @@ elif st.session_state.get("authentication_status") is True:
 
     # Update mockup selection
     if st.session_state.mockup_selection and st.session_state.mockup_selection != "":
-        current_mockup_id = mockup_id_map.get(st.session_state.mockup_selection, "")
+        current_mockup_id = selected_mockup_id(st.session_state.mockup_selection)
         if current_mockup_id != st.session_state.mockup_id:
             try:
                 st.session_state.mockup_id = current_mockup_id
@@ -433,22 +419,10 @@ elif st.session_state.get("authentication_status") is True:
                 smart_object_uuids = []
                 
                 for mockup_selection in st.session_state.mockup_selections:
-                    selected_mockup_id = mockup_id_map.get(mockup_selection, "")
-                    if " - " in mockup_selection:
-                        selected_mockup_name = mockup_selection.split(" - ")[0]
-                    else:
-                        selected_mockup_name = mockup_selection.split(",")[0] if "," in mockup_selection else mockup_selection
-                    
-                    for mockup in mockups:
-                        mockup_id = mockup.get('id', mockup.get('uuid', ''))
-                        if mockup_id == selected_mockup_id:
-                            for so in mockup.get('smart_objects', []):
-                                if 'Background' not in so.get('name', '') and so.get('name', '') == selected_mockup_name:
-                                    smart_object_uuids.append(so.get('uuid', None))
-                                    break
-                            break
-                    
-                    selected_mockup_ids.append(selected_mockup_id)
+                    entry = option_entry(mockup_catalog, mockup_selection)
+                    if entry and entry['smart_object_uuid'] is not None:
+                        smart_object_uuids.append(entry['smart_object_uuid'])
+                    selected_mockup_ids.append(entry['mockup_id'] if entry else "")
                 
                 mockup_ids_json = json.dumps(selected_mockup_ids)
                 smart_object_uuids_json = json.dumps(smart_object_uuids)
@@ -6,7 +6,9 @@ from PIL import Image
 import json
 from utils.api import is_s3_url
 from utils.s3_storage import get_image_from_s3_url
+from config import THUMBNAIL_WIDTHS
 from utils.color_utils import hex_to_color_name
+from utils.variants import expand_variants, expand_display_variants, first_mockup_urls, match_mockup_urls, marketplace_titles
 import yaml
 from yaml.loader import SafeLoader
 import streamlit_authenticator as stauth
@@ -85,19 +87,21 @@ elif st.session_state.get("authentication_status") is True:
         except Exception as e:
             return False, f"Failed to upload CSV file to FTP server: {e}"
 
-    # Get all products from database
-    products_df = db.get_all_products()
-    generated_products_df = db.get_all_generated_products()
+    def load_all_products():
+        """Load every regular and generated product (only needed for the full CSV export)"""
+        products_df = db.get_all_products()
+        generated_products_df = db.get_all_generated_products()
 
-    # Add a type column to distinguish between regular and generated products
-    if not products_df.empty:
-        products_df['product_type'] = 'Regular'
+        # Add a type column to distinguish between regular and generated products
+        if not products_df.empty:
+            products_df['product_type'] = 'Regular'
 
-    # Fix syntax error: Removed "if Indicators"
-    if not generated_products_df.empty:
-        generated_products_df['product_type'] = 'Generated'
-        if 'design_sku' in generated_products_df.columns:
-            generated_products_df = generated_products_df.rename(columns={'design_sku': 'item_sku'})
+        if not generated_products_df.empty:
+            generated_products_df['product_type'] = 'Generated'
+            if 'design_sku' in generated_products_df.columns:
+                generated_products_df = generated_products_df.rename(columns={'design_sku': 'item_sku'})
+
+        return products_df, generated_products_df
 
     # Handle delete confirmation modal
     if st.session_state.confirm_delete:
@@ -126,6 +130,7 @@ elif st.session_state.get("authentication_status") is True:
                 if success:
                     st.session_state.confirm_delete = False
                     st.session_state.product_to_delete = None
+                    st.session_state.page_cursors = {}
                     st.success("Product deleted successfully!")
                     st.rerun()
                 else:
@@ -259,18 +264,15 @@ elif st.session_state.get("authentication_status") is True:
             search_term = st.text_input("Search by name or SKU", "")
 
         with col2:
-            categories = []
-            if not products_df.empty and 'category' in products_df.columns:
-                categories.extend(products_df['category'].dropna().unique().tolist())
-            if not generated_products_df.empty and 'category' in generated_products_df.columns:
-                categories.extend(generated_products_df['category'].dropna().unique().tolist())
-            categories = ["All"] + list(set(categories))
+            categories = ["All"] + db.get_product_categories()
             category_filter = st.selectbox("Filter by category", categories)
 
         # Add CSV export button
         col1, col2 = st.columns([1, 3])
         with col1:
             if st.button("Generate CSV File for All Product"):
+                products_df, generated_products_df = load_all_products()
+
                 # Combine both DataFrames for CSV export to include regular products
                 filtered_df = pd.concat([products_df, generated_products_df], ignore_index=True)
 
@@ -280,127 +282,8 @@ elif st.session_state.get("authentication_status") is True:
                     if 'quantity' in filtered_df.columns:
                         filtered_df['quantity'] = pd.to_numeric(filtered_df['quantity'], errors='coerce').fillna(0).astype(int)
 
-                    def process_mockups_by_color(row_data):
-                        if 'mockup_urls' not in row_data or pd.isna(row_data['mockup_urls']) or not row_data['mockup_urls']:
-                            return [row_data]
-                        try:
-                            mockup_data = row_data['mockup_urls']
-                            if isinstance(mockup_data, str) and (mockup_data.startswith('[') or mockup_data.startswith('{')):
-                                mockup_json = json.loads(mockup_data)
-                                if isinstance(mockup_json, dict) and len(mockup_json) > 0:
-                                    result_rows = []
-                                    for color_code, mockup_url in mockup_json.items():
-                                        new_row = row_data.copy()
-                                        new_row['image_url'] = mockup_url
-                                        color_name = hex_to_color_name(color_code)
-                                        new_row['colour'] = color_name
-                                        new_row['color'] = color_name
-                                        new_row['original_hex'] = color_code.replace("#", "") if color_code.startswith("#") else color_code
-                                        result_rows.append(new_row)
-                                    return result_rows
-                                elif isinstance(mockup_json, list) and len(mockup_json) > 0:
-                                    row_data['image_url'] = mockup_json[0]
-                                    return [row_data]
-                        except Exception as e:
-                            print(f"Error processing mockups: {e}")
-                        return [row_data]
-
-                    parent_rows = []
-                    child_rows = []
-
-                    for idx, row in filtered_df.iterrows():
-                        product_row = row.copy()
-                        if 'parent_child' in product_row and product_row['parent_child'] == 'Parent':
-                            product_row['size'] = ''
-                            product_row['colour'] = ''
-                            product_row['color'] = ''
-                            if product_row.get('product_type') == 'Generated' and 'mockup_urls' in product_row and product_row['mockup_urls']:
-                                color_rows = process_mockups_by_color(product_row.to_dict())
-                                parent_rows.extend(color_rows)
-                            else:
-                                parent_rows.append(product_row.to_dict())
-                        else:
-                            sizes = []
-                            colors = []
-                            if 'size' in product_row and not pd.isna(product_row['size']) and product_row['size']:
-                                try:
-                                    if isinstance(product_row['size'], str) and (product_row['size'].startswith('[') or product_row['size'].startswith('{')):
-                                        size_data = json.loads(product_row['size'])
-                                        if isinstance(size_data, list):
-                                            if all(isinstance(item, dict) and 'name' in item for item in size_data):
-                                                sizes = [item['name'] for item in size_data]
-                                            else:
-                                                sizes = [str(s).strip('"\'') for s in size_data]
-                                        else:
-                                            sizes = [str(size_data)]
-                                    else:
-                                        sizes = [str(product_row['size'])]
-                                except:
-                                    sizes = [str(product_row['size'])]
-                            color_field = 'colour' if 'colour' in product_row and not pd.isna(product_row['colour']) else 'color'
-                            if color_field in product_row and not pd.isna(product_row[color_field]) and product_row[color_field]:
-                                try:
-                                    if isinstance(product_row[color_field], str) and (product_row[color_field].startswith('[') or product_row[color_field].startswith('{')):
-                                        color_data = json.loads(product_row[color_field])
-                                        if isinstance(color_data, list):
-                                            colors = [str(c).strip('"\'') for c in color_data]
-                                        else:
-                                            colors = [str(color_data)]
-                                    else:
-                                        colors = [str(product_row[color_field])]
-                                except:
-                                    colors = [str(product_row[color_field])]
-                            if product_row.get('product_type') == 'Generated' and 'mockup_urls' in product_row and product_row['mockup_urls']:
-                                base_rows = []
-                                if sizes:
-                                    for size in sizes:
-                                        size_row = product_row.copy()
-                                        size_row['size'] = size
-                                        base_rows.append(size_row.to_dict())
-                                else:
-                                    base_rows.append(product_row.to_dict())
-                                for base_row in base_rows:
-                                    color_rows = process_mockups_by_color(base_row)
-                                    child_rows.extend(color_rows)
-                            else:
-                                if sizes and colors:
-                                    for size in sizes:
-                                        for color in colors:
-                                            new_row = product_row.copy().to_dict()
-                                            new_row['size'] = size
-                                            new_row['colour'] = color
-                                            new_row['color'] = color
-                                            child_rows.append(new_row)
-                                elif sizes:
-                                    for size in sizes:
-                                        new_row = product_row.copy().to_dict()
-                                        new_row['size'] = size
-                                        child_rows.append(new_row)
-                                elif colors:
-                                    for color in colors:
-                                        new_row = product_row.copy().to_dict()
-                                        new_row['colour'] = color
-                                        new_row['color'] = color
-                                        child_rows.append(new_row)
-                                else:
-                                    child_rows.append(product_row.to_dict())
-
-                    export_rows = []
-                    for parent_row in parent_rows:
-                        parent_sku = parent_row.get('item_sku', '')
-                        matching_children = [child for child in child_rows if child.get('parent_sku', '') == parent_sku]
-                        # Sort matching children by item_sku from low to high
-                        matching_children = sorted(matching_children, key=lambda x: x.get('item_sku', ''))
-                        if matching_children:
-                            parent_row['product_name'] = matching_children[0].get('product_name', parent_row['product_name'])
-                        export_rows.append(parent_row)
-                        export_rows.extend(matching_children)
-                        child_rows = [child for child in child_rows if child.get('parent_sku', '') != parent_sku]
-                    # Sort remaining child rows by item_sku before adding them to export
-                    child_rows = sorted(child_rows, key=lambda x: x.get('item_sku', ''))
-                    export_rows.extend(child_rows)
-
-                    export_df = pd.DataFrame(export_rows)
+                    # Expand every product into its size/color variants, each parent followed by its children
+                    export_df = expand_variants(filtered_df)
                     required_fields = [
                         'product_name', 'item_sku', 'parent_child', 'parent_sku',
                         'size', 'color', 'image_url', 'market_place_title', 'category',
@@ -425,30 +308,13 @@ elif st.session_state.get("authentication_status") is True:
                         'tax_class': 'tax_class'
                     }
 
-                    def extract_first_mockup(mockup_data):
-                        if pd.isna(mockup_data) or not mockup_data:
-                            return ''
-                        try:
-                            if isinstance(mockup_data, str) and (mockup_data.startswith('[') or mockup_data.startswith('{')):
-                                data = json.loads(mockup_data)
-                                if isinstance(data, dict) and len(data) > 0:
-                                    first_color = list(data.keys())[0]
-                                    urls = data[first_color]
-                                    url_list = [url.strip() for url in urls.split(',')] if isinstance(urls, str) else [urls]
-                                    return url_list[0] if url_list else ''
-                                elif isinstance(data, list) and len(data) > 0:
-                                    return data[0]
-                            return mockup_data
-                        except:
-                            return ''
-
                     if 'mockup_urls' in export_df.columns and 'product_type' in export_df.columns:
                         mask_generated = export_df['product_type'] == 'Generated'
                         if 'image_url' not in export_df.columns:
                             export_df['image_url'] = ''
-                        for idx, row in export_df[mask_generated].iterrows():
-                            if not pd.isna(row.get('mockup_urls')) and row.get('mockup_urls'):
-                                export_df.at[idx, 'image_url'] = extract_first_mockup(row['mockup_urls'])
+                        mask_mockups = mask_generated & export_df['mockup_urls'].notna() & (export_df['mockup_urls'].astype(str) != '')
+                        if mask_mockups.any():
+                            export_df.loc[mask_mockups, 'image_url'] = first_mockup_urls(export_df.loc[mask_mockups, 'mockup_urls'])
 
                     standardized_df = pd.DataFrame()
                     for required_field in required_fields:
@@ -488,99 +354,34 @@ elif st.session_state.get("authentication_status") is True:
                             standardized_df.loc[mask_parent_generated, 'item_sku'] = ''
                             
                         # Ensure proper parent-child relationships for generated products
-                        if 'parent_id' in export_df.columns:
-                            for idx, row in standardized_df[mask_generated].iterrows():
-                                if idx in export_df.index and 'parent_id' in export_df.columns:
-                                    parent_id = export_df.loc[idx, 'parent_id']
-                                    if parent_id and not pd.isna(parent_id):
-                                        parent_product = products_df[products_df['id'] == parent_id]
-                                        if not parent_product.empty and 'item_sku' in parent_product.columns:
-                                            standardized_df.at[idx, 'parent_sku'] = parent_product.iloc[0]['item_sku']
-                            
-                        if 'marketplace_title' not in standardized_df.columns or standardized_df['market_place_title'].isna().any():
-                            if 'marketplace_title' not in standardized_df.columns:
-                                standardized_df['market_place_title'] = ''
-                            for idx, row in standardized_df[mask_generated].iterrows():
-                                product_name = row['product_name'] if not pd.isna(row['product_name']) else ''
-                                size = row['size'] if not pd.isna(row['size']) and row['size'] else ''
-                                color = row['color'] if not pd.isna(row['color']) and row['color'] else ''
-                                title_parts = [part for part in [product_name, size, color] if part]
-                                marketplace_title = ' - '.join(title_parts)
-                                standardized_df.at[idx, 'market_place_title'] = marketplace_title
+                        if 'parent_id' in export_df.columns and not products_df.empty and 'item_sku' in products_df.columns:
+                            parent_skus_by_id = products_df.drop_duplicates('id').set_index('id')['item_sku']
+                            parent_ids = export_df.loc[mask_generated, 'parent_id']
+                            parent_skus = parent_ids[parent_ids.notna() & (parent_ids != 0)].map(parent_skus_by_id).dropna()
+                            standardized_df.loc[parent_skus.index, 'parent_sku'] = parent_skus
+
+                        standardized_df['market_place_title'] = ''
+                        standardized_df.loc[mask_generated, 'market_place_title'] = marketplace_titles(standardized_df.loc[mask_generated])
                         if 'marketplace_title' in export_df.columns:
-                            for idx, row in standardized_df[mask_generated].iterrows():
-                                if idx in export_df.index and not pd.isna(export_df.at[idx, 'marketplace_title']) and export_df.at[idx, 'marketplace_title']:
-                                    standardized_df.at[idx, 'market_place_title'] = export_df.at[idx, 'marketplace_title']
-                        if 'image_url' in standardized_df.columns and 'color' in standardized_df.columns:
-                            for idx, row in standardized_df[mask_generated].iterrows():
-                                if pd.isna(row['color']) or not row['color']:
-                                    continue
-                                if idx in export_df.index and 'mockup_urls' in export_df.columns:
-                                    mockup_urls = export_df.at[idx, 'mockup_urls']
-                                    if pd.isna(mockup_urls) or not mockup_urls:
-                                        continue
-                                    try:
-                                        if isinstance(mockup_urls, str) and (mockup_urls.startswith('{') or mockup_urls.startswith('[')):
-                                            mockup_data = json.loads(mockup_urls)
-                                            if isinstance(mockup_data, dict):
-                                                color_val = row['color']
-                                                matched = False
-                                                if color_val in mockup_data:
-                                                    standardized_df.at[idx, 'image_url'] = mockup_data[color_val]
-                                                    matched = True
-                                                if not matched and not color_val.startswith('#'):
-                                                    hex_color = f"#{color_val}"
-                                                    if hex_color in mockup_data:
-                                                        standardized_df.at[idx, 'image_url'] = mockup_data[hex_color]
-                                                        matched = True
-                                                if not matched and color_val.startswith('#'):
-                                                    plain_color = color_val.replace('#', '')
-                                                    if plain_color in mockup_data:
-                                                        standardized_df.at[idx, 'image_url'] = mockup_data[plain_color]
-                                                        matched = True
-                                                if not matched:
-                                                    for key, url in mockup_data.items():
-                                                        if key.lower() == color_val.lower() or key.lower() == f"#{color_val.lower()}" or key.lower().replace('#', '') == color_val.lower().replace('#', ''):
-                                                            standardized_df.at[idx, 'image_url'] = url
-                                                            matched = True
-                                                            break
-                                                if not matched:
-                                                    color_name = row['color'].lower()
-                                                    for hex_code, url in mockup_data.items():
-                                                        mockup_color_name = hex_to_color_name(hex_code).lower()
-                                                        if mockup_color_name == color_name:
-                                                            standardized_df.at[idx, 'image_url'] = url
-                                                            matched = True
-                                                            break
-                                    except Exception as e:
-                                        print(f"Error matching mockup URL for color {row['color']}: {e}")
-                        if 'parent_id' in export_df.columns:
-                            for idx, row in standardized_df[mask_generated].iterrows():
-                                parent_id = export_df.loc[idx, 'parent_id'] if idx in export_df.index and 'parent_id' in export_df.columns else None
-                                if parent_id and not pd.isna(parent_id):
-                                    parent_product = products_df[products_df['id'] == parent_id]
-                                    if not parent_product.empty and 'item_sku' in parent_product.columns:
-                                        standardized_df.at[idx, 'parent_sku'] = parent_product.iloc[0]['item_sku']
-
-                    # After all rows are processed, inherit price, quantity and tax class from parents to children
-                    parent_data_cache = {}
-                    
-                    # First collect all parent data
-                    for idx, row in standardized_df.iterrows():
-                        if row['parent_child'] == 'Parent' and row['item_sku']:
-                            parent_data_cache[row['item_sku']] = {
-                                'price': row.get('price', 0.0),
-                                'quantity': row.get('quantity', 0),
-                                'tax_class': row.get('tax_class', '')
-                            }
-                    
-                    # Then update children with parent data
-                    for idx, row in standardized_df.iterrows():
-                        if row['parent_child'] == 'Child' and row['parent_sku'] and row['parent_sku'] in parent_data_cache:
-                            parent_data = parent_data_cache[row['parent_sku']]
-                            standardized_df.at[idx, 'price'] = parent_data['price']
-                            standardized_df.at[idx, 'quantity'] = parent_data['quantity']
-                            standardized_df.at[idx, 'tax_class'] = parent_data['tax_class']
+                            titles = export_df['marketplace_title']
+                            has_title = mask_generated & titles.notna() & (titles.astype(str) != '')
+                            standardized_df.loc[has_title, 'market_place_title'] = titles[has_title]
+
+                        # Point each color variant at the mockup for its color
+                        if 'mockup_urls' in export_df.columns:
+                            matched_urls = match_mockup_urls(
+                                standardized_df.loc[mask_generated, 'color'],
+                                export_df.loc[mask_generated, 'mockup_urls']
+                            ).dropna()
+                            standardized_df.loc[matched_urls.index, 'image_url'] = matched_urls
+
+                    # Children inherit price, quantity and tax class from their parent
+                    has_parent_sku = standardized_df['item_sku'].notna() & (standardized_df['item_sku'].astype(str) != '')
+                    parent_data = standardized_df[(standardized_df['parent_child'] == 'Parent') & has_parent_sku]
+                    parent_data = parent_data.drop_duplicates('item_sku', keep='last').set_index('item_sku')
+                    mask_children = (standardized_df['parent_child'] == 'Child') & standardized_df['parent_sku'].isin(parent_data.index)
+                    for column in ['price', 'quantity', 'tax_class']:
+                        standardized_df.loc[mask_children, column] = standardized_df.loc[mask_children, 'parent_sku'].map(parent_data[column])
 
                     column_order = required_fields + [col for col in standardized_df.columns if col not in required_fields]
                     st.session_state.export_csv_data = standardized_df[column_order].to_csv(index=False)
@@ -613,92 +414,67 @@ elif st.session_state.get("authentication_status") is True:
                 else:
                     st.error("No CSV data available to send. Please generate the CSV first.")
 
-        # Use only generated products for display
-        filtered_df = generated_products_df.copy()
+        # Reset pagination whenever the filters change
+        filter_key = (search_term, category_filter)
+        if st.session_state.get('product_list_filter') != filter_key:
+            st.session_state.product_list_filter = filter_key
+            st.session_state.current_page = 1
+            st.session_state.page_cursors = {}
+        if 'page_cursors' not in st.session_state:
+            st.session_state.page_cursors = {}
+
+        # Only generated products are listed; fetch just the visible page from the database
+        items_per_page = st.session_state.items_per_page
+        total_items = db.count_generated_products(search=search_term, category=category_filter)
+        total_pages = max(1, (total_items + items_per_page - 1) // items_per_page)
+
+        if st.session_state.current_page > total_pages:
+            st.session_state.current_page = total_pages
+        if st.session_state.current_page < 1:
+            st.session_state.current_page = 1
+        current_page = st.session_state.current_page
+
+        # Continue from the last row of the previous page when we know it, otherwise skip by offset
+        filtered_df = db.get_generated_products_page(
+            items_per_page,
+            search=search_term,
+            category=category_filter,
+            after=st.session_state.page_cursors.get(current_page),
+            offset=(current_page - 1) * items_per_page
+        )
 
-        # Apply additional filters
         if not filtered_df.empty:
-            if 'price' in filtered_df.columns:
-                filtered_df['price'] = pd.to_numeric(filtered_df['price'], errors='coerce').fillna(0.0)
-            if 'quantity' in filtered_df.columns:
-                filtered_df['quantity'] = pd.to_numeric(filtered_df['quantity'], errors='coerce').fillna(0).astype(int)
-
-            expanded_rows = []
-            for idx, row in filtered_df.iterrows():
-                if row.get('product_type') == 'Generated' and 'mockup_urls' in row and row['mockup_urls']:
-                    try:
-                        mockup_data = json.loads(row['mockup_urls']) if isinstance(row['mockup_urls'], str) else row['mockup_urls']
-                        if isinstance(mockup_data, dict) and len(mockup_data) > 0:
-                            for color_code, urls in mockup_data.items():
-                                new_row = row.copy()
-                                color_key = color_code.lstrip('#')
-                                friendly_color = hex_to_color_name(f"#{color_key}")
-                                url_list = [url.strip() for url in urls.split(',')] if isinstance(urls, str) else [urls]
-                                first_url = url_list[0] if url_list else ''
-                                new_row['current_color'] = f"#{color_key}"
-                                new_row['color_name'] = friendly_color
-                                new_row['current_mockup_url'] = first_url
-                                if 'size' in row and row['size']:
-                                    try:
-                                        size_data = row['size']
-                                        if isinstance(size_data, str) and (size_data.startswith('[') or size_data.startswith('{')):
-                                            size_json = json.loads(size_data)
-                                            if isinstance(size_json, list) and len(size_json) > 0:
-                                                for size in size_json:
-                                                    size_row = new_row.copy()
-                                                    size_value = size
-                                                    if isinstance(size, dict) and 'name' in size:
-                                                        size_value = size['name']
-                                                    size_row['current_size'] = size_value
-                                                    expanded_rows.append(size_row)
-                                                continue
-                                    except Exception as e:
-                                        print(f"Error processing sizes: {e}")
-                                expanded_rows.append(new_row)
-                            continue
-                        elif isinstance(mockup_data, list) and len(mockup_data) > 0:
-                            for i, mockup_url in enumerate(mockup_data):
-                                new_row = row.copy()
-                                new_row['current_mockup_url'] = mockup_url
-                                new_row['mockup_variant'] = i + 1
-                                expanded_rows.append(new_row)
-                            continue
-                    except Exception as e:
-                        st.error(f"Error parsing mockup URLs: {e}")
-                expanded_rows.append(row)
-
-            if expanded_rows:
-                filtered_df = pd.DataFrame(expanded_rows)
-
-        # Search filter
-        if search_term:
-            search_columns = ['product_name', 'item_sku']
-            search_mask = pd.Series(False, index=filtered_df.index)
-            for col in search_columns:
-                if col in filtered_df.columns:
-                    search_mask |= filtered_df[col].str.contains(search_term, case=False, na=False)
-            filtered_df = filtered_df[search_mask]
-
-        # Category filter
-        if category_filter != "All" and not filtered_df.empty and 'category' in filtered_df.columns:
-            filtered_df = filtered_df[filtered_df['category'] == category_filter]
+            last_row = filtered_df.iloc[-1]
+            st.session_state.page_cursors[current_page + 1] = (pd.Timestamp(last_row['created_at']).to_pydatetime(), int(last_row['id']))
+
+            filtered_df['product_type'] = 'Generated'
+            if 'design_sku' in filtered_df.columns:
+                filtered_df = filtered_df.rename(columns={'design_sku': 'item_sku'})
+
+            filtered_df = expand_display_variants(filtered_df)
+
+        # Products sharing a design, counted for the whole page in one indexed query
+        design_counts = {}
+        if not filtered_df.empty and 'design_key' in filtered_df.columns:
+            design_counts = db.count_products_by_design(filtered_df['design_key'].dropna().unique().tolist())
 
         # Display products
         if filtered_df.empty:
             st.info("No products found matching your criteria.")
         else:
-            total_items = len(filtered_df)
-            total_pages = (total_items + st.session_state.items_per_page - 1) // st.session_state.items_per_page
-
-            if st.session_state.current_page > total_pages:
-                st.session_state.current_page = total_pages
-            if st.session_state.current_page < 1:
-                st.session_state.current_page = 1
+            start_idx = (current_page - 1) * items_per_page
+            end_idx = min(start_idx + items_per_page, total_items)
 
-            start_idx = (st.session_state.current_page - 1) * st.session_state.items_per_page
-            end_idx = min(start_idx + st.session_state.items_per_page, total_items)
+            page_df = filtered_df
 
-            page_df = filtered_df.iloc[start_idx:end_idx]
+            # Show small WebP thumbnails instead of the full-size mockups, looked up in one query
+            list_image_urls = []
+            for column in ('current_mockup_url', 'original_design_url'):
+                if column in page_df.columns:
+                    list_image_urls.extend(page_df[column].dropna().tolist())
+            if 'mockup_urls' in page_df.columns:
+                list_image_urls.extend(first_mockup_urls(page_df['mockup_urls']).tolist())
+            thumbnails = db.get_thumbnail_urls(list_image_urls, THUMBNAIL_WIDTHS[0]) if THUMBNAIL_WIDTHS else {}
 
             st.subheader("Products")
 
@@ -729,7 +505,7 @@ elif st.session_state.get("authentication_status") is True:
                     if product_type == 'Generated' and 'mockup_urls' in row and row['mockup_urls']:
                         try:
                             if 'current_mockup_url' in row and row['current_mockup_url']:
-                                st.image(row['current_mockup_url'], width=70, caption=f"{row['color_name'] if 'color_name' in row else 'Mockup'}")
+                                st.image(thumbnails.get(row['current_mockup_url'], row['current_mockup_url']), width=70, caption=f"{row['color_name'] if 'color_name' in row else 'Mockup'}")
                             else:
                                 mockup_data = json.loads(row['mockup_urls']) if isinstance(row['mockup_urls'], str) else row['mockup_urls']
                                 if isinstance(mockup_data, dict) and len(mockup_data) > 0:
@@ -740,11 +516,11 @@ elif st.session_state.get("authentication_status") is True:
                                     url_list = [url.strip() for url in urls.split(',')] if isinstance(urls, str) else [urls]
                                     first_url = url_list[0] if url_list else ''
                                     if first_url:
-                                        st.image(first_url, width=70, caption=f"{friendly_color}")
+                                        st.image(thumbnails.get(first_url, first_url), width=70, caption=f"{friendly_color}")
                                     else:
                                         st.markdown("📷 *No valid mockup image*")
                                 elif isinstance(mockup_data, list) and len(mockup_data) > 0:
-                                    st.image(mockup_data[0], width=70, caption="Mockup")
+                                    st.image(thumbnails.get(mockup_data[0], mockup_data[0]), width=70, caption="Mockup")
                                 else:
                                     st.markdown("📷 *No valid mockup image*")
                         except Exception as e:
@@ -756,7 +532,7 @@ elif st.session_state.get("authentication_status") is True:
                             image_url = row[image_field]
                             if image_url and isinstance(image_url, str):
                                 try:
-                                    st.image(image_url, width=70, caption="Product Image")
+                                    st.image(thumbnails.get(image_url, image_url), width=70, caption="Product Image")
                                 except Exception as img_err:
                                     st.error(f"Failed to load image {image_url}: {img_err}")
                                     st.markdown("📷 *Image could not be loaded*")
@@ -775,6 +551,9 @@ elif st.session_state.get("authentication_status") is True:
                     elif 'mockup_variant' in row:
                         product_name_display = f"{product_name_display} (Variant {row['mockup_variant']})"
                     st.write(product_name_display)
+                    design_count = design_counts.get(row.get('design_key'), 0)
+                    if design_count > 1:
+                        st.caption(f"{design_count} products from this design")
 
                 # Action column
                 with cols[2]:
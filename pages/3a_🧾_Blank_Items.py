@@ -6,6 +6,7 @@ from PIL import Image
 import json
 from utils.api import is_s3_url
 from utils.s3_storage import get_image_from_s3_url
+from config import THUMBNAIL_WIDTHS
 from utils.color_utils import hex_to_color_name
 import yaml
 from yaml.loader import SafeLoader
@@ -56,12 +57,9 @@ elif st.session_state.get("authentication_status") is True:
     if 'blank_items_per_page' not in st.session_state:
         st.session_state.blank_items_per_page = 5
 
-    # Get all regular products from database
-    products_df = db.get_all_products()
-
-    # Add a type column to distinguish regular products
-    if not products_df.empty:
-        products_df['product_type'] = 'Regular'
+    # Columns shown in the product table; the JSON/TEXT columns are only
+    # loaded for the single product being viewed or edited
+    BLANK_LIST_COLUMNS = ['id', 'product_name', 'item_sku', 'category', 'image_url']
 
     # Handle delete confirmation modal
     if st.session_state.blank_confirm_delete:
@@ -284,35 +282,16 @@ elif st.session_state.get("authentication_status") is True:
             search_term = st.text_input("Search by name or SKU", "", key="blank_search")
 
         with col2:
-            categories = []
-            if not products_df.empty and 'category' in products_df.columns:
-                categories = products_df['category'].dropna().unique().tolist()
-            categories = ["All"] + categories
+            categories = ["All"] + db.get_product_categories()
             category_filter = st.selectbox("Filter by category", categories, key="blank_category")
 
-        filtered_df = products_df.copy()
-
-        if not filtered_df.empty:
-            if 'price' in filtered_df.columns:
-                filtered_df['price'] = pd.to_numeric(filtered_df['price'], errors='coerce').fillna(0.0)
-            if 'quantity' in filtered_df.columns:
-                filtered_df['quantity'] = pd.to_numeric(filtered_df['quantity'], errors='coerce').fillna(0).astype(int)
-
-        if search_term:
-            search_columns = ['product_name', 'item_sku']
-            search_mask = pd.Series(False, index=filtered_df.index)
-            for col in search_columns:
-                if col in filtered_df.columns:
-                    search_mask |= filtered_df[col].str.contains(search_term, case=False, na=False)
-            filtered_df = filtered_df[search_mask]
-
-        if category_filter != "All" and not filtered_df.empty and 'category' in filtered_df.columns:
-            filtered_df = filtered_df[filtered_df['category'] == category_filter]
+        # Filter, count and page in SQL, selecting only the listed columns
+        product_filters = {'category': category_filter} if category_filter != "All" else None
+        total_items = db.count_rows('products', filters=product_filters, search=search_term or None)
 
-        if filtered_df.empty:
+        if total_items == 0:
             st.info("No products found matching your criteria.")
         else:
-            total_items = len(filtered_df)
             total_pages = (total_items + st.session_state.blank_items_per_page - 1) // st.session_state.blank_items_per_page
 
             if st.session_state.blank_current_page > total_pages:
@@ -323,7 +302,20 @@ elif st.session_state.get("authentication_status") is True:
             start_idx = (st.session_state.blank_current_page - 1) * st.session_state.blank_items_per_page
             end_idx = min(start_idx + st.session_state.blank_items_per_page, total_items)
 
-            page_df = filtered_df.iloc[start_idx:end_idx]
+            page_df = db.query_frame(
+                'products',
+                columns=BLANK_LIST_COLUMNS,
+                filters=product_filters,
+                search=search_term or None,
+                order_by=['created_at DESC', 'id DESC'],
+                limit=st.session_state.blank_items_per_page,
+                offset=start_idx
+            )
+
+            # Show small WebP thumbnails instead of the full-size images, looked up in one query
+            thumbnails = {}
+            if THUMBNAIL_WIDTHS and 'image_url' in page_df.columns:
+                thumbnails = db.get_thumbnail_urls(page_df['image_url'].dropna().tolist(), THUMBNAIL_WIDTHS[0])
 
             st.subheader("Regular Products")
 
@@ -350,7 +342,7 @@ elif st.session_state.get("authentication_status") is True:
                         image_url = row[image_field]
                         if image_url and isinstance(image_url, str):
                             try:
-                                st.image(image_url, width=70, caption="Product Image")
+                                st.image(thumbnails.get(image_url, image_url), width=70, caption="Product Image")
                             except Exception as img_err:
                                 st.error(f"Failed to load image {image_url}: {img_err}")
                                 st.markdown("📷 *Image could not be loaded*")
@@ -1,16 +1,19 @@
 import streamlit as st
 import pandas as pd
-import json
 import io  # Add this import
+import os
+import tempfile
 from utils.database import get_database_connection
-from utils.export import export_to_csv
-from utils.color_utils import hex_to_color_name  # Import the new function
+from utils.export import write_csv_export
 import datetime
 import yaml
 from yaml.loader import SafeLoader
 import streamlit_authenticator as stauth
 from utils.ftp_utils import upload_to_ftp  # Import the new FTP utility
 
+# Rows per product type shown in the export preview
+EXPORT_PREVIEW_ROWS = 100
+
 with open('config.yaml') as file:
     config = yaml.load(file, Loader=SafeLoader)
 
@@ -42,6 +45,7 @@ elif st.session_state.get("authentication_status") is True:
 
     # Initialize export_df as empty DataFrame to prevent NameError
     export_df = pd.DataFrame()
+    export_file = None
 
     # Check if we have data from Product List page or need to load from database
     if 'export_csv_data' in st.session_state:
@@ -68,105 +72,85 @@ elif st.session_state.get("authentication_status") is True:
         st.write(f"Found {len(products_df)} products ready for export.")
         export_df = products_df
     else:
-        # Get all products from database
-        products_df = db.get_all_products()
-        generated_products_df = db.get_all_generated_products()
+        # Build the export straight from the database; filters run in SQL and the
+        # CSV is streamed to disk chunk by chunk instead of being held in memory
+        st.subheader("Export Options")
         
-        # Combine datasets with a product type indicator
-        if not products_df.empty:
-            products_df['product_type'] = 'Regular'
-            
-        if not generated_products_df.empty:
-            generated_products_df['product_type'] = 'Generated'
-            if 'design_sku' in generated_products_df.columns:
-                generated_products_df = generated_products_df.rename(columns={'design_sku': 'item_sku'})
+        # Filter options
+        col1, col2 = st.columns(2)
         
-        # Combine dataframes if both have data
-        if not products_df.empty and not generated_products_df.empty:
-            all_products_df = pd.concat([products_df, generated_products_df], ignore_index=True)
-        elif not products_df.empty:
-            all_products_df = products_df.copy()
-        elif not generated_products_df.empty:
-            all_products_df = generated_products_df.copy()
-        else:
-            all_products_df = pd.DataFrame()
-
-        if all_products_df.empty:
-            st.info("No products found to export. Please add products first.")
-            # export_df remains an empty DataFrame here
-        else:
-            # Add filters for export
-            st.subheader("Export Options")
+        with col1:
+            filter_option = st.selectbox(
+                "Filter products",
+                options=["All Products", "By Product Type", "By Parent/Child", "By Category", "By Date Range"]
+            )
+        
+        export_filters = {}
+        
+        if filter_option == "By Product Type":
+            product_type_filter = st.selectbox(
+                "Select product type",
+                options=["All", "Regular", "Generated"]
+            )
             
-            # Filter options
-            col1, col2 = st.columns(2)
+            if product_type_filter != "All":
+                export_filters['product_type'] = product_type_filter
+                
+        elif filter_option == "By Parent/Child":
+            parent_child_filter = st.selectbox(
+                "Select type",
+                options=["All", "Parent", "Child"]
+            )
             
-            with col1:
-                filter_option = st.selectbox(
-                    "Filter products",
-                    options=["All Products", "By Product Type", "By Parent/Child", "By Category", "By Date Range"]
-                )
+            if parent_child_filter != "All":
+                export_filters['parent_child'] = parent_child_filter
+        
+        elif filter_option == "By Category":
+            categories = ["All"] + db.get_product_categories()
+            category_filter = st.selectbox("Select category", options=categories)
             
-            filtered_df = all_products_df.copy()
+            if category_filter != "All":
+                export_filters['category'] = category_filter
+        
+        elif filter_option == "By Date Range":
+            min_date, max_date = db.get_product_date_range()
             
-            if filter_option == "By Product Type":
-                product_type_filter = st.selectbox(
-                    "Select product type",
-                    options=["All", "Regular", "Generated"]
-                )
+            if min_date:
+                col1, col2 = st.columns(2)
                 
-                if product_type_filter != "All":
-                    filtered_df = filtered_df[filtered_df['product_type'] == product_type_filter]
-                    
-            elif filter_option == "By Parent/Child":
-                parent_child_filter = st.selectbox(
-                    "Select type",
-                    options=["All", "Parent", "Child"]
-                )
+                with col1:
+                    start_date = st.date_input("Start date", min_date)
                 
-                if parent_child_filter != "All":
-                    filtered_df = filtered_df[filtered_df['parent_child'] == parent_child_filter]
-            
-            elif filter_option == "By Category":
-                if 'category' in filtered_df.columns:
-                    categories = ["All"] + sorted(filtered_df['category'].dropna().unique().tolist())
-                    category_filter = st.selectbox("Select category", options=categories)
-                    
-                    if category_filter != "All":
-                        filtered_df = filtered_df[filtered_df['category'] == category_filter]
-            
-            elif filter_option == "By Date Range":
-                if 'created_at' in filtered_df.columns:
-                    # Convert to datetime if not already
-                    if not pd.api.types.is_datetime64_dtype(filtered_df['created_at']):
-                        filtered_df['created_at'] = pd.to_datetime(filtered_df['created_at'])
-                    
-                    min_date = filtered_df['created_at'].min().date()
-                    max_date = filtered_df['created_at'].max().date()
-                    
-                    col1, col2 = st.columns(2)
-                    
-                    with col1:
-                        start_date = st.date_input("Start date", min_date)
-                    
-                    with col2:
-                        end_date = st.date_input("End date", max_date)
-                    
-                    filtered_df = filtered_df[
-                        (filtered_df['created_at'].dt.date >= start_date) & 
-                        (filtered_df['created_at'].dt.date <= end_date)
-                    ]
-            
-            # Preview the data to export
+                with col2:
+                    end_date = st.date_input("End date", max_date)
+                
+                export_filters['start_date'] = start_date
+                export_filters['end_date'] = end_date
+        
+        total_products = db.count_export_products(**export_filters)
+        
+        if total_products == 0:
+            if export_filters:
+                st.info("No products found matching your criteria.")
+            else:
+                st.info("No products found to export. Please add products first.")
+        else:
+            # Preview the first rows of the export
             st.subheader("Preview Export Data")
+            preview_df = db.get_export_preview(
+                EXPORT_PREVIEW_ROWS,
+                columns=['id', 'product_name', 'item_sku', 'parent_child', 'price'],
+                **export_filters
+            )
             
             # Show a preview with more useful columns
             display_cols = ['id', 'product_name', 'item_sku', 'parent_child', 'product_type']
-            if 'price' in filtered_df.columns:
+            if 'price' in preview_df.columns:
                 display_cols.append('price')
+            display_cols = [col for col in display_cols if col in preview_df.columns]
                 
             st.dataframe(
-                filtered_df[display_cols],
+                preview_df[display_cols],
                 column_config={
                     "id": "ID",
                     "product_name": "Product Name",
@@ -178,184 +162,45 @@ elif st.session_state.get("authentication_status") is True:
                 use_container_width=True
             )
             
-            st.write(f"Found {len(filtered_df)} products matching your criteria.")
+            st.write(f"Found {total_products} products matching your criteria.")
             
             # Warning: Export from this page will be simpler than from the Product List page
             st.warning("For best results with mockups separated by color, use the 'Generate CSV' button on the Product List page first.")
             
-            # Process for database-loaded data, as Product List has more advanced processing
-            # Define function to extract mockup URLs from JSON and create color-specific entries
-            def process_mockups_by_color(row_data):
-                """Extract mockup URLs from JSON and create individual entries for each color"""
-                if 'mockup_urls' not in row_data or pd.isna(row_data['mockup_urls']) or not row_data['mockup_urls']:
-                    return [row_data]
-                
-                try:
-                    mockup_data = row_data['mockup_urls']
-                    if isinstance(mockup_data, str) and (mockup_data.startswith('[') or mockup_data.startswith('{')):
-                        mockup_json = json.loads(mockup_data)
-                        
-                        # Handle dictionary format: {"#color1": "url1", "#color2": "url2"}
-                        if isinstance(mockup_json, dict) and len(mockup_json) > 0:
-                            result_rows = []
-                            
-                            for color_code, mockup_url in mockup_json.items():
-                                new_row = row_data.copy()
-                                
-                                # Set the image_url to this specific mockup URL
-                                new_row['image_url'] = mockup_url
-                                
-                                # Convert hex to friendly color name
-                                color_name = hex_to_color_name(color_code)
-                                
-                                # Set color value for this mockup
-                                new_row['colour'] = color_name
-                                new_row['color'] = color_name
-                                
-                                # Store original hex code for matching purposes
-                                new_row['original_hex'] = color_code.replace("#", "") if color_code.startswith("#") else color_code
-                                
-                                result_rows.append(new_row)
-                            
-                            return result_rows
-                            
-                        # Handle array format: ["url1", "url2"]
-                        elif isinstance(mockup_json, list) and len(mockup_json) > 0:
-                            # For array format, we'll just use the first URL
-                            # since we don't have color information
-                            row_data['image_url'] = mockup_json[0]
-                            return [row_data]
-                except Exception as e:
-                    print(f"Error processing mockups: {e}")
-                
-                # Default: return the original row
-                return [row_data]
-
-            # Process data for CSV formatting - process mockups intelligently
-            export_rows = []
-            
-            for idx, row in filtered_df.iterrows():
-                product_row = row.copy()
-                
-                # For generated products with mockups, handle them specially
-                if product_row.get('product_type') == 'Generated' and 'mockup_urls' in product_row and not pd.isna(product_row['mockup_urls']) and product_row['mockup_urls']:
-                    # Process mockups by color
-                    color_rows = process_mockups_by_color(product_row.to_dict())
-                    export_rows.extend(color_rows)
-                else:
-                    # Process size and color values as in the original code
-                    # ...existing code for handling size and color...
-                    export_rows.append(product_row.to_dict())
+            # Forget a prepared export once the filters change
+            export_file = st.session_state.get('export_file')
+            if export_file and (export_file['filters'] != export_filters or not os.path.exists(export_file['path'])):
+                export_file = None
             
-            # Convert the rows back to a DataFrame
-            export_df = pd.DataFrame(export_rows)
-            
-            # Ensure required fields exist and add special handling for generated products
-            required_fields = [
-                'product_name', 'item_sku', 'parent_child', 'parent_sku',
-                'size', 'color', 'image_url', 'market_place_title', 'category'
-            ]
-            
-            for field in required_fields:
-                if field not in export_df.columns:
-                    export_df[field] = ''
-                    
-            # Special handling for generated products
-            if 'product_type' in export_df.columns:
-                # Set parent_child values based on product type
-                # For regular products: set parent_child as "Parent" 
-                mask_regular = export_df['product_type'] == 'Regular'
-                if any(mask_regular):
-                    export_df.loc[mask_regular, 'parent_child'] = 'Parent'
+            if st.button("🗂️ Prepare CSV Export", use_container_width=True):
+                timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+                export_filename = f"product_export_{timestamp}.csv"
+                export_path = os.path.join(tempfile.gettempdir(), export_filename)
                 
-                # For generated products: set parent_child as "Child"
-                mask_generated = export_df['product_type'] == 'Generated'
-                if any(mask_generated):
-                    export_df.loc[mask_generated, 'parent_child'] = 'Child'
-                
-                # For generated products, use product_name as category
-                if any(mask_generated):
-                    export_df.loc[mask_generated, 'category'] = export_df.loc[mask_generated, 'product_name']
-                
-                # For parent records in generated products, make item_sku blank
-                mask_parent_generated = (export_df['product_type'] == 'Generated') & \
-                                        (export_df['parent_child'] == 'Parent')
-                if any(mask_parent_generated):
-                    export_df.loc[mask_parent_generated, 'item_sku'] = ''
-                    
-                # Set market_place_title for generated products
-                for idx, row in export_df[mask_generated].iterrows():
-                    product_name = row['product_name'] if not pd.isna(row['product_name']) else ''
-                    size = row['size'] if not pd.isna(row['size']) and row['size'] else ''
-                    color = row['color'] if not pd.isna(row['color']) and row['color'] else ''
+                try:
+                    with st.spinner(f"Writing {total_products} products to CSV..."):
+                        with open(export_path, 'wb') as sink:
+                            size = write_csv_export(db.iter_export_products(**export_filters), sink)
                     
-                    # Build marketplace title with available information
-                    title_parts = [part for part in [product_name, size, color] if part]
-                    marketplace_title = ' - '.join(title_parts)
-                    export_df.at[idx, 'market_place_title'] = marketplace_title
-
-            # Fix for the filtered data export to properly match color-specific mockups
-            if 'export_csv_data' not in st.session_state and not export_df.empty:
-                # For generated products with colors, ensure the image_url matches the color
-                if 'product_type' in export_df.columns and 'color' in export_df.columns and 'mockup_urls' in export_df.columns:
-                    # Get all generated products with mockup_urls
-                    mask_generated_with_mockups = (export_df['product_type'] == 'Generated') & (~export_df['mockup_urls'].isna()) & (export_df['mockup_urls'] != '')
+                    previous = st.session_state.get('export_file')
+                    if previous and previous['path'] != export_path and os.path.exists(previous['path']):
+                        os.unlink(previous['path'])
                     
-                    # Process each row to match color with the correct mockup URL
-                    for idx, row in export_df[mask_generated_with_mockups].iterrows():
-                        try:
-                            # Get the color for this row
-                            color = row['color'] if not pd.isna(row['color']) else None
-                            if not color:
-                                continue
-                                
-                            # Parse the mockup_urls JSON
-                            if not pd.isna(row['mockup_urls']) and row['mockup_urls']:
-                                mockup_data = row['mockup_urls']
-                                if isinstance(mockup_data, str) and mockup_data.startswith('{'):
-                                    mockup_json = json.loads(mockup_data)
-                                    
-                                    # Try to find matching color in the mockup_urls (different formats)
-                                    # First try direct color name match if mockup_urls contains color names
-                                    if color in mockup_json:
-                                        export_df.at[idx, 'image_url'] = mockup_json[color]
-                                        continue
-                                        
-                                    # Try with # prefix
-                                    hex_color = f"#{color}" if not color.startswith('#') else color
-                                    if hex_color in mockup_json:
-                                        export_df.at[idx, 'image_url'] = mockup_json[hex_color]
-                                        continue
-                                    
-                                    # Try without # prefix
-                                    plain_color = color.replace('#', '')
-                                    if plain_color in mockup_json:
-                                        export_df.at[idx, 'image_url'] = mockup_json[plain_color]
-                                        continue
-                                        
-                                    # If no direct match, look for a color name match
-                                    # Convert each hex to color name and compare
-                                    for hex_code, url in mockup_json.items():
-                                        mockup_color_name = hex_to_color_name(hex_code)
-                                        if mockup_color_name.lower() == color.lower():
-                                            export_df.at[idx, 'image_url'] = url
-                                            break
-                        except Exception as e:
-                            print(f"Error matching mockup URL for color {color}: {e}")
+                    export_file = {'path': export_path, 'filename': export_filename, 'filters': export_filters}
+                    st.session_state.export_file = export_file
+                    st.success(f"Export ready ({size / 1024 / 1024:.1f} MB).")
+                except Exception as e:
+                    st.error(f"Error writing export: {e}")
 
     # Export button
-    if not export_df.empty:
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        export_filename = f"product_export_{timestamp}.csv"
-        
-        # Prepare CSV data - either from existing session state or by generating new
-        if 'export_csv_data' in st.session_state:
-            csv_data = st.session_state.export_csv_data
+    if not export_df.empty or export_file:
+        # Either the CSV prepared on the Product List page or the file streamed above
+        if export_file:
+            export_filename = export_file['filename']
         else:
-            # Keep only required fields + any additional useful ones
-            all_fields = required_fields + [col for col in export_df.columns if col not in required_fields]
-            export_df = export_df[all_fields]
-            csv_data = export_to_csv(export_df)
+            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+            export_filename = f"product_export_{timestamp}.csv"
+            csv_data = st.session_state.export_csv_data
         
         # Get FTP settings for upload option
         ftp_settings = db.get_ftp_settings()
@@ -366,13 +211,23 @@ elif st.session_state.get("authentication_status") is True:
         
         col1, col2 = st.columns(2)
         with col1:
-            st.download_button(
-                label="📥 Download CSV",
-                data=csv_data,
-                file_name=export_filename,
-                mime="text/csv",
-                use_container_width=True
-            )
+            if export_file:
+                with open(export_file['path'], 'rb') as export_data:
+                    st.download_button(
+                        label="📥 Download CSV",
+                        data=export_data,
+                        file_name=export_filename,
+                        mime="text/csv",
+                        use_container_width=True
+                    )
+            else:
+                st.download_button(
+                    label="📥 Download CSV",
+                    data=csv_data,
+                    file_name=export_filename,
+                    mime="text/csv",
+                    use_container_width=True
+                )
         
         with col2:
             # Add FTP upload button if we have FTP settings
@@ -398,17 +253,25 @@ elif st.session_state.get("authentication_status") is True:
                     selected_ftp = default_ftp_settings
                 
                 if st.button("📤 Upload to FTP Server", use_container_width=True):
-                    if not csv_data:
+                    if not export_file and not csv_data:
                         st.error("No data to upload. Please generate export data first.")
                     elif not selected_ftp:
                         st.error("No FTP server selected or available.")
                     else:
                         with st.spinner(f"Uploading to FTP server {selected_ftp['host']}..."):
-                            success, message = upload_to_ftp(
-                                csv_data, 
-                                export_filename, 
-                                selected_ftp
-                            )
+                            if export_file:
+                                with open(export_file['path'], 'rb') as export_data:
+                                    success, message = upload_to_ftp(
+                                        export_data,
+                                        export_filename,
+                                        selected_ftp
+                                    )
+                            else:
+                                success, message = upload_to_ftp(
+                                    csv_data, 
+                                    export_filename, 
+                                    selected_ftp
+                                )
                             if success:
                                 st.success(message)
                             else:
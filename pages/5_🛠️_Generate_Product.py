@@ -1,12 +1,14 @@
 import streamlit as st
 import os
-import requests
 import json
-import random
 import string
 from dotenv import load_dotenv
 from utils.database import get_database_connection
-from utils.s3_storage import upload_image_file_to_s3, check_s3_connection
+from utils.s3_storage import upload_image_file_to_s3, check_s3_connection, get_s3_client, transfer_urls_to_s3, upload_stream_to_s3
+from utils.render_cache import RenderCache
+from utils.render_engine import render_all_mockups
+from utils.dynamic_mockups import api_request, RENDER_FORMAT, RENDER_WIDTH
+from utils.http_client import get_http_session
 import yaml
 from yaml.loader import SafeLoader
 import streamlit_authenticator as stauth
@@ -36,56 +38,50 @@ if not st.session_state.get("authentication_status"):
 
 elif st.session_state.get("authentication_status") is True:
 
-    # Initialize set for used SKU numbers and sequence tracking in session state
-    if 'used_sku_numbers' not in st.session_state:
-        st.session_state.used_sku_numbers = set()
-    if 'sku_sequence_number' not in st.session_state:
-        st.session_state.sku_sequence_number = None
-
-    # Function to generate a random 4-digit number
-    def generate_random_sku_number():
-        """Generate a random 4-digit number or increment the current one"""
-        if st.session_state.sku_sequence_number is None:
-            # Generate a random 4-digit number
-            number = random.randint(1000, 9999)
-            st.session_state.sku_sequence_number = number
-        else:
-            # Increment the current number
-            st.session_state.sku_sequence_number += 1
-            number = st.session_state.sku_sequence_number
-            # Ensure the number stays within 4 digits (1000–9999)
-            if number > 9999:
-                number = 1000  # Reset to 1000 if exceeding 9999
-                st.session_state.sku_sequence_number = number
-                st.session_state.used_sku_numbers.clear()  # Clear used numbers to allow reuse
+    def get_sku_base(parent_sku=None):
+        """Get the SKU prefix from a parent SKU, defaulting to QWER"""
+        if parent_sku and '-' in parent_sku:
+            return parent_sku.split('-')[0].upper()
+        elif parent_sku and len(parent_sku) >= 4:
+            return parent_sku[:4].upper()
+        return "QWER"
 
-        # Ensure uniqueness within the session
-        while number in st.session_state.used_sku_numbers:
-            st.session_state.sku_sequence_number += 1
-            number = st.session_state.sku_sequence_number
-            if number > 9999:
-                number = 1000
-                st.session_state.sku_sequence_number = number
-                st.session_state.used_sku_numbers.clear()
+    def peek_sku_number(sequence):
+        """Next number of a SKU sequence for display, read once per session until SKUs are allocated"""
+        previews = st.session_state.setdefault('sku_number_previews', {})
+        if sequence not in previews:
+            previews[sequence] = get_database_connection().peek_sku_number(sequence)
+        return previews[sequence]
 
-        st.session_state.used_sku_numbers.add(number)
-        return number
+    def clear_sku_previews():
+        """Forget displayed SKU numbers once numbers have been allocated"""
+        st.session_state.pop('sku_number_previews', None)
 
-    # Function to generate product SKU with a random 4-digit number
-    def generate_product_sku(parent_sku=None, size=None, color=None, is_display=False):
-        """Generate a unique SKU with a random 4-digit number"""
+    # Function to generate product SKU with a sequence number
+    def generate_product_sku(parent_sku=None, size=None, color=None, is_display=False, sku_number=None):
+        """
+        Generate a variant SKU such as QWER-0457-S-Black
+        
+        The number comes from the database-backed "<prefix>:variant" sequence, so
+        it is unique across sessions. Display SKUs only peek at the next number
+        instead of reserving it; the peeked number is kept in session state so
+        reruns do not query the database. Pass sku_number to use a number from a block
+        reserved with allocate_sku_numbers.
+        """
         sku = ""
         
-        # Use a fixed prefix or extract from parent SKU
-        if parent_sku and '-' in parent_sku:
-            sku_base = parent_sku.split('-')[0].upper()
-        elif parent_sku and len(parent_sku) >= 4:
-            sku_base = parent_sku[:4].upper()
-        else:
-            sku_base = "QWER"
+        sku_base = get_sku_base(parent_sku)
         
-        # Get a random 4-digit number
-        sku_number = generate_random_sku_number()
+        if sku_number is None:
+            sequence = f"{sku_base}:variant"
+            if is_display:
+                sku_number = peek_sku_number(sequence)
+            else:
+                numbers = get_database_connection().allocate_sku_numbers(sequence, 1)
+                clear_sku_previews()
+                if not numbers:
+                    raise RuntimeError(f"Could not allocate a SKU number for {sku_base}")
+                sku_number = numbers[0]
         
         # Get size code: use XX for XX-Large, XXX for XXX-Large, otherwise first letter
         size_letter = ""
@@ -107,38 +103,23 @@ elif st.session_state.get("authentication_status") is True:
         if color_name:
             sku += f"-{color_name}"
         
-        # If this is for display only, remove the number from used set to allow reuse
-        if is_display:
-            st.session_state.used_sku_numbers.discard(sku_number)
-        
         return sku
 
     # Function to generate SKU for new products in the products table
     def generate_new_product_sku(parent_sku=None):
-        """Generate a unique SKU for a new product based on product count in the database"""
+        """Generate a unique SKU for a new product from the prefix's SKU sequence"""
         db = get_database_connection()
         
         # Extract prefix from parent SKU or use default
-        if parent_sku and '-' in parent_sku:
-            sku_base = parent_sku.split('-')[0].upper()
-        elif parent_sku and len(parent_sku) >= 4:
-            sku_base = parent_sku[:4].upper()
-        else:
-            sku_base = "QWER"  # Default prefix if no parent SKU is provided
+        sku_base = get_sku_base(parent_sku)
         
-        # Get the total number of products and increment by 1
-        product_count = db.get_product_count()
-        sku_number = product_count + 1
+        # Reserve the next number for this prefix
+        numbers = db.allocate_sku_numbers(sku_base, 1)
+        if not numbers:
+            raise RuntimeError(f"Could not allocate a SKU number for {sku_base}")
         
         # Generate the SKU with 4-digit padding
-        sku = f"{sku_base}-{sku_number:04d}"
-        
-        # Check if the SKU already exists in the products table
-        while db.execute_query("SELECT 1 FROM products WHERE item_sku = %s", (sku,)):
-            sku_number += 1
-            sku = f"{sku_base}-{sku_number:04d}"
-        
-        return sku
+        return f"{sku_base}-{numbers[0]:04d}"
 
     # Function to update the SKU based on current form inputs
     def update_design_sku():
@@ -172,9 +153,8 @@ elif st.session_state.get("authentication_status") is True:
     if 'mockup_results' not in st.session_state:
         st.session_state.mockup_results = None
 
-    # Get all products from database
-    products_df = db.get_all_products()
-    print("Products DataFrame:", products_df)
+    # Only the product selector reads this, so fetch just its columns
+    products_df = db.query_frame('products', columns=['id', 'product_name'], order_by=['created_at DESC'])
 
     # Initialize session state for selected product
     if 'selected_product_id' not in st.session_state:
@@ -244,7 +224,7 @@ elif st.session_state.get("authentication_status") is True:
                 st.session_state.new_product_id = new_id
                 # Refresh products dataframe to include the new product
                 global products_df
-                products_df = db.get_all_products()
+                products_df = db.query_frame('products', columns=['id', 'product_name'], order_by=['created_at DESC'])
                 # Trigger a refresh of the product selector
                 st.session_state.refresh_product_selector = True
                 return new_id
@@ -276,7 +256,7 @@ elif st.session_state.get("authentication_status") is True:
             return []
             
         try:
-            image_check = requests.head(image_url)
+            image_check = get_http_session().head(image_url)
             if image_check.status_code != 200:
                 st.error(f"Image URL is not accessible: {image_url}")
                 st.error(f"Status code: {image_check.status_code}")
@@ -299,12 +279,13 @@ elif st.session_state.get("authentication_status") is True:
                         }
                     }
                 ],
-                "format": "png",
-                "width": 1500,
+                "format": RENDER_FORMAT,
+                "width": RENDER_WIDTH,
                 "transparent_background": True
             }        
             try:
-                response = requests.post(
+                response = api_request(
+                    'POST',
                     'https://app.dynamicmockups.com/api/v1/renders',
                     json=request_data,
                     headers={
@@ -554,12 +535,13 @@ elif st.session_state.get("authentication_status") is True:
                         }
                     }
                 ],
-                "format": "png",
-                "width": 1500,
+                "format": RENDER_FORMAT,
+                "width": RENDER_WIDTH,
                 "transparent_background": True
             }
             
-            response = requests.post(
+            response = api_request(
+                'POST',
                 'https://app.dynamicmockups.com/api/v1/renders',
                 json=request_data,
                 headers={
@@ -590,10 +572,20 @@ elif st.session_state.get("authentication_status") is True:
             st.error(f"Error generating mockup: {e}")
             return None
 
+    def get_render_cache():
+        """Render cache for the current design image, or None if no design has been hashed"""
+        design_digest = st.session_state.get('design_hash')
+        if not design_digest:
+            return None
+        return RenderCache(db, design_digest, get_s3_client())
+
     def generate_all_mockups(image_url, colors):
         """
         Generate mockups for all selected mockups
         
+        All (template x color) pairs are rendered concurrently by the render engine;
+        the progress bar advances as each render completes.
+        
         Args:
             image_url (str): URL of the image uploaded to S3
             colors (list): List of colors for the mockups in hex format
@@ -601,9 +593,6 @@ elif st.session_state.get("authentication_status") is True:
         Returns:
             list: List of mockup data for all generated mockups
         """
-        import time
-        
-        all_results = []
         mockup_ids = st.session_state.mockup_ids if hasattr(st.session_state, 'mockup_ids') else []
         smart_object_uuids = st.session_state.smart_object_uuids if hasattr(st.session_state, 'smart_object_uuids') else []
         
@@ -623,55 +612,29 @@ elif st.session_state.get("authentication_status") is True:
             st.warning(f"Not enough smart object UUIDs ({len(smart_object_uuids)}) for all mockups ({total_mockups}). Some will use default smart objects.")
             smart_object_uuids = smart_object_uuids + [None] * (total_mockups - len(smart_object_uuids))
         
-        mockup_count = 0
-        total_progress_steps = total_mockups * len(colors)
-        
+        templates = []
         for i, (mockup_id, smart_object_uuid) in enumerate(zip(mockup_ids, smart_object_uuids)):
-            progress = (i / total_mockups)
-            progress_bar.progress(progress)
-            status_text.text(f"Processing mockup template {i+1} of {total_mockups}: {mockup_id}")
-            
             if not mockup_id:
                 st.warning(f"Skipping mockup {i+1} because no valid mockup ID was found.")
                 continue
-            
-            st.info(f"Generating mockups for template {i+1}: {mockup_id} with smart object: {smart_object_uuid}")
-            
-            mockup_results = []
-            for j, color in enumerate(colors):
-                sub_status = st.empty()
-                sub_status.text(f"Generating color {j+1}/{len(colors)}: {color}")
-                
-                result = generate_single_mockup(
-                    image_url,
-                    color,
-                    mockup_id=mockup_id,
-                    smart_object_uuid=smart_object_uuid
-                )
-                
-                if result:
-                    mockup_results.append(result)
-                    mockup_count += 1
-                else:
-                    st.warning(f"Failed to generate mockup for template {mockup_id} with color {color}")
-                
-                current_progress = (i * len(colors) + j + 1) / total_progress_steps
-                progress_bar.progress(min(current_progress, 1.0))
-                
-                sub_status.empty()
-            
-            if mockup_results:
-                all_results.append({
-                    'mockup_id': mockup_id,
-                    'smart_object_uuid': smart_object_uuid,
-                    'results': mockup_results
-                })
-                st.success(f"Generated {len(mockup_results)} color variations for template {mockup_id}")
+            templates.append((mockup_id, smart_object_uuid))
+        
+        def on_progress(completed, total, mockup_id, color, result):
+            if not result:
+                st.warning(f"Failed to generate mockup for template {mockup_id} with color {color}")
+            progress_bar.progress(min(completed / total, 1.0))
+            status_text.text(f"Rendered {completed} of {total} mockups")
+        
+        all_results = render_all_mockups(
+            image_url, templates, colors, on_progress=on_progress, cache=get_render_cache()
+        )
         
+        for template in all_results:
+            st.success(f"Generated {len(template['results'])} color variations for template {template['mockup_id']}")
+        
+        mockup_count = sum(len(template['results']) for template in all_results)
         progress_bar.progress(1.0)
         status_text.text(f"Successfully generated {mockup_count} mockups across {len(all_results)} templates!")
-        time.sleep(1)
-        status_text.empty()
         
         return all_results
 
@@ -807,12 +770,22 @@ elif st.session_state.get("authentication_status") is True:
         color_index = st.session_state.get('template_color_index')
         
         with st.spinner(f"Generating {color_name} mockup for Template {template_idx + 1}..."):
-            result = generate_single_mockup(
-                st.session_state.uploaded_image_url,
-                hex_color,
-                mockup_id=mockup_id,
-                smart_object_uuid=smart_object_uuid
-            )
+            render_cache = get_render_cache()
+            if render_cache:
+                result = render_cache.render_one(
+                    generate_single_mockup,
+                    st.session_state.uploaded_image_url,
+                    hex_color,
+                    mockup_id,
+                    smart_object_uuid
+                )
+            else:
+                result = generate_single_mockup(
+                    st.session_state.uploaded_image_url,
+                    hex_color,
+                    mockup_id=mockup_id,
+                    smart_object_uuid=smart_object_uuid
+                )
             
             if result:
                 if 'results' not in template:
@@ -1040,7 +1013,10 @@ elif st.session_state.get("authentication_status") is True:
                         st.error("No mockup templates available. Please select a product with mockup templates.")
                     else:
                         with st.spinner("Uploading image to S3..."):
-                            image_url = upload_image_file_to_s3(design_image, folder="original")
+                            # The upload returns the content hash the design is stored under
+                            image_url, st.session_state.design_hash = upload_image_file_to_s3(
+                                design_image, folder="original", return_digest=True
+                            )
                             
                             if not image_url:
                                 st.error("Failed to upload image to S3. Please check your AWS configuration.")
@@ -1084,106 +1060,53 @@ elif st.session_state.get("authentication_status") is True:
             if hasattr(st.session_state, 'mockup_results_all') and st.session_state.mockup_results_all and hasattr(st.session_state, 'product_data_to_save'):
                 if st.button("Save All Mockups to Database", key="save_all_mockups_button"):
                     with st.spinner("Saving all mockups to S3 and database..."):
-                        import tempfile
-                        import os
-                        import boto3
-                        from botocore.exceptions import ClientError
+                        s3_client = get_s3_client()
                         
-                        s3_client = boto3.client('s3', 
-                            aws_access_key_id=os.environ.get('AWS_ACCESS_KEY_ID'),
-                            aws_secret_access_key=os.environ.get('AWS_SECRET_ACCESS_KEY'),
-                            region_name=os.environ.get('AWS_REGION', 'us-east-1')
-                        )
-                        bucket_name = os.environ.get('AWS_BUCKET_NAME', 'streamlet')
-                        region = os.environ.get('AWS_REGION', 'us-east-1')
-                        
-                        all_mockup_s3_urls = {}
                         all_mockup_results = st.session_state.product_data_to_save["all_mockup_results"]
                         product_data = st.session_state.product_data_to_save
                         sizes = product_data["sizes"]
                         colors = product_data["colors"]
                         color_hex_set = {color_name_to_hex(color) for color in colors}
                         
-                        total_iterations = sum(len([m for m in mockup_set['results'] if m['color'] in color_hex_set]) for mockup_set in all_mockup_results)
                         progress_bar = st.progress(0)
-                        completed = 0
-                        
-                        temp_dir = tempfile.mkdtemp()
                         
-                        st.session_state.used_sku_numbers = set()
-                        st.session_state.sku_sequence_number = None
+                        item_sku = st.session_state.selected_product_data['item_sku'] if st.session_state.selected_product_data and 'item_sku' in st.session_state.selected_product_data else "unknown"
                         
-                        color_to_mockup_urls = {}
-                        
-                        for mockup_set_idx, mockup_set in enumerate(all_mockup_results):
+                        # Stream every rendered mockup into S3 concurrently
+                        transfer_items = []
+                        transfer_targets = {}
+                        for mockup_set in all_mockup_results:
                             mockup_id = mockup_set['mockup_id']
                             
-                            filtered_results = [m for m in mockup_set['results'] if m['color'] in color_hex_set]
-                            
-                            for mockup in filtered_results:
+                            for mockup in mockup_set['results']:
                                 hex_color = mockup['color']
-                                mockup_url = mockup['rendered_image_url']
-                                
-                                if hex_color not in color_to_mockup_urls:
-                                    color_to_mockup_urls[hex_color] = {}
-                                
-                                try:
-                                    response = requests.get(mockup_url, timeout=15)
-                                    if response.status_code == 200:
-                                        color_name = hex_to_color_name(hex_color.lstrip('#'))
-                                        temp_sku = generate_product_sku(
-                                            parent_sku=st.session_state.selected_product_data['item_sku'] if st.session_state.selected_product_data and 'item_sku' in st.session_state.selected_product_data else None,
-                                            size=sizes[0] if sizes else None,
-                                            color=color_name
-                                        )
-                                        item_sku = st.session_state.selected_product_data['item_sku'] if st.session_state.selected_product_data and 'item_sku' in st.session_state.selected_product_data else "unknown"
-                                        local_filename = f"mockup_{item_sku}_{color_name}_{mockup_id[-6:]}.png"
-                                        local_filepath = os.path.join(temp_dir, local_filename)
-                                        
-                                        with open(local_filepath, 'wb') as f:
-                                            f.write(response.content)
-                                        
-                                        s3_key = f"mockups/{local_filename}"
-                                        try:
-                                            s3_client.upload_file(
-                                                local_filepath,
-                                                bucket_name,
-                                                s3_key,
-                                                ExtraArgs={
-                                                    'ContentType': 'image/png',
-                                                    'StorageClass': 'STANDARD',
-                                                },
-                                                Config=boto3.s3.transfer.TransferConfig(
-                                                    use_threads=True,
-                                                    max_concurrency=10,
-                                                    multipart_threshold=8388608,
-                                                    multipart_chunksize=8388608,
-                                                )
-                                            )
-                                            
-                                            s3_url = f"https://{bucket_name}.s3.{region}.amazonaws.com/{s3_key}"
-                                            color_to_mockup_urls[hex_color][mockup_id] = s3_url
-                                        except Exception as e:
-                                            st.warning(f"Error uploading to S3: {e}")
-                                        
-                                        try:
-                                            os.unlink(local_filepath)
-                                        except Exception:
-                                            pass
-                                    else:
-                                        st.warning(f"Failed to download mockup (Status: {response.status_code})")
-                                    
-                                except Exception as e:
-                                    st.warning(f"Error processing mockup: {e}")
+                                if hex_color not in color_hex_set:
+                                    continue
                                 
-                                completed += 1
-                                progress_bar.progress(min(completed / total_iterations, 1.0))
+                                color_name = hex_to_color_name(hex_color.lstrip('#'))
+                                s3_key = f"mockups/mockup_{item_sku}_{color_name}_{mockup_id[-6:]}.png"
+                                transfer_items.append((mockup['rendered_image_url'], s3_key))
+                                transfer_targets[s3_key] = (hex_color, mockup_id)
+                        
+                        def on_transfer_progress(completed, total, s3_key, s3_url):
+                            if not s3_url:
+                                st.warning(f"Failed to transfer mockup to S3: {s3_key}")
+                            progress_bar.progress(min(completed / total, 1.0))
                         
-                        import shutil
-                        try:
-                            shutil.rmtree(temp_dir)
-                        except Exception:
-                            pass
+                        transferred = transfer_urls_to_s3(
+                            transfer_items,
+                            s3_client,
+                            on_progress=on_transfer_progress
+                        )
+                        
+                        # Group S3 URLs by color, keeping template order
+                        color_to_mockup_urls = {}
+                        for _, s3_key in transfer_items:
+                            hex_color, mockup_id = transfer_targets[s3_key]
+                            if hex_color not in color_to_mockup_urls:
+                                color_to_mockup_urls[hex_color] = {}
+                            if transferred.get(s3_key):
+                                color_to_mockup_urls[hex_color][mockup_id] = transferred[s3_key]
                         
                         parent_sku = ""
                         if st.session_state.selected_product_id:
@@ -1193,9 +1116,6 @@ elif st.session_state.get("authentication_status") is True:
                         
                         success_count = 0
                         
-                        st.session_state.used_sku_numbers = set()
-                        st.session_state.sku_sequence_number = None
-                        
                         product_variants = {}
                         for hex_color, mockup_urls_by_id in color_to_mockup_urls.items():
                             color_name = hex_to_color_name(hex_color.lstrip('#'))
@@ -1227,13 +1147,22 @@ elif st.session_state.get("authentication_status") is True:
                                         
                                 product_variants[variant_key]['mockup_url_dict'][hex_color] = mockup_urls_by_id
                         
-                        for variant_key, variant_data in product_variants.items():
+                        # Reserve one SKU number per variant in a single round-trip
+                        sku_numbers = db.allocate_sku_numbers(f"{get_sku_base(parent_sku)}:variant", len(product_variants))
+                        clear_sku_previews()
+                        if len(sku_numbers) < len(product_variants):
+                            st.error("Could not reserve SKU numbers; nothing was saved")
+                            st.stop()
+                        
+                        variant_products = []
+                        for (variant_key, variant_data), sku_number in zip(product_variants.items(), sku_numbers):
                             size, color = variant_key
                             try:
                                 current_design_sku = generate_product_sku(
                                     parent_sku=parent_sku,
                                     size=size,
-                                    color=color
+                                    color=color,
+                                    sku_number=sku_number
                                 )
                                 
                                 mockup_urls_json = {}
@@ -1257,12 +1186,14 @@ elif st.session_state.get("authentication_status") is True:
                                 if st.session_state.selected_product_id:
                                     product_dict["parent_product_id"] = st.session_state.selected_product_id
                                 
-                                new_id = db.create_generated_product(product_dict)
-                                if new_id:
-                                    success_count += 1
+                                variant_products.append(product_dict)
                             except Exception as e:
                                 st.error(f"Error saving variant {size}/{color}: {str(e)}")
                         
+                        # Insert every variant in one transaction
+                        new_ids = db.create_generated_products_bulk(variant_products)
+                        success_count = len(new_ids)
+                        
                         if success_count > 0:
                             st.success(f"Successfully saved {success_count} product variants to database!")
                             st.session_state.product_data_to_save = None
@@ -1481,31 +1412,13 @@ elif st.session_state.get("authentication_status") is True:
 
 def upload_to_s3(local_path, s3_key):
     try:
-        import boto3
-        from botocore.exceptions import ClientError
-        import os
-        
-        s3_client = boto3.client(
-            's3',
-            aws_access_key_id=os.environ.get('AWS_ACCESS_KEY_ID'),
-            aws_secret_access_key=os.environ.get('AWS_SECRET_ACCESS_KEY'),
-            region_name=os.environ.get('AWS_REGION', 'us-east-1')
-        )
-        
-        bucket_name = os.environ.get('S3_BUCKET_NAME', 'streamlet')
-        region = os.environ.get('AWS_REGION', 'us-east-1')
-        
-        s3_client.upload_file(
-            local_path,
-            bucket_name,
-            s3_key,
-            ExtraArgs={
-                'ContentType': 'image/png',
-            }
-        )
+        s3_client = get_s3_client()
+        if not s3_client:
+            return None
         
-        s3_url = f"https://{bucket_name}.s3.{region}.amazonaws.com/{s3_key}"
+        with open(local_path, 'rb') as local_file:
+            s3_url, _ = upload_stream_to_s3(local_file, s3_key, 'image/png', s3_client)
         return s3_url
     except Exception as e:
         st.error(f"Error uploading to S3: {e}")
-        return None
\ No newline at end of file
+        return None
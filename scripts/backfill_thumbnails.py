@@ -0,0 +1,95 @@
+"""
+Create list-view thumbnails for images uploaded before thumbnails existed
+
+Finds every image URL in our bucket that is referenced by products,
+generated_products, variant_mockup or render_cache and has no recorded
+thumbnails, then creates and records them. Safe to re-run.
+
+Usage (from the project root):
+    python -m scripts.backfill_thumbnails [--limit N] [--dry-run]
+"""
+import argparse
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from config import THUMBNAIL_WIDTHS, TRANSFER_MAX_WORKERS
+from utils.database import THUMBNAIL_UPSERT, design_key, thumbnail_rows
+from utils.migrations import connect
+from utils.s3_storage import shared_s3_client, s3_key_from_url, thumbnails_from_s3
+
+# Tables and columns holding single image URLs
+IMAGE_COLUMNS = [
+    ('products', 'image_url'),
+    ('generated_products', 'original_design_url'),
+    ('variant_mockup', 'image_url'),
+    ('render_cache', 'image_url'),
+]
+
+def image_urls(cursor):
+    """Distinct image URLs that live in our bucket"""
+    urls = set()
+    for table, column in IMAGE_COLUMNS:
+        cursor.execute(f"SELECT DISTINCT {column} FROM {table} WHERE {column} IS NOT NULL AND {column} <> ''")
+        urls.update(row[0] for row in cursor.fetchall() if s3_key_from_url(row[0]))
+    return sorted(urls)
+
+def complete_keys(cursor):
+    """source_key of every image that already has all configured thumbnails"""
+    cursor.execute(
+        "SELECT source_key FROM image_thumbnail WHERE width IN ({}) "
+        "GROUP BY source_key HAVING COUNT(*) = %s".format(", ".join(["%s"] * len(THUMBNAIL_WIDTHS))),
+        (*THUMBNAIL_WIDTHS, len(THUMBNAIL_WIDTHS))
+    )
+    return {row[0] for row in cursor.fetchall()}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create missing list-view thumbnails")
+    parser.add_argument('--limit', type=int, default=None, help="Process at most this many images")
+    parser.add_argument('--dry-run', action='store_true', help="Only report how many images need thumbnails")
+    args = parser.parse_args(argv)
+
+    if not THUMBNAIL_WIDTHS:
+        print("THUMBNAIL_WIDTHS is empty; nothing to do.")
+        return 0
+
+    connection = connect()
+    try:
+        cursor = connection.cursor()
+        done = complete_keys(cursor)
+        pending = [url for url in image_urls(cursor) if design_key(url) not in done]
+        if args.limit is not None:
+            pending = pending[:args.limit]
+        print(f"{len(pending)} images need thumbnails")
+        if args.dry_run or not pending:
+            return 0
+
+        s3_client = shared_s3_client()
+        if not s3_client:
+            print("S3 is not configured")
+            return 1
+
+        failed = 0
+        with ThreadPoolExecutor(max_workers=TRANSFER_MAX_WORKERS, thread_name_prefix="thumbnails") as executor:
+            futures = {executor.submit(thumbnails_from_s3, url, s3_client): url for url in pending}
+            for count, future in enumerate(as_completed(futures), 1):
+                url = futures[future]
+                try:
+                    thumbnails = future.result()
+                except Exception as e:
+                    thumbnails = {}
+                    print(f"Error processing {url}: {e}")
+                if not thumbnails:
+                    failed += 1
+                    continue
+                cursor.executemany(THUMBNAIL_UPSERT, thumbnail_rows({url: thumbnails}))
+                connection.commit()
+                if count % 100 == 0:
+                    print(f"{count}/{len(pending)} done")
+
+        print(f"Created thumbnails for {len(pending) - failed} images, {failed} failed")
+        return 1 if failed else 0
+    finally:
+        connection.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
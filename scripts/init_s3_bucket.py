@@ -1,32 +1,22 @@
-import boto3
-import os
-from botocore.exceptions import ClientError
-from dotenv import load_dotenv
+"""
+Create and configure the S3 bucket for product images
 
-# Load environment variables
-load_dotenv()
+Usage (from the project root):
+    python -m scripts.init_s3_bucket
+"""
+from botocore.exceptions import ClientError
 
-# AWS Configuration
-AWS_ACCESS_KEY_ID = os.getenv('AWS_ACCESS_KEY_ID')
-AWS_SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY')
-AWS_REGION = os.getenv('AWS_REGION', 'us-east-1')
-S3_BUCKET_NAME = os.getenv('S3_BUCKET_NAME')
+# AWS configuration and the shared client come from the storage module
+from utils.s3_storage import AWS_REGION, S3_BUCKET_NAME, shared_s3_client
 
 def create_s3_bucket():
     """Create an S3 bucket for product images with public read access"""
     
-    if not all([AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, S3_BUCKET_NAME]):
-        print("Error: Missing AWS credentials or bucket name. Check your .env file.")
-        return False
-    
     try:
-        # Create S3 client
-        s3_client = boto3.client(
-            's3',
-            aws_access_key_id=AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-            region_name=AWS_REGION
-        )
+        s3_client = shared_s3_client()
+        if not s3_client:
+            print("Error: Missing AWS credentials or bucket name. Check your .env file.")
+            return False
         
         # Create bucket with appropriate configuration
         if AWS_REGION == 'us-east-1':
@@ -1,6 +1,5 @@
 import os
 import sys
-import boto3
 from botocore.exceptions import ClientError
 from dotenv import load_dotenv
 import mysql.connector
@@ -46,12 +45,11 @@ def check_database_connection():
 def check_s3_connection():
     """Test S3 connection and bucket access"""
     try:
-        s3_client = boto3.client(
-            's3',
-            aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
-            aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
-            region_name=os.getenv('AWS_REGION')
-        )
+        from utils.s3_storage import shared_s3_client
+        s3_client = shared_s3_client()
+        if not s3_client:
+            print("❌ S3 is not configured. Check your .env file.")
+            return False
         
         # Test if bucket exists and is accessible
         s3_client.head_bucket(Bucket=os.getenv('S3_BUCKET_NAME'))
@@ -34,18 +34,12 @@ def create_test_image():
     img.save(img_bytes, format='PNG')
     img_bytes.seek(0)
     
-    # Create a mock Streamlit uploaded file
-    class MockUploadedFile:
+    # Create a mock Streamlit uploaded file (UploadedFile is a BytesIO too)
+    class MockUploadedFile(io.BytesIO):
         def __init__(self, content, filename, content_type):
-            self.content = content
+            super().__init__(content)
             self.name = filename
             self.type = content_type
-            
-        def getvalue(self):
-            return self.content
-            
-        def getbuffer(self):
-            return self.content
     
     return MockUploadedFile(img_bytes.getvalue(), "test_image.png", "image/png")
 
@@ -1,11 +1,12 @@
 import os
-import requests
 import streamlit as st
 from PIL import Image
 import uuid
 import io
 from config import API_KEY, API_URL, IMAGES_DIR, S3_CONFIG
 from utils.s3_storage import upload_image_file_to_s3, upload_mockup_to_s3
+from utils.http_client import get_http_session
+from utils.image_cache import get_image_bytes
 
 def ensure_images_dir():
     """
@@ -33,16 +34,17 @@ def generate_mockup(image_path_or_url, template_id="t-shirt", is_s3_url=False):
     try:
         url = f"{API_URL}/mockups"
         
-        # If we have an S3 URL, we need to download the file first
+        # If we have an S3 URL, we need the file first; the local cache saves
+        # re-downloading a design that was rendered before
         if is_s3_url:
-            response = requests.get(image_path_or_url)
-            if response.status_code != 200:
-                st.error(f"Failed to download image from S3: {response.status_code}")
+            try:
+                image_file = io.BytesIO(get_image_bytes(image_path_or_url))
+            except IOError as e:
+                st.error(f"Failed to download image from S3: {e}")
                 return None
                 
-            # Create a temporary file-like object
-            image_file = io.BytesIO(response.content)
-            filename = f"temp_image_{uuid.uuid4()}.png"  # Name for the file in the request
+            # Name for the file in the request
+            filename = f"temp_image_{uuid.uuid4()}.png"
         else:
             # Open the local file
             if not os.path.exists(image_path_or_url):
@@ -67,7 +69,7 @@ def generate_mockup(image_path_or_url, template_id="t-shirt", is_s3_url=False):
             
             # Make the API request
             st.info("Sending request to DynamicMockups API...")
-            response = requests.post(url, files=files, data=data, headers=headers)
+            response = get_http_session().post(url, files=files, data=data, headers=headers)
             
             if response.status_code == 200:
                 result = response.json()
@@ -148,7 +150,7 @@ def verify_api_functionality():
         
         # Make a test request to the API (using templates endpoint which is lightweight)
         test_url = f"{API_URL}/templates"  # Most APIs have a templates or similar endpoint
-        response = requests.get(test_url, headers=headers)
+        response = get_http_session().get(test_url, headers=headers)
         
         if response.status_code == 200:
             return True, "API connection successful"
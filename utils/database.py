@@ -1,16 +1,126 @@
 import mysql.connector
 from mysql.connector import Error
 from mysql.connector import pooling
+from mysql.connector import errorcode
 import streamlit as st
 import pandas as pd
-from config import DB_CONFIG
+from config import DB_CONFIG, DB_POOL_SIZE, DB_POOL_TIMEOUT, EXPORT_CHUNK_SIZE, STATS_CACHE_TTL
+from utils.migrations import pending_migrations
+from utils.variant_store import replace_variants, replace_product_templates
+from contextlib import contextmanager
+import functools
+import hashlib
 import os
 import sys
+import threading
 import time
 
 # Global connection pool - will be initialized once and reused
 connection_pool = None
 
+# Columns that the projection-aware query methods may select, filter or sort
+# on, with the pandas dtype each one is converted to
+TABLE_COLUMNS = {
+    'products': {
+        'id': 'int64',
+        'product_name': 'object',
+        'item_sku': 'object',
+        'parent_child': 'object',
+        'parent_sku': 'object',
+        'size': 'object',
+        'color': 'object',
+        'image_url': 'object',
+        'marketplace_title': 'object',
+        'category': 'object',
+        'tax_class': 'object',
+        'quantity': 'int64',
+        'price': 'float64',
+        'created_at': 'datetime64[ns]',
+        'mockup_id': 'object',
+        'smart_object_uuid': 'object',
+        'mockup_ids': 'object',
+        'smart_object_uuids': 'object',
+    },
+    'generated_products': {
+        'id': 'int64',
+        'product_name': 'object',
+        'item_sku': 'object',
+        'marketplace_title': 'object',
+        'size': 'object',
+        'color': 'object',
+        'original_design_url': 'object',
+        'mockup_urls': 'object',
+        'created_at': 'datetime64[ns]',
+        'updated_at': 'datetime64[ns]',
+        'is_published': 'bool',
+        'parent_product_id': 'Int64',
+        'parent_sku': 'object',
+        'parent_child': 'object',
+        'design_key': 'object',
+    },
+}
+
+# item_sku is unique (uq_item_sku); a duplicate fails with ER_DUP_ENTRY
+GENERATED_PRODUCT_INSERT = """
+            INSERT INTO generated_products (
+                product_name, parent_sku, marketplace_title, size, color,
+                original_design_url, mockup_urls, is_published, parent_product_id, item_sku, design_key
+            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """
+
+def like_pattern(term):
+    """
+    Build a LIKE pattern matching a search term anywhere in a value
+
+    The term's own backslashes, % and _ are escaped (with LIKE's default
+    backslash escape), so the _ in a SKU such as AB_12 matches literally.
+    """
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
+
+def sku_key(sku):
+    """Compare SKUs the way the item_sku collation does (case-insensitive, trailing spaces ignored)"""
+    return str(sku).rstrip().upper()
+
+def design_key(design_url):
+    """
+    Indexed lookup key for a design URL
+    
+    Matches SHA2(original_design_url, 256) as computed by the backfill migration.
+    
+    Args:
+        design_url (str): Original design URL
+        
+    Returns:
+        str: Hex SHA-256 of the URL, or None when there is no URL
+    """
+    if not design_url:
+        return None
+    return hashlib.sha256(design_url.encode('utf-8')).hexdigest()
+
+# Records the thumbnails of one source image; shared with the backfill script
+THUMBNAIL_UPSERT = """
+            INSERT INTO image_thumbnail (source_key, width, thumbnail_url)
+            VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE thumbnail_url = VALUES(thumbnail_url)
+            """
+
+def thumbnail_rows(thumbnails_by_url):
+    """
+    Turn uploaded thumbnails into image_thumbnail rows
+
+    Args:
+        thumbnails_by_url (dict): Mapping of source image URL to {width: thumbnail URL}
+
+    Returns:
+        list: (source_key, width, thumbnail_url) tuples for THUMBNAIL_UPSERT
+    """
+    return [
+        (design_key(source_url), int(width), thumbnail_url)
+        for source_url, thumbnails in thumbnails_by_url.items() if source_url
+        for width, thumbnail_url in (thumbnails or {}).items() if thumbnail_url
+    ]
+
 def init_connection_pool():
     """Initialize a connection pool that can be shared across sessions"""
     global connection_pool
@@ -21,7 +131,7 @@ def init_connection_pool():
         # Configure pool with connection parameters
         pool_config = {
             'pool_name': 'demo_image_app_pool',
-            'pool_size': 5,  # Adjust based on your needs and server limits
+            'pool_size': DB_POOL_SIZE,
             'pool_reset_session': True,
             'host': DB_CONFIG['host'],
             'port': DB_CONFIG.get('port', 3306),
@@ -46,49 +156,165 @@ def init_connection_pool():
         st.error(f"Error creating connection pool: {e}")
         return None
 
+def _pooled(method):
+    """Run a Database method with a connection borrowed for the duration of the call"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        # Nested calls reuse the connection the thread already holds
+        if self.connection is not None:
+            return method(self, *args, **kwargs)
+            
+        try:
+            self._hold(self._acquire_connection())
+        except Error as e:
+            # The method reports the failure through _check_connection()
+            print(f"Could not borrow a database connection: {e}")
+            return method(self, *args, **kwargs)
+            
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self._release_connection()
+    return wrapper
+
 class Database:
+    """
+    Database access shared by every Streamlit session
+    
+    The instance holds no connection of its own. Each public method borrows a
+    connection from the pool for the length of the call and returns it
+    afterwards, so concurrent sessions never share a cursor. Inside a method,
+    self.connection and self.cursor refer to the connection borrowed by the
+    calling thread.
+    """
+    
     def __init__(self):
-        """Initialize database connection"""
-        self.connection = None
-        self.cursor = None
+        """Initialize database access"""
+        self._local = threading.local()
         self.max_reconnect_attempts = 3
         self.reconnect_delay = 2  # seconds
         
-        # Get a connection from the pool instead of creating a new one
-        self._get_connection_from_pool()
+        # Dashboard statistics as (computed_at, stats), shared by all sessions
+        self._stats_cache = None
+        self._stats_lock = threading.Lock()
         
-    def _get_connection_from_pool(self):
-        """Get a connection from the connection pool"""
-        global connection_pool
+        self._setup()
+    
+    @property
+    def connection(self):
+        """Connection borrowed by the current thread, or None outside an operation"""
+        return getattr(self._local, 'connection', None)
+    
+    @property
+    def cursor(self):
+        """Dictionary cursor on the connection borrowed by the current thread"""
+        return getattr(self._local, 'cursor', None)
+    
+    @contextmanager
+    def borrow_connection(self):
+        """
+        Borrow a connection for one operation
+        
+        Nested calls on the same thread reuse the connection that is already
+        borrowed, so a method may call other methods without taking a second
+        connection from the pool. The connection goes back to the pool when the
+        outermost block exits, with any uncommitted transaction rolled back.
         
+        Yields:
+            cursor: Dictionary cursor on the borrowed connection
+            
+        Raises:
+            Error: If no connection could be obtained
+        """
+        if self.connection is not None:
+            yield self.cursor
+            return
+            
+        self._hold(self._acquire_connection())
         try:
-            # Initialize the pool if it doesn't exist
-            if connection_pool is None:
-                connection_pool = init_connection_pool()
-            
-            if connection_pool is None:
-                # If pool initialization failed, fall back to direct connection methods
-                if not self._connect_with_ssl():
-                    if not self._connect_without_ssl_verify():
-                        self._connect_without_ssl()
-                return
-                
-            # Get a connection from the pool
-            self.connection = connection_pool.get_connection()
-            if self.connection.is_connected():
-                self.cursor = self.connection.cursor(dictionary=True)
-                server_info = self.connection.get_server_info()
-                st.success(f"Connected to MySQL server version {server_info} (pooled connection)")
+            yield self.cursor
+        finally:
+            self._release_connection()
+    
+    def _hold(self, connection):
+        """Make a connection the current thread's borrowed connection"""
+        self._local.connection = connection
+        self._local.cursor = connection.cursor(dictionary=True)
+    
+    def _acquire_connection(self):
+        """
+        Get a connection from the pool, waiting up to DB_POOL_TIMEOUT seconds for a free one
+        
+        Falls back to a direct connection when the pool could not be created.
+        
+        Returns:
+            MySQLConnection: Open connection the caller must close
+            
+        Raises:
+            Error: If no connection could be obtained
+        """
+        global connection_pool
+        
+        # Initialize the pool if it doesn't exist
+        if connection_pool is None:
+            connection_pool = init_connection_pool()
+            
+        if connection_pool is None:
+            return self._connect_direct()
+            
+        deadline = time.monotonic() + DB_POOL_TIMEOUT
+        while True:
+            try:
+                connection = connection_pool.get_connection()
+                break
+            except pooling.PoolError:
+                # Pool exhausted; wait for another session to return a connection
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.05)
                 
-                # Create tables if they don't exist
-                self._create_tables()
-        except Error as e:
-            st.warning(f"Pool connection failed: {e}. Trying direct connection methods...")
-            # Fall back to direct connection methods
-            if not self._connect_with_ssl():
-                if not self._connect_without_ssl_verify():
-                    self._connect_without_ssl()
-
+        if not connection.is_connected():
+            connection.reconnect(attempts=self.max_reconnect_attempts, delay=self.reconnect_delay)
+        return connection
+    
+    def _release_connection(self):
+        """Close the current thread's cursor and return its connection to the pool"""
+        connection = self._local.connection
+        cursor = self._local.cursor
+        self._local.connection = None
+        self._local.cursor = None
+        
+        try:
+            cursor.close()
+        except Error:
+            pass
+        try:
+            if connection.in_transaction:
+                connection.rollback()
+        except Error:
+            pass
+        try:
+            # For pooled connections this returns the connection to the pool
+            connection.close()
+        except Error:
+            pass
+    
+    def _connect_direct(self):
+        """
+        Open a direct connection, trying SSL, SSL without verification and plain connections in turn
+        
+        Returns:
+            MySQLConnection: Open connection
+            
+        Raises:
+            Error: If every connection attempt failed
+        """
+        for connect in (self._connect_with_ssl, self._connect_without_ssl_verify, self._connect_without_ssl):
+            connection = connect()
+            if connection is not None:
+                return connection
+        raise Error("All connection attempts failed. Please check your database configuration.")
+    
     def _connect_with_ssl(self):
         """Try to connect with SSL"""
         try:
@@ -99,10 +325,9 @@ class Database:
                     'ssl_ca': DB_CONFIG['ssl_ca'],
                     'ssl_verify_cert': DB_CONFIG.get('ssl_verify', True),
                 }
-                st.info(f"Attempting connection with SSL certificate: {DB_CONFIG['ssl_ca']}")
             
             # Connect to database with SSL
-            self.connection = mysql.connector.connect(
+            connection = mysql.connector.connect(
                 host=DB_CONFIG['host'],
                 port=DB_CONFIG.get('port', 3306),
                 database=DB_CONFIG['database'],
@@ -111,18 +336,10 @@ class Database:
                 **ssl_config
             )
             
-            if self.connection.is_connected():
-                self.cursor = self.connection.cursor(dictionary=True)
-                server_info = self.connection.get_server_info()
-                st.success(f"Connected to MySQL server version {server_info} with SSL")
-                
-                # Create tables if they don't exist
-                self._create_tables()
-                return True
-            return False
+            return connection if connection.is_connected() else None
         except Error as e:
             st.warning(f"SSL connection attempt failed: {e}")
-            return False
+            return None
     
     def _connect_without_ssl_verify(self):
         """Try to connect with SSL but without verification"""
@@ -132,10 +349,9 @@ class Database:
                 'ssl_ca': DB_CONFIG.get('ssl_ca', ''),
                 'ssl_verify_cert': False,
             }
-            st.info("Attempting connection with SSL but without certificate verification")
             
             # Connect to database with SSL but without verification
-            self.connection = mysql.connector.connect(
+            connection = mysql.connector.connect(
                 host=DB_CONFIG['host'],
                 port=DB_CONFIG.get('port', 3306),
                 database=DB_CONFIG['database'],
@@ -144,26 +360,16 @@ class Database:
                 **ssl_config
             )
             
-            if self.connection.is_connected():
-                self.cursor = self.connection.cursor(dictionary=True)
-                server_info = self.connection.get_server_info()
-                st.success(f"Connected to MySQL server version {server_info} with SSL (no verification)")
-                
-                # Create tables if they don't exist
-                self._create_tables()
-                return True
-            return False
+            return connection if connection.is_connected() else None
         except Error as e:
             st.warning(f"SSL without verification connection attempt failed: {e}")
-            return False
+            return None
     
     def _connect_without_ssl(self):
         """Try to connect without SSL as last resort"""
         try:
-            st.info("Attempting connection without SSL as last resort")
-            
             # Connect to database without SSL
-            self.connection = mysql.connector.connect(
+            connection = mysql.connector.connect(
                 host=DB_CONFIG['host'],
                 port=DB_CONFIG.get('port', 3306),
                 database=DB_CONFIG['database'],
@@ -172,25 +378,17 @@ class Database:
                 use_pure=True  # Use pure Python implementation
             )
             
-            if self.connection.is_connected():
-                self.cursor = self.connection.cursor(dictionary=True)
-                server_info = self.connection.get_server_info()
-                st.success(f"Connected to MySQL server version {server_info} without SSL")
-                
-                # Create tables if they don't exist
-                self._create_tables()
-                return True
-            
-            st.error("All connection attempts failed. Please check your database configuration.")
-            return False
+            return connection if connection.is_connected() else None
         except Error as e:
             st.error(f"Connection without SSL failed: {e}")
-            return False
+            return None
 
     def _check_connection(self):
-        """Check if connection is alive and reconnect if necessary"""
+        """Check that the current operation has a live connection, reconnecting if necessary"""
         try:
-            if self.connection is None or not self.connection.is_connected():
+            if self.connection is None:
+                return False
+            if not self.connection.is_connected():
                 st.warning("Database connection lost. Attempting to reconnect...")
                 return self.reconnect()
             return True
@@ -199,190 +397,81 @@ class Database:
             return self.reconnect()
     
     def reconnect(self):
-        """Attempt to reconnect to the database"""
-        attempts = 0
-        
-        while attempts < self.max_reconnect_attempts:
-            try:
-                attempts += 1
-                st.info(f"Reconnection attempt {attempts}/{self.max_reconnect_attempts}...")
-                
-                # Close existing connections if they exist
-                if hasattr(self, 'cursor') and self.cursor is not None:
-                    try:
-                        self.cursor.close()
-                    except:
-                        pass
-                    
-                if hasattr(self, 'connection') and self.connection is not None:
-                    try:
-                        self.connection.close()
-                    except:
-                        pass
-                
-                # Reset connection attributes
-                self.connection = None
-                self.cursor = None
-                
-                # Try reconnecting with the same strategy as in __init__
-                if self._connect_with_ssl():
-                    return True
-                if self._connect_without_ssl_verify():
-                    return True
-                if self._connect_without_ssl():
-                    return True
-                
-                # If we reach here, reconnection failed
-                st.warning(f"Reconnection attempt {attempts} failed. Retrying in {self.reconnect_delay} seconds...")
-                time.sleep(self.reconnect_delay)
-                
-            except Exception as e:
-                st.warning(f"Reconnection error: {e}. Retrying in {self.reconnect_delay} seconds...")
-                time.sleep(self.reconnect_delay)
-                
-        st.error("Failed to reconnect to database after multiple attempts.")
-        return False
-
-    def _create_tables(self):
-        """Create necessary tables if they don't exist"""
-        if not self.cursor:
-            st.error("No database cursor available. Tables not created.")
-            return
+        """Reconnect the connection borrowed by the current operation"""
+        if self.connection is None:
+            return False
             
-        create_products_table = """
-        CREATE TABLE IF NOT EXISTS products (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            product_name VARCHAR(255) NOT NULL,
-            item_sku VARCHAR(100) NOT NULL,
-            parent_child ENUM('Parent', 'Child') NOT NULL,
-            parent_sku VARCHAR(100) NULL,
-            size TEXT NULL,
-            color TEXT NULL,
-            image_url TEXT NULL,
-            marketplace_title TEXT NULL,
-            category VARCHAR(1000) NULL,
-            tax_class VARCHAR(50) NULL,
-            quantity INT NOT NULL DEFAULT 0,
-            price DECIMAL(10, 2) NOT NULL DEFAULT 0.00,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            mockup_id VARCHAR(100) NULL,
-            smart_object_uuid VARCHAR(100) NULL,
-            mockup_ids TEXT NULL,
-            smart_object_uuids TEXT NULL
-        )
-        """
-        self.cursor.execute(create_products_table)
-        
-        # Create generated_products table if it doesn't exist
-        create_generated_products_table = """
-        CREATE TABLE IF NOT EXISTS generated_products (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            product_name VARCHAR(255) NOT NULL,
-            item_sku VARCHAR(100) NULL,
-            marketplace_title TEXT NULL,
-            size TEXT NULL,
-            color TEXT NULL,
-            original_design_url TEXT NULL,
-            mockup_urls TEXT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-            is_published BOOLEAN DEFAULT FALSE,
-            parent_product_id INT NULL,
-            parent_sku VARCHAR(100) NULL,
-            parent_child VARCHAR(10) DEFAULT 'Child',
-
-            INDEX idx_item_sku (item_sku),
-            INDEX idx_parent_sku (parent_sku),
-            INDEX idx_created_at (created_at),
-            INDEX idx_is_published (is_published),
-            INDEX idx_parent_product_id (parent_product_id)
-        )
-        """
-        self.cursor.execute(create_generated_products_table)
-        
-        # Create ftp_settings table if it doesn't exist
-        create_ftp_settings_table = """
-        CREATE TABLE IF NOT EXISTS ftp_settings (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            host VARCHAR(255) NOT NULL,
-            port INT NOT NULL DEFAULT 21,
-            username VARCHAR(255) NOT NULL,
-            password VARCHAR(255) NOT NULL,
-            is_default BOOLEAN DEFAULT FALSE,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
-        )
-        """
-        self.cursor.execute(create_ftp_settings_table)
-        self.connection.commit()
-        
-        # Check if columns exist and add them if they don't
         try:
-            # Check if mockup_id column exists
-            self.cursor.execute("SHOW COLUMNS FROM products LIKE 'mockup_id'")
-            if not self.cursor.fetchone():
-                self.cursor.execute("ALTER TABLE products ADD COLUMN mockup_id VARCHAR(255) NULL")
-            
-            # Check if smart_object_uuid column exists
-            self.cursor.execute("SHOW COLUMNS FROM products LIKE 'smart_object_uuid'")
-            if not self.cursor.fetchone():
-                self.cursor.execute("ALTER TABLE products ADD COLUMN smart_object_uuid VARCHAR(255) NULL")
-            
-            # Check if item_sku column exists in generated_products
-            self.cursor.execute("SHOW COLUMNS FROM generated_products LIKE 'item_sku'")
-            if not self.cursor.fetchone():
-                self.cursor.execute("ALTER TABLE generated_products ADD COLUMN item_sku VARCHAR(100) NULL")
-                self.cursor.execute("ALTER TABLE generated_products ADD INDEX idx_item_sku (item_sku)")
-            
-            # Check if parent_sku column exists in generated_products
-            self.cursor.execute("SHOW COLUMNS FROM generated_products LIKE 'parent_sku'")
-            if not self.cursor.fetchone():
-                self.cursor.execute("ALTER TABLE generated_products ADD COLUMN parent_sku VARCHAR(100) NULL")
-                
-            # Check if mockup_ids column exists
-            self.cursor.execute("SHOW COLUMNS FROM products LIKE 'mockup_ids'")
-            if not self.cursor.fetchone():
-                self.cursor.execute("ALTER TABLE products ADD COLUMN mockup_ids TEXT NULL")
-            
-            # Check if smart_object_uuids column exists
-            self.cursor.execute("SHOW COLUMNS FROM products LIKE 'smart_object_uuids'")
-            if not self.cursor.fetchone():
-                self.cursor.execute("ALTER TABLE products ADD COLUMN smart_object_uuids TEXT NULL")
-            
-            self.connection.commit()
+            self.connection.reconnect(attempts=self.max_reconnect_attempts, delay=self.reconnect_delay)
+            self._local.cursor = self.connection.cursor(dictionary=True)
+            return True
         except Error as e:
-            st.error(f"Error modifying tables: {e}")
-        
-        self.connection.commit()
+            st.error(f"Failed to reconnect to database after multiple attempts: {e}")
+            return False
+
+    def _setup(self):
+        """
+        Check the connection and warn when the schema is behind
         
-        # Alter table to modify columns if they already exist with smaller size
+        No DDL runs here; the schema is managed by `python -m utils.migrations`,
+        which runs once per deploy.
+        """
         try:
-            alter_size_query = "ALTER TABLE products MODIFY COLUMN size TEXT"
-            self.cursor.execute(alter_size_query)
-            
-            alter_color_query = "ALTER TABLE products MODIFY COLUMN color TEXT"
-            self.cursor.execute(alter_color_query)
-            
-            # Add mockup_id and smart_object_uuid columns if they don't exist
-            check_column_query = """
-            SELECT COUNT(*) as column_exists FROM information_schema.columns 
-            WHERE table_schema = DATABASE() AND table_name = 'products' AND column_name = 'mockup_id'
-            """
-            self.cursor.execute(check_column_query)
-            result = self.cursor.fetchone()
-            
-            if result and result['column_exists'] == 0:
-                add_column_query = """
-                ALTER TABLE products 
-                ADD COLUMN mockup_id VARCHAR(100) NULL,
-                ADD COLUMN smart_object_uuid VARCHAR(100) NULL
-                """
-                self.cursor.execute(add_column_query)
+            with self.borrow_connection():
+                server_info = self.connection.get_server_info()
+                st.success(f"Connected to MySQL server version {server_info}")
                 
-            self.connection.commit()
+                pending = pending_migrations(self.cursor)
+                if pending:
+                    st.warning(
+                        f"Database schema is {len(pending)} migration(s) behind. "
+                        "Run `python -m utils.migrations` to update it."
+                    )
         except Error as e:
-            st.warning(f"Table alteration notice: {e}")
+            st.error(f"Database connection failed: {e}")
+
+    def _write_variants(self, products):
+        """
+        Keep the variant and variant_mockup tables in step with generated product writes
+        
+        Runs inside the caller's transaction.
+        
+        Args:
+            products (list): (generated_product_id, parent_product_id, product_data) tuples
+        """
+        replace_variants(self.cursor, [
+            (
+                product_id,
+                parent_id,
+                product_data.get('size', '[]'),
+                product_data.get('color', '[]'),
+                product_data.get('mockup_urls', '{}'),
+                product_data.get('mockup_ids')
+            )
+            for product_id, parent_id, product_data in products
+        ])
+    
+    def _write_product_templates(self, products):
+        """
+        Keep the product_template table in step with product writes
+        
+        Runs inside the caller's transaction.
+        
+        Args:
+            products (list): (product_id, product_data) tuples
+        """
+        replace_product_templates(self.cursor, [
+            (
+                product_id,
+                product_data.get('mockup_ids'),
+                product_data.get('smart_object_uuids'),
+                product_data.get('mockup_id'),
+                product_data.get('smart_object_uuid')
+            )
+            for product_id, product_data in products
+        ])
     
+    @_pooled
     def add_product(self, product_data):
         """
         Add a new product to the database
@@ -425,12 +514,16 @@ class Database:
             )
             
             self.cursor.execute(query, values)
+            product_id = self.cursor.lastrowid
+            self._write_product_templates([(product_id, product_data)])
             self.connection.commit()
-            return self.cursor.lastrowid
+            self.invalidate_stats()
+            return product_id
         except Error as e:
             st.error(f"Error adding product: {e}")
             return None
     
+    @_pooled
     def get_all_products(self):
         """
         Get all products from database
@@ -476,6 +569,7 @@ class Database:
             st.error(f"Error retrieving products: {e}")
             return pd.DataFrame()
     
+    @_pooled
     def get_product(self, product_id):
         """
         Get a specific product by ID
@@ -498,6 +592,7 @@ class Database:
             st.error(f"Error retrieving product {product_id}: {e}")
             return None
     
+    @_pooled
     def update_product(self, product_id, product_data):
         """
         Update a product
@@ -555,12 +650,15 @@ class Database:
             )
             
             self.cursor.execute(query, values)
+            self._write_product_templates([(product_id, product_data)])
             self.connection.commit()
+            self.invalidate_stats()
             return True
         except Error as e:
             st.error(f"Error updating product {product_id}: {e}")
             return False
             
+    @_pooled
     def create_generated_product(self, product_data):
         """
         Add a new generated product to the database
@@ -601,13 +699,6 @@ class Database:
                 st.error("Missing required field: item_sku")
                 return None
             
-            # Check if SKU already exists to avoid duplicates
-            query = "SELECT COUNT(*) as count FROM generated_products WHERE item_sku = %s"
-            self.cursor.execute(query, (product_data['item_sku'],))
-            result = self.cursor.fetchone()
-            if result and result['count'] > 0:
-                st.warning(f"SKU {product_data['item_sku']} already exists in database. Using it anyway.")
-            
             # Set parent_sku based on parent_product_id if available
             parent_sku = product_data.get('parent_sku', '')
             if not parent_sku and 'parent_product_id' in product_data and product_data['parent_product_id']:
@@ -618,13 +709,6 @@ class Database:
                 if parent_result:
                     parent_sku = parent_result['item_sku']
                 
-            query = """
-            INSERT INTO generated_products (
-                product_name, parent_sku, marketplace_title, size, color,
-                original_design_url, mockup_urls, is_published, parent_product_id, item_sku
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """
-            
             # Default to not published
             is_published = product_data.get('is_published', False)
             
@@ -638,21 +722,141 @@ class Database:
                 product_data.get('mockup_urls', '{}'),
                 is_published,
                 product_data.get('parent_product_id', None),
-                product_data['item_sku']  # Make sure item_sku is included
+                product_data['item_sku'] or None,  # An empty SKU is stored as NULL
+                design_key(product_data.get('original_design_url', ''))
             )
             
-            self.cursor.execute(query, values)
-            self.connection.commit()
+            self.cursor.execute(GENERATED_PRODUCT_INSERT, values)
             new_id = self.cursor.lastrowid
+            self._write_variants([(new_id, product_data.get('parent_product_id'), product_data)])
+            self.connection.commit()
+            self.invalidate_stats()
             st.success(f"Generated product '{product_data['product_name']}' added with ID: {new_id}")
             return new_id
         except KeyError as e:
             st.error(f"Error adding generated product - missing required field: {e}")
             return None
         except Error as e:
-            st.error(f"Error adding generated product: {e}")
+            self.connection.rollback()
+            if e.errno == errorcode.ER_DUP_ENTRY:
+                st.error(f"SKU {product_data['item_sku']} is already used by another generated product.")
+            else:
+                st.error(f"Error adding generated product: {e}")
             return None
     
+    @_pooled
+    def create_generated_products_bulk(self, products):
+        """
+        Add many generated products (e.g. all variants of a design) in one transaction
+        
+        Parent SKUs are resolved with a single lookup and all rows are inserted
+        with one executemany call. Either every product is inserted or none is;
+        a SKU that already exists fails the whole batch.
+        
+        Args:
+            products (list): Generated product dicts, in the format accepted by
+                             create_generated_product
+            
+        Returns:
+            list: IDs of the inserted products in input order, or an empty list on failure
+        """
+        if not products:
+            return []
+            
+        if not self._check_connection():
+            st.error("Cannot add generated products: database connection failed")
+            return []
+            
+        try:
+            # Validate required fields
+            for product_data in products:
+                if 'product_name' not in product_data:
+                    st.error("Missing required field: product_name")
+                    return []
+                    
+                # Handle case where design_sku is provided instead of item_sku
+                if 'item_sku' not in product_data and 'design_sku' in product_data:
+                    product_data['item_sku'] = product_data['design_sku']
+                    
+                if 'item_sku' not in product_data:
+                    st.error("Missing required field: item_sku")
+                    return []
+            
+            # Resolve parent SKUs from parent_product_id with one lookup
+            parent_ids = list({
+                product_data['parent_product_id'] for product_data in products
+                if not product_data.get('parent_sku') and product_data.get('parent_product_id')
+            })
+            parent_skus = {}
+            if parent_ids:
+                placeholders = ", ".join(["%s"] * len(parent_ids))
+                self.cursor.execute(
+                    f"SELECT id, item_sku FROM products WHERE id IN ({placeholders})",
+                    tuple(parent_ids)
+                )
+                parent_skus = {row['id']: row['item_sku'] for row in self.cursor.fetchall()}
+            
+            values = [
+                (
+                    product_data['product_name'],
+                    product_data.get('parent_sku', '') or parent_skus.get(product_data.get('parent_product_id'), ''),
+                    product_data.get('marketplace_title', ''),
+                    product_data.get('size', '[]'),
+                    product_data.get('color', '[]'),
+                    product_data.get('original_design_url', ''),
+                    product_data.get('mockup_urls', '{}'),
+                    product_data.get('is_published', False),
+                    product_data.get('parent_product_id', None),
+                    product_data['item_sku'] or None,
+                    design_key(product_data.get('original_design_url', ''))
+                )
+                for product_data in products
+            ]
+            
+            # executemany sends the rows with a SKU as a single multi-row insert,
+            # whose ids are then read back by SKU; rows without one (NULL may
+            # repeat) are inserted one at a time to get their ids
+            with_sku = [row for row in values if row[9]]
+            if with_sku:
+                self.cursor.executemany(GENERATED_PRODUCT_INSERT, with_sku)
+                skus = list({row[9] for row in with_sku})
+                placeholders = ", ".join(["%s"] * len(skus))
+                self.cursor.execute(
+                    f"SELECT id, item_sku FROM generated_products WHERE item_sku IN ({placeholders})",
+                    tuple(skus)
+                )
+                # item_sku compares case-insensitively and ignores trailing
+                # spaces, so the stored spelling may differ from ours
+                ids_by_sku = {sku_key(row['item_sku']): row['id'] for row in self.cursor.fetchall()}
+            
+            new_ids = []
+            for row in values:
+                if row[9]:
+                    new_id = ids_by_sku.get(sku_key(row[9]))
+                    if new_id is None:
+                        self.connection.rollback()
+                        st.error(f"Could not read back the id of SKU {row[9]}; nothing was saved.")
+                        return []
+                    new_ids.append(new_id)
+                else:
+                    self.cursor.execute(GENERATED_PRODUCT_INSERT, row)
+                    new_ids.append(self.cursor.lastrowid)
+            self._write_variants([
+                (new_id, product_data.get('parent_product_id'), product_data)
+                for new_id, product_data in zip(new_ids, products)
+            ])
+            self.connection.commit()
+            self.invalidate_stats()
+            return new_ids
+        except Error as e:
+            self.connection.rollback()
+            if e.errno == errorcode.ER_DUP_ENTRY:
+                st.error(f"A SKU in this batch is already used by another generated product; nothing was saved. {e.msg}")
+            else:
+                st.error(f"Error adding generated products: {e}")
+            return []
+    
+    @_pooled
     def update_generated_product(self, product_id, product_data):
         """
         Update a generated product
@@ -678,6 +882,7 @@ class Database:
                 size = %s,
                 color = %s,
                 original_design_url = %s,
+                design_key = %s,
                 mockup_urls = %s,
                 is_published = %s,
                 updated_at = CURRENT_TIMESTAMP
@@ -689,24 +894,36 @@ class Database:
             
             values = (
                 product_data['product_name'],
-                product_data.get('item_sku', ''),
+                product_data.get('item_sku') or None,
                 product_data.get('parent_sku', ''),
                 product_data.get('marketplace_title', ''),
                 product_data.get('size', '[]'),
                 product_data.get('color', '[]'),
                 product_data.get('original_design_url', ''),
+                design_key(product_data.get('original_design_url', '')),
                 product_data.get('mockup_urls', '{}'),
                 is_published,
                 product_id
             )
             
             self.cursor.execute(query, values)
+            
+            self.cursor.execute("SELECT parent_product_id FROM generated_products WHERE id = %s", (product_id,))
+            row = self.cursor.fetchone()
+            if row:
+                self._write_variants([(product_id, row['parent_product_id'], product_data)])
+                
             self.connection.commit()
+            self.invalidate_stats()
             return True
         except Error as e:
-            st.error(f"Error updating generated product {product_id}: {e}")
+            if e.errno == errorcode.ER_DUP_ENTRY:
+                st.error(f"SKU {product_data.get('item_sku', '')} is already used by another generated product.")
+            else:
+                st.error(f"Error updating generated product {product_id}: {e}")
             return False
     
+    @_pooled
     def get_all_generated_products(self):
         """
         Get all generated products from database
@@ -730,6 +947,126 @@ class Database:
             st.error(f"Error retrieving generated products: {e}")
             return pd.DataFrame()
     
+    def _generated_products_filter(self, search=None, category=None):
+        """Build the WHERE clause and parameters shared by the paginated generated product queries"""
+        conditions = []
+        params = []
+        
+        if search:
+            conditions.append("(g.product_name LIKE %s OR g.item_sku LIKE %s)")
+            pattern = like_pattern(search)
+            params.extend([pattern, pattern])
+            
+        if category and category != "All":
+            conditions.append("p.category = %s")
+            params.append(category)
+            
+        return conditions, params
+    
+    @_pooled
+    def get_generated_products_page(self, limit, search=None, category=None, after=None, offset=0):
+        """
+        Get one page of generated products, newest first
+        
+        Pages are ordered by (created_at, id) descending. When `after` is given the
+        page starts right after that row (keyset pagination, served by
+        idx_created_at); otherwise `offset` rows are skipped, which is used for
+        jumping to a page whose start row is not known yet.
+        
+        Args:
+            limit (int): Maximum number of rows to return
+            search (str, optional): Case-insensitive match on product name or SKU
+            category (str, optional): Category of the parent product ("All" for no filter)
+            after (tuple, optional): (created_at, id) of the last row of the previous page
+            offset (int): Rows to skip when `after` is not given
+            
+        Returns:
+            DataFrame: Generated products for the page
+        """
+        if not self._check_connection():
+            st.error("Cannot get generated products: database connection failed")
+            return pd.DataFrame()
+            
+        try:
+            conditions, params = self._generated_products_filter(search, category)
+            
+            if after is not None:
+                conditions.append("(g.created_at < %s OR (g.created_at = %s AND g.id < %s))")
+                params.extend([after[0], after[0], after[1]])
+                
+            query = "SELECT g.* FROM generated_products g"
+            if category and category != "All":
+                query += " LEFT JOIN products p ON p.id = g.parent_product_id"
+            if conditions:
+                query += " WHERE " + " AND ".join(conditions)
+            query += " ORDER BY g.created_at DESC, g.id DESC LIMIT %s"
+            params.append(int(limit))
+            
+            if after is None and offset:
+                query += " OFFSET %s"
+                params.append(int(offset))
+                
+            self.cursor.execute(query, tuple(params))
+            result = self.cursor.fetchall()
+            return pd.DataFrame(result) if result else pd.DataFrame()
+        except Error as e:
+            st.error(f"Error retrieving generated products: {e}")
+            return pd.DataFrame()
+    
+    @_pooled
+    def count_generated_products(self, search=None, category=None):
+        """
+        Count generated products matching the Product List filters
+        
+        Args:
+            search (str, optional): Case-insensitive match on product name or SKU
+            category (str, optional): Category of the parent product ("All" for no filter)
+            
+        Returns:
+            int: Number of matching generated products
+        """
+        if not self._check_connection():
+            st.error("Cannot count generated products: database connection failed")
+            return 0
+            
+        try:
+            conditions, params = self._generated_products_filter(search, category)
+            
+            query = "SELECT COUNT(*) AS count FROM generated_products g"
+            if category and category != "All":
+                query += " LEFT JOIN products p ON p.id = g.parent_product_id"
+            if conditions:
+                query += " WHERE " + " AND ".join(conditions)
+                
+            self.cursor.execute(query, tuple(params))
+            result = self.cursor.fetchone()
+            return result['count'] if result else 0
+        except Error as e:
+            st.error(f"Error counting generated products: {e}")
+            return 0
+    
+    @_pooled
+    def get_product_categories(self):
+        """
+        Get the distinct product categories
+        
+        Returns:
+            list: Category names in alphabetical order
+        """
+        if not self._check_connection():
+            st.error("Cannot get categories: database connection failed")
+            return []
+            
+        try:
+            self.cursor.execute(
+                "SELECT DISTINCT category FROM products WHERE category IS NOT NULL AND category != '' ORDER BY category"
+            )
+            return [row['category'] for row in self.cursor.fetchall()]
+        except Error as e:
+            st.error(f"Error retrieving categories: {e}")
+            return []
+    
+    @_pooled
     def get_generated_product(self, product_id):
         """
         Get a specific generated product by ID
@@ -755,12 +1092,13 @@ class Database:
     def _ensure_generated_products_table(self):
         """Create the generated_products table if it doesn't exist"""
         try:
-            # This is now handled in _create_tables() during initialization
+            # The schema is now managed by utils.migrations
             # Keep this method for backward compatibility with existing code
             pass
         except Error as e:
             st.warning(f"Table creation notice: {e}")
 
+    @_pooled
     def delete_product(self, product_id):
         """
         Delete a product
@@ -779,11 +1117,13 @@ class Database:
             query = "DELETE FROM products WHERE id = %s"
             self.cursor.execute(query, (product_id,))
             self.connection.commit()
+            self.invalidate_stats()
             return True
         except Error as e:
             st.error(f"Error deleting product {product_id}: {e}")
             return False
 
+    @_pooled
     def delete_generated_product(self, product_id):
         """
         Delete a generated product
@@ -802,52 +1142,105 @@ class Database:
             query = "DELETE FROM generated_products WHERE id = %s"
             self.cursor.execute(query, (product_id,))
             self.connection.commit()
+            self.invalidate_stats()
             return True
         except Error as e:
             st.error(f"Error deleting generated product {product_id}: {e}")
             return False
     
-    def get_stats(self):
+    def _empty_stats(self):
+        """Dashboard statistics used when they cannot be read"""
+        return {
+            'total_products': 0,
+            'parent_count': 0,
+            'image_count': 0,
+            'generated_count': 0,
+            'published_count': 0,
+            'unpublished_count': 0,
+            'generated_parent_count': 0,
+            'variants_per_parent': 0.0
+        }
+    
+    def invalidate_stats(self):
+        """Drop the cached dashboard statistics; called after every product write"""
+        with self._stats_lock:
+            self._stats_cache = None
+    
+    def get_stats(self, force_refresh=False):
         """
         Get basic statistics for dashboard
         
+        The result is cached for STATS_CACHE_TTL seconds and dropped as soon as
+        a product is written. A cache hit does not borrow a pooled connection.
+        
+        Args:
+            force_refresh (bool): Skip the cache and query the database
+        
+        Returns:
+            dict: Dictionary containing stats
+        """
+        with self._stats_lock:
+            cached = self._stats_cache
+        if cached and not force_refresh and time.monotonic() - cached[0] < STATS_CACHE_TTL:
+            return dict(cached[1])
+        return self._query_stats()
+    
+    @_pooled
+    def _query_stats(self):
+        """
+        Query the dashboard statistics and refresh the cache
+        
+        All counters come from one conditional-aggregate query over products and
+        generated_products.
+        
         Returns:
             dict: Dictionary containing stats
         """
         if not self._check_connection():
             st.error("Cannot get stats: database connection failed")
-            return {
-                'total_products': 0,
-                'parent_count': 0,
-                'image_count': 0
-            }
+            return self._empty_stats()
             
         try:
-            # Total products
-            self.cursor.execute("SELECT COUNT(*) as total FROM products")
-            total_products = self.cursor.fetchone()['total']
-            
-            # Total parent products
-            self.cursor.execute("SELECT COUNT(*) as parent_count FROM products WHERE parent_child = 'Parent'")
-            parent_count = self.cursor.fetchone()['parent_count']
-            
-            # Total images stored
-            self.cursor.execute("SELECT COUNT(*) as image_count FROM products WHERE image_url IS NOT NULL")
-            image_count = self.cursor.fetchone()['image_count']
-            
-            return {
-                'total_products': total_products,
-                'parent_count': parent_count,
-                'image_count': image_count
+            self.cursor.execute("""
+                SELECT p.*, g.* FROM (
+                    SELECT
+                        COUNT(*) AS total_products,
+                        COALESCE(SUM(parent_child = 'Parent'), 0) AS parent_count,
+                        COALESCE(SUM(image_url IS NOT NULL), 0) AS image_count
+                    FROM products
+                ) AS p CROSS JOIN (
+                    SELECT
+                        COUNT(*) AS generated_count,
+                        COALESCE(SUM(is_published = TRUE), 0) AS published_count,
+                        COALESCE(SUM(parent_product_id IS NOT NULL), 0) AS generated_with_parent,
+                        COUNT(DISTINCT parent_product_id) AS generated_parent_count
+                    FROM generated_products
+                ) AS g
+            """)
+            row = {key: int(value or 0) for key, value in self.cursor.fetchone().items()}
+            
+            stats = {
+                'total_products': row['total_products'],
+                'parent_count': row['parent_count'],
+                'image_count': row['image_count'],
+                'generated_count': row['generated_count'],
+                'published_count': row['published_count'],
+                'unpublished_count': row['generated_count'] - row['published_count'],
+                'generated_parent_count': row['generated_parent_count'],
+                'variants_per_parent': (
+                    row['generated_with_parent'] / row['generated_parent_count']
+                    if row['generated_parent_count'] else 0.0
+                )
             }
+            
+            with self._stats_lock:
+                self._stats_cache = (time.monotonic(), stats)
+            return dict(stats)
         except Error as e:
             st.error(f"Error getting stats: {e}")
-            return {
-                'total_products': 0,
-                'parent_count': 0,
-                'image_count': 0
-            }
+            return self._empty_stats()
     
+    @_pooled
     def check_if_sku_exists(self, sku):
         """
         Check if a SKU already exists in the database
@@ -863,32 +1256,30 @@ class Database:
             return False
             
         try:
-            # Use the existing cursor
-            cursor = self.cursor if hasattr(self, 'cursor') else self.connection.cursor()
-            
-            # Execute query to check if SKU exists in generated_products table
-            cursor.execute(
-                "SELECT COUNT(*) as count FROM generated_products WHERE item_sku = %s OR parent_sku = %s", 
-                (sku, sku)
-            )
-            
-            # Get the result
-            result = cursor.fetchone()
-            count = result['count'] if isinstance(result, dict) else result[0]
+            # Two EXISTS probes so each one is served by its own index
+            # (uq_item_sku and idx_parent_sku) instead of an OR across both columns
+            self.cursor.execute("""
+                SELECT
+                    EXISTS(SELECT 1 FROM generated_products WHERE item_sku = %s) AS item_sku_exists,
+                    EXISTS(SELECT 1 FROM generated_products WHERE parent_sku = %s) AS parent_sku_exists
+            """, (sku, sku))
             
-            return count > 0
+            result = self.cursor.fetchone()
+            return bool(result['item_sku_exists'] or result['parent_sku_exists'])
         except Exception as e:
             st.error(f"Error checking if SKU exists: {e}")
             return False
 
+    @_pooled
     def get_related_products_by_design(self, design_url, exclude_id=None):
         """Get all generated products that use the same original design"""
         try:
+            # design_key is indexed; the URL comparison only guards against hash collisions
             query = """
                 SELECT * FROM generated_products 
-                WHERE original_design_url = %s
+                WHERE design_key = %s AND original_design_url = %s
             """
-            params = [design_url]
+            params = [design_key(design_url), design_url]
             
             # Exclude the current product if specified
             if exclude_id is not None:
@@ -899,13 +1290,395 @@ class Database:
             query += " ORDER BY id"
             
             self.cursor.execute(query, params)
-            columns = [col[0] for col in self.cursor.description]
-            result = [dict(zip(columns, row)) for row in self.cursor.fetchall()]
-            return pd.DataFrame(result)
+            return pd.DataFrame(self.cursor.fetchall())
         except Exception as e:
             print(f"Error getting related products: {e}")
             return pd.DataFrame()
     
+    @_pooled
+    def count_products_by_design(self, design_keys):
+        """
+        Count the generated products made from each design
+        
+        Args:
+            design_keys (list): design_key values to count
+            
+        Returns:
+            dict: Mapping of design_key to number of generated products
+        """
+        design_keys = [key for key in design_keys if key]
+        if not design_keys:
+            return {}
+            
+        if not self._check_connection():
+            st.error("Cannot count products by design: database connection failed")
+            return {}
+            
+        try:
+            placeholders = ", ".join(["%s"] * len(design_keys))
+            self.cursor.execute(
+                f"SELECT design_key, COUNT(*) AS count FROM generated_products "
+                f"WHERE design_key IN ({placeholders}) GROUP BY design_key",
+                tuple(design_keys)
+            )
+            return {row['design_key']: row['count'] for row in self.cursor.fetchall()}
+        except Error as e:
+            st.error(f"Error counting products by design: {e}")
+            return {}
+    
+    def _projection(self, table, columns):
+        """Validate a table and column list against TABLE_COLUMNS"""
+        if table not in TABLE_COLUMNS:
+            raise ValueError(f"Unknown table: {table}")
+        known = TABLE_COLUMNS[table]
+        columns = list(columns) if columns else list(known)
+        unknown = [column for column in columns if column not in known]
+        if unknown:
+            raise ValueError(f"Unknown columns for {table}: {', '.join(unknown)}")
+        return columns
+    
+    def _where_clause(self, table, filters=None, search=None, search_columns=None):
+        """
+        Build a WHERE clause from equality filters and a text search
+        
+        Returns:
+            tuple: (clause, params) where clause is empty when there are no conditions
+        """
+        known = TABLE_COLUMNS[table]
+        conditions = []
+        params = []
+        
+        for column, value in (filters or {}).items():
+            if column not in known:
+                raise ValueError(f"Unknown filter column for {table}: {column}")
+            if value is None:
+                conditions.append(f"{column} IS NULL")
+            elif isinstance(value, (list, tuple, set)):
+                if not value:
+                    conditions.append("FALSE")
+                    continue
+                conditions.append(f"{column} IN ({', '.join(['%s'] * len(value))})")
+                params.extend(value)
+            else:
+                conditions.append(f"{column} = %s")
+                params.append(value)
+                
+        if search:
+            search_columns = self._projection(table, search_columns or ['product_name', 'item_sku'])
+            conditions.append("(" + " OR ".join(f"{column} LIKE %s" for column in search_columns) + ")")
+            params.extend([like_pattern(search)] * len(search_columns))
+            
+        clause = " WHERE " + " AND ".join(conditions) if conditions else ""
+        return clause, params
+    
+    def _to_frame(self, table, columns, rows):
+        """Build a DataFrame from cursor rows and apply the TABLE_COLUMNS dtypes"""
+        df = pd.DataFrame.from_records(rows, columns=columns)
+        for column in columns:
+            dtype = TABLE_COLUMNS[table].get(column)
+            if dtype is None or dtype == 'object':
+                continue
+            if dtype.startswith('datetime64'):
+                df[column] = pd.to_datetime(df[column])
+            elif dtype in ('int64', 'float64') and df[column].isna().any():
+                # Fall back to a nullable dtype rather than failing on NULLs
+                df[column] = pd.to_numeric(df[column]).astype('Float64' if dtype == 'float64' else 'Int64')
+            else:
+                df[column] = df[column].astype('float64' if dtype == 'float64' else dtype)
+        return df
+    
+    @_pooled
+    def query_frame(self, table, columns=None, filters=None, search=None, search_columns=None,
+                    order_by=None, limit=None, offset=0):
+        """
+        Select only the needed columns of a table into a typed DataFrame
+        
+        Args:
+            table (str): 'products' or 'generated_products'
+            columns (list, optional): Columns to select, defaults to every known column
+            filters (dict, optional): Column -> value equality filters; a list value
+                                      becomes IN (...) and None becomes IS NULL
+            search (str, optional): Case-insensitive match on search_columns
+            search_columns (list, optional): Columns searched, defaults to product_name and item_sku
+            order_by (list, optional): Sort keys such as "created_at DESC"
+            limit (int, optional): Maximum number of rows
+            offset (int): Rows to skip (only used with limit)
+            
+        Returns:
+            DataFrame: Rows with exactly the requested columns, typed per TABLE_COLUMNS
+            
+        Raises:
+            ValueError: If the table, a column or a sort key is not known
+        """
+        columns = self._projection(table, columns)
+        clause, params = self._where_clause(table, filters, search, search_columns)
+        
+        query = f"SELECT {', '.join(columns)} FROM {table}{clause}"
+        
+        if order_by:
+            keys = []
+            for key in order_by:
+                parts = key.split()
+                direction = parts[1].upper() if len(parts) > 1 else 'ASC'
+                if len(parts) > 2 or parts[0] not in TABLE_COLUMNS[table] or direction not in ('ASC', 'DESC'):
+                    raise ValueError(f"Invalid sort key for {table}: {key}")
+                keys.append(f"{parts[0]} {direction}")
+            query += " ORDER BY " + ", ".join(keys)
+            
+        if limit is not None:
+            query += " LIMIT %s"
+            params.append(int(limit))
+            if offset:
+                query += " OFFSET %s"
+                params.append(int(offset))
+        
+        if not self._check_connection():
+            st.error(f"Cannot query {table}: database connection failed")
+            return self._to_frame(table, columns, [])
+            
+        try:
+            self.cursor.execute(query, tuple(params))
+            return self._to_frame(table, columns, self.cursor.fetchall())
+        except Error as e:
+            st.error(f"Error querying {table}: {e}")
+            return self._to_frame(table, columns, [])
+    
+    @_pooled
+    def count_rows(self, table, filters=None, search=None, search_columns=None):
+        """
+        Count the rows query_frame would return without a limit
+        
+        Args:
+            table (str): 'products' or 'generated_products'
+            filters (dict, optional): Same as query_frame
+            search (str, optional): Same as query_frame
+            search_columns (list, optional): Same as query_frame
+            
+        Returns:
+            int: Number of matching rows
+        """
+        self._projection(table, None)
+        clause, params = self._where_clause(table, filters, search, search_columns)
+        
+        if not self._check_connection():
+            st.error(f"Cannot count {table}: database connection failed")
+            return 0
+            
+        try:
+            self.cursor.execute(f"SELECT COUNT(*) AS count FROM {table}{clause}", tuple(params))
+            result = self.cursor.fetchone()
+            return result['count'] if result else 0
+        except Error as e:
+            st.error(f"Error counting {table}: {e}")
+            return 0
+    
+    @_pooled
+    def get_variants(self, generated_product_ids=None, parent_product_id=None, colors=None, sizes=None):
+        """
+        Get generated product variants, filtered in SQL
+        
+        Args:
+            generated_product_ids (list, optional): Only variants of these generated products
+            parent_product_id (int, optional): Only variants generated from this product
+            colors (list, optional): Only these colors (hex codes as stored)
+            sizes (list, optional): Only these sizes
+            
+        Returns:
+            DataFrame: One row per variant with id, generated_product_id, parent_product_id,
+                       size, color, product_name, item_sku and is_published
+        """
+        if not self._check_connection():
+            st.error("Cannot get variants: database connection failed")
+            return pd.DataFrame()
+            
+        conditions = []
+        params = []
+        for column, values in (('v.generated_product_id', generated_product_ids), ('v.color', colors), ('v.size', sizes)):
+            if values:
+                conditions.append(f"{column} IN ({', '.join(['%s'] * len(values))})")
+                params.extend(values)
+        if parent_product_id is not None:
+            conditions.append("v.parent_product_id = %s")
+            params.append(parent_product_id)
+            
+        query = """
+            SELECT v.id, v.generated_product_id, v.parent_product_id, v.size, v.color,
+                   g.product_name, g.item_sku, g.is_published
+            FROM variant v
+            JOIN generated_products g ON g.id = v.generated_product_id
+        """
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY v.generated_product_id DESC, v.position"
+        
+        try:
+            self.cursor.execute(query, tuple(params))
+            rows = self.cursor.fetchall()
+            return pd.DataFrame(rows) if rows else pd.DataFrame()
+        except Error as e:
+            st.error(f"Error retrieving variants: {e}")
+            return pd.DataFrame()
+    
+    @_pooled
+    def get_variant_mockups(self, variant_ids=None, mockup_uuid=None):
+        """
+        Get the mockup images of variants, or every image rendered from one template
+        
+        Args:
+            variant_ids (list, optional): Only mockups of these variants
+            mockup_uuid (str, optional): Only mockups rendered from this template
+            
+        Returns:
+            DataFrame: variant_id, position, mockup_uuid, image_url, generated_product_id,
+                       size and color per mockup
+        """
+        if not self._check_connection():
+            st.error("Cannot get variant mockups: database connection failed")
+            return pd.DataFrame()
+            
+        conditions = []
+        params = []
+        if variant_ids:
+            conditions.append(f"m.variant_id IN ({', '.join(['%s'] * len(variant_ids))})")
+            params.extend(variant_ids)
+        if mockup_uuid:
+            conditions.append("m.mockup_uuid = %s")
+            params.append(mockup_uuid)
+            
+        query = """
+            SELECT m.variant_id, m.position, m.mockup_uuid, m.image_url,
+                   v.generated_product_id, v.size, v.color
+            FROM variant_mockup m
+            JOIN variant v ON v.id = m.variant_id
+        """
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY m.variant_id, m.position"
+        
+        try:
+            self.cursor.execute(query, tuple(params))
+            rows = self.cursor.fetchall()
+            return pd.DataFrame(rows) if rows else pd.DataFrame()
+        except Error as e:
+            st.error(f"Error retrieving variant mockups: {e}")
+            return pd.DataFrame()
+    
+    @_pooled
+    def get_product_templates(self, product_id):
+        """
+        Get the mockup templates of a product in order
+        
+        Args:
+            product_id (int): Product ID
+            
+        Returns:
+            list: Dicts with mockup_uuid and smart_object_uuid
+        """
+        if not self._check_connection():
+            st.error(f"Cannot get templates of product {product_id}: database connection failed")
+            return []
+            
+        try:
+            self.cursor.execute(
+                "SELECT mockup_uuid, smart_object_uuid FROM product_template WHERE product_id = %s ORDER BY position",
+                (product_id,)
+            )
+            return self.cursor.fetchall()
+        except Error as e:
+            st.error(f"Error retrieving templates of product {product_id}: {e}")
+            return []
+    
+    @_pooled
+    def get_products_by_template(self, mockup_uuid):
+        """
+        Get the products that use a mockup template
+        
+        Args:
+            mockup_uuid (str): Mockup template UUID
+            
+        Returns:
+            DataFrame: id, product_name and item_sku of each product
+        """
+        if not self._check_connection():
+            st.error("Cannot get products by template: database connection failed")
+            return pd.DataFrame()
+            
+        try:
+            self.cursor.execute("""
+                SELECT p.id, p.product_name, p.item_sku
+                FROM product_template t
+                JOIN products p ON p.id = t.product_id
+                WHERE t.mockup_uuid = %s
+                ORDER BY p.created_at DESC
+            """, (mockup_uuid,))
+            rows = self.cursor.fetchall()
+            return pd.DataFrame(rows) if rows else pd.DataFrame()
+        except Error as e:
+            st.error(f"Error retrieving products by template: {e}")
+            return pd.DataFrame()
+    
+    @_pooled
+    def allocate_sku_numbers(self, prefix, n=1):
+        """
+        Reserve a contiguous block of SKU numbers for a prefix
+        
+        The block is reserved atomically in one statement: the sequence row is
+        created or advanced with INSERT ... ON DUPLICATE KEY UPDATE and the new
+        value comes back through LAST_INSERT_ID(), so concurrent sessions never
+        receive the same number. Reserved numbers are not returned if unused.
+        
+        Args:
+            prefix (str): Sequence name, usually the SKU prefix
+            n (int): Number of SKU numbers to reserve
+            
+        Returns:
+            list: The reserved numbers in ascending order, or an empty list on failure
+        """
+        n = int(n)
+        if n <= 0:
+            return []
+            
+        if not self._check_connection():
+            st.error("Cannot allocate SKU numbers: database connection failed")
+            return []
+            
+        try:
+            self.cursor.execute("""
+                INSERT INTO sku_sequences (prefix, next_value) VALUES (%s, LAST_INSERT_ID(1 + %s))
+                ON DUPLICATE KEY UPDATE next_value = LAST_INSERT_ID(next_value + %s)
+            """, (prefix, n, n))
+            # next_value is the first number after the reserved block
+            next_value = self.cursor.lastrowid
+            self.connection.commit()
+            return list(range(next_value - n, next_value))
+        except Error as e:
+            st.error(f"Error allocating SKU numbers for {prefix}: {e}")
+            return []
+    
+    @_pooled
+    def peek_sku_number(self, prefix):
+        """
+        Get the number the next allocation for a prefix would return, without reserving it
+        
+        Args:
+            prefix (str): Sequence name, usually the SKU prefix
+            
+        Returns:
+            int: Next SKU number (1 for a prefix that has never been used)
+        """
+        if not self._check_connection():
+            st.error("Cannot read SKU sequence: database connection failed")
+            return 1
+            
+        try:
+            self.cursor.execute("SELECT next_value FROM sku_sequences WHERE prefix = %s", (prefix,))
+            row = self.cursor.fetchone()
+            return row['next_value'] if row else 1
+        except Error as e:
+            st.error(f"Error reading SKU sequence for {prefix}: {e}")
+            return 1
+    
+    @_pooled
     def get_product_count(self):
         """
         Get the total number of products in the database
@@ -926,18 +1699,331 @@ class Database:
             st.error(f"Error getting product count: {e}")
             return 0
     
-    def __del__(self):
-        """Close database connection when object is destroyed"""
-        if hasattr(self, 'connection') and self.connection is not None:
+    def stream_query(self, query, params=None, chunk_size=None):
+        """
+        Run a query with a server-side (unbuffered) cursor and yield the rows in chunks
+        
+        Only one chunk is held in memory at a time. The query runs on its own
+        pooled connection, which is returned once the generator is exhausted or closed.
+        
+        Args:
+            query (str): SQL query to execute
+            params (tuple, optional): Parameters for the query
+            chunk_size (int, optional): Rows per chunk, defaults to EXPORT_CHUNK_SIZE
+            
+        Yields:
+            DataFrame: Up to chunk_size rows
+            
+        Raises:
+            Error: If the connection is unavailable or the query fails
+        """
+        chunk_size = chunk_size or EXPORT_CHUNK_SIZE
+        
+        # The generator outlives any single method call, so it takes a
+        # connection of its own rather than the thread's borrowed one
+        connection = self._acquire_connection()
+        cursor = connection.cursor(dictionary=True, buffered=False)
+        try:
+            cursor.execute(query, params or ())
+            columns = [column[0] for column in cursor.description]
+            
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield pd.DataFrame(rows, columns=columns)
+        finally:
             try:
-                if hasattr(self, 'cursor') and self.cursor is not None:
-                    self.cursor.close()
-                if self.connection.is_connected():
-                    self.connection.close()
-            except:
+                cursor.close()
+            except Error:
                 pass
-
+            connection.close()
+    
+    def _export_queries(self, product_type=None, parent_child=None, category=None, start_date=None, end_date=None):
+        """
+        Build the per-table queries behind the Export page filters
+        
+        Returns:
+            list: (product_type, FROM/WHERE clause, params) for each table that can match
+        """
+        queries = []
+        for table, table_type in (('products', 'Regular'), ('generated_products', 'Generated')):
+            if product_type and product_type != table_type:
+                continue
+            # Only regular products have a category
+            if category and table_type != 'Regular':
+                continue
+                
+            conditions = []
+            params = []
+            if parent_child:
+                conditions.append("parent_child = %s")
+                params.append(parent_child)
+            if category:
+                conditions.append("category = %s")
+                params.append(category)
+            if start_date:
+                conditions.append("created_at >= %s")
+                params.append(start_date)
+            if end_date:
+                conditions.append("created_at < DATE_ADD(%s, INTERVAL 1 DAY)")
+                params.append(end_date)
+                
+            clause = f" FROM {table}"
+            if conditions:
+                clause += " WHERE " + " AND ".join(conditions)
+            queries.append((table_type, clause, tuple(params)))
+        return queries
+    
+    def iter_export_products(self, chunk_size=None, **filters):
+        """
+        Stream regular then generated products for export
+        
+        Args:
+            chunk_size (int, optional): Rows per chunk, defaults to EXPORT_CHUNK_SIZE
+            **filters: product_type, parent_child, category, start_date and end_date
+            
+        Yields:
+            DataFrame: Chunks of products with a product_type column
+        """
+        for table_type, clause, params in self._export_queries(**filters):
+            query = f"SELECT *{clause} ORDER BY created_at DESC, id DESC"
+            for chunk in self.stream_query(query, params, chunk_size):
+                chunk['product_type'] = table_type
+                if 'design_sku' in chunk.columns:
+                    chunk = chunk.rename(columns={'design_sku': 'item_sku'})
+                yield chunk
+    
+    @_pooled
+    def count_export_products(self, **filters):
+        """
+        Count the products an export with these filters would contain
+        
+        Args:
+            **filters: product_type, parent_child, category, start_date and end_date
+            
+        Returns:
+            int: Number of matching products
+        """
+        if not self._check_connection():
+            st.error("Cannot count products: database connection failed")
+            return 0
+            
+        try:
+            total = 0
+            for _, clause, params in self._export_queries(**filters):
+                self.cursor.execute(f"SELECT COUNT(*) AS count{clause}", params)
+                result = self.cursor.fetchone()
+                total += result['count'] if result else 0
+            return total
+        except Error as e:
+            st.error(f"Error counting products: {e}")
+            return 0
+    
+    @_pooled
+    def get_export_preview(self, limit, columns=None, **filters):
+        """
+        Get the first rows an export with these filters would contain
+        
+        Args:
+            limit (int): Maximum number of rows per product type
+            columns (list, optional): Columns to select; columns a table does not
+                                      have are skipped. Defaults to every column.
+            **filters: product_type, parent_child, category, start_date and end_date
+            
+        Returns:
+            DataFrame: Preview rows with a product_type column
+        """
+        if not self._check_connection():
+            st.error("Cannot preview export: database connection failed")
+            return pd.DataFrame()
+            
+        try:
+            frames = []
+            for table_type, clause, params in self._export_queries(**filters):
+                table = 'products' if table_type == 'Regular' else 'generated_products'
+                if columns:
+                    table_columns = [column for column in columns if column in TABLE_COLUMNS[table]]
+                else:
+                    table_columns = list(TABLE_COLUMNS[table])
+                self.cursor.execute(
+                    f"SELECT {', '.join(table_columns)}{clause} ORDER BY created_at DESC, id DESC LIMIT %s",
+                    params + (int(limit),)
+                )
+                rows = self.cursor.fetchall()
+                if rows:
+                    frame = self._to_frame(table, table_columns, rows)
+                    frame['product_type'] = table_type
+                    frames.append(frame)
+            return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        except Error as e:
+            st.error(f"Error previewing export: {e}")
+            return pd.DataFrame()
+    
+    @_pooled
+    def get_product_date_range(self):
+        """
+        Get the oldest and newest creation dates across regular and generated products
+        
+        Returns:
+            tuple: (min_date, max_date) as dates, or (None, None) if there are no products
+        """
+        if not self._check_connection():
+            st.error("Cannot get date range: database connection failed")
+            return None, None
+            
+        try:
+            self.cursor.execute("""
+                SELECT MIN(min_date) AS min_date, MAX(max_date) AS max_date FROM (
+                    SELECT MIN(created_at) AS min_date, MAX(created_at) AS max_date FROM products
+                    UNION ALL
+                    SELECT MIN(created_at), MAX(created_at) FROM generated_products
+                ) AS ranges
+            """)
+            result = self.cursor.fetchone()
+            if not result or result['min_date'] is None:
+                return None, None
+            return result['min_date'].date(), result['max_date'].date()
+        except Error as e:
+            st.error(f"Error getting date range: {e}")
+            return None, None
+    
+    @_pooled
+    def get_render_cache_entries(self, cache_keys):
+        """
+        Look up previously rendered mockups by cache key
+        
+        Args:
+            cache_keys (list): Render cache keys to look up
+            
+        Returns:
+            dict: Mapping of cache_key to rendered image URL for the keys that were found
+        """
+        if not cache_keys:
+            return {}
+            
+        if not self._check_connection():
+            print("Cannot read render cache: database connection failed")
+            return {}
+            
+        try:
+            placeholders = ", ".join(["%s"] * len(cache_keys))
+            self.cursor.execute(
+                f"SELECT cache_key, image_url FROM render_cache WHERE cache_key IN ({placeholders})",
+                tuple(cache_keys)
+            )
+            return {row['cache_key']: row['image_url'] for row in self.cursor.fetchall()}
+        except Error as e:
+            print(f"Error reading render cache: {e}")
+            return {}
+    
+    @_pooled
+    def save_render_cache_entries(self, entries):
+        """
+        Store rendered mockups in the render cache
+        
+        Args:
+            entries (list): Dicts with cache_key, design_hash, mockup_uuid, smart_object_uuid,
+                            color, format, width and image_url
+            
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        if not entries:
+            return True
+            
+        if not self._check_connection():
+            print("Cannot write render cache: database connection failed")
+            return False
+            
+        try:
+            query = """
+            INSERT INTO render_cache
+            (cache_key, design_hash, mockup_uuid, smart_object_uuid, color, format, width, image_url)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE image_url = VALUES(image_url)
+            """
+            values = [
+                (
+                    entry['cache_key'], entry['design_hash'], entry['mockup_uuid'],
+                    entry['smart_object_uuid'], entry['color'], entry['format'],
+                    entry['width'], entry['image_url']
+                )
+                for entry in entries
+            ]
+            self.cursor.executemany(query, values)
+            self.connection.commit()
+            return True
+        except Error as e:
+            self.connection.rollback()
+            print(f"Error writing render cache: {e}")
+            return False
+    
+    @_pooled
+    def get_thumbnail_urls(self, image_urls, width):
+        """
+        Look up the recorded thumbnails of many images in one query
+        
+        Args:
+            image_urls (list): Source image URLs
+            width (int): Thumbnail width
+            
+        Returns:
+            dict: Mapping of source URL to thumbnail URL for the images that have one
+        """
+        keys = {}
+        for image_url in image_urls:
+            if image_url and isinstance(image_url, str):
+                keys[design_key(image_url)] = image_url
+        if not keys:
+            return {}
+            
+        if not self._check_connection():
+            print("Cannot read thumbnails: database connection failed")
+            return {}
+            
+        try:
+            placeholders = ", ".join(["%s"] * len(keys))
+            self.cursor.execute(
+                f"SELECT source_key, thumbnail_url FROM image_thumbnail "
+                f"WHERE width = %s AND source_key IN ({placeholders})",
+                (int(width), *keys.keys())
+            )
+            return {keys[row['source_key']]: row['thumbnail_url'] for row in self.cursor.fetchall()}
+        except Error as e:
+            print(f"Error reading thumbnails: {e}")
+            return {}
+    
+    @_pooled
+    def save_thumbnails(self, thumbnails_by_url):
+        """
+        Record thumbnails created for uploaded images
+        
+        Args:
+            thumbnails_by_url (dict): Mapping of source image URL to {width: thumbnail URL}
+            
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        rows = thumbnail_rows(thumbnails_by_url)
+        if not rows:
+            return True
+            
+        if not self._check_connection():
+            print("Cannot write thumbnails: database connection failed")
+            return False
+            
+        try:
+            self.cursor.executemany(THUMBNAIL_UPSERT, rows)
+            self.connection.commit()
+            return True
+        except Error as e:
+            self.connection.rollback()
+            print(f"Error writing thumbnails: {e}")
+            return False
+    
     # FTP Settings methods
+    @_pooled
     def get_ftp_settings(self):
         """
         Get all FTP settings from database
@@ -958,6 +2044,7 @@ class Database:
             st.error(f"Error retrieving FTP settings: {e}")
             return pd.DataFrame()
     
+    @_pooled
     def get_default_ftp_settings(self):
         """
         Get default FTP settings
@@ -985,6 +2072,7 @@ class Database:
             st.error(f"Error retrieving default FTP settings: {e}")
             return None
     
+    @_pooled
     def get_ftp_setting(self, setting_id):
         """
         Get specific FTP setting by ID
@@ -1007,6 +2095,7 @@ class Database:
             st.error(f"Error retrieving FTP setting {setting_id}: {e}")
             return None
     
+    @_pooled
     def add_ftp_setting(self, ftp_data):
         """
         Add a new FTP setting to the database
@@ -1046,6 +2135,7 @@ class Database:
             st.error(f"Error adding FTP setting: {e}")
             return None
     
+    @_pooled
     def update_ftp_setting(self, setting_id, ftp_data):
         """
         Update an FTP setting
@@ -1093,6 +2183,7 @@ class Database:
             st.error(f"Error updating FTP setting {setting_id}: {e}")
             return False
     
+    @_pooled
     def delete_ftp_setting(self, setting_id):
         """
         Delete an FTP setting
@@ -1116,6 +2207,7 @@ class Database:
             st.error(f"Error deleting FTP setting {setting_id}: {e}")
             return False
             
+    @_pooled
     def set_ftp_setting_as_default(self, setting_id):
         """
         Set an FTP setting as the default
@@ -1143,6 +2235,7 @@ class Database:
             st.error(f"Error setting FTP setting {setting_id} as default: {e}")
             return False
 
+    @_pooled
     def execute_query(self, query, params=None):
         """
         Execute a custom SQL query with optional parameters
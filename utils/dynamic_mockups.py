@@ -1,10 +1,11 @@
 import os
-import requests
 import json
 import streamlit as st
 from dotenv import load_dotenv
 from utils.s3_storage import upload_mockup_to_s3
-import time
+from utils.rate_limiter import get_host_limiter, parse_retry_after, THROTTLE_STATUS_CODES
+from utils.http_client import get_http_session
+from config import API_MAX_RETRIES
 
 # Load environment variables
 load_dotenv()
@@ -13,6 +14,43 @@ load_dotenv()
 API_KEY = os.getenv('DYNAMIC_MOCKUPS_API_KEY')
 API_BASE_URL = "https://app.dynamicmockups.com/api/v1"
 
+# Output settings used for every render (also part of the render cache key)
+RENDER_FORMAT = "png"
+RENDER_WIDTH = 1500
+
+def api_request(method, url, max_retries=API_MAX_RETRIES, **kwargs):
+    """
+    Send a request to the Dynamic Mockups API through the shared rate limiter
+    
+    Every call waits for a token from the process-wide limiter for the API host.
+    Throttling responses (429/5xx) are reported back to the limiter, which backs
+    off (honouring Retry-After) before the request is retried.
+    
+    Args:
+        method (str): HTTP method
+        url (str): Request URL
+        max_retries (int, optional): Retries for throttled responses
+        **kwargs: Passed through to the shared session's request()
+        
+    Returns:
+        Response: The final response, which may still be a throttling response
+    """
+    limiter = get_host_limiter(url)
+    session = get_http_session()
+    
+    attempt = 0
+    while True:
+        limiter.acquire()
+        response = session.request(method, url, **kwargs)
+        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+        limiter.report(response.status_code, retry_after)
+        
+        if response.status_code not in THROTTLE_STATUS_CODES or attempt >= max_retries:
+            return response
+            
+        attempt += 1
+        print(f"API returned {response.status_code} for {url}, retrying ({attempt}/{max_retries})")
+
 def get_mockup_collections():
     """
     Get list of available mockup collections
@@ -21,7 +59,8 @@ def get_mockup_collections():
         list: List of collections or empty list if error occurs
     """
     try:
-        response = requests.get(
+        response = api_request(
+            'GET',
             f"{API_BASE_URL}/collections",
             headers={"Authorization": f"Bearer {API_KEY}"}
         )
@@ -38,35 +77,47 @@ def get_mockup_collections():
         st.error(f"Error fetching mockup collections: {e}")
         return []
 
+def fetch_mockups():
+    """
+    Fetch available mockups from the Dynamic Mockups API without touching Streamlit
+    
+    Safe to call from background threads.
+    
+    Returns:
+        list: Mockup data
+        
+    Raises:
+        RuntimeError: If the API returns an error or an unexpected payload
+    """
+    response = api_request(
+        'GET',
+        'https://app.dynamicmockups.com/api/v1/mockups',
+        headers={
+            'Accept': 'application/json',
+            'x-api-key': os.getenv('DYNAMIC_MOCKUPS_API_KEY'),
+        },
+    )
+    
+    if response.status_code != 200:
+        raise RuntimeError(f"API returned error status: {response.status_code}: {response.text[:500]}")
+        
+    result = response.json()
+    
+    if 'data' in result and isinstance(result['data'], list):
+        return result['data']
+    raise RuntimeError("Invalid API response format")
+
 def get_mockups():
     """
     Fetch available mockups from the Dynamic Mockups API
     
+    Pages should prefer utils.mockup_catalog.get_catalog(), which caches this.
+    
     Returns:
         list: List of mockup data if successful, empty list otherwise
     """
     try:
-        response = requests.get(
-            'https://app.dynamicmockups.com/api/v1/mockups',
-            headers={
-                'Accept': 'application/json',
-                'x-api-key': os.getenv('DYNAMIC_MOCKUPS_API_KEY'),
-            },
-        )
-        
-        if response.status_code != 200:
-            st.error(f"API returned error status: {response.status_code}")
-            st.error(f"Response content: {response.text}")
-            return []
-            
-        result = response.json()
-        
-        if 'data' in result and isinstance(result['data'], list):
-            return result['data']
-        else:
-            st.error("Invalid API response format")
-            return []
-            
+        return fetch_mockups()
     except Exception as e:
         st.error(f"Error fetching mockups: {e}")
         return []
@@ -101,12 +152,13 @@ def generate_mockup(image_url, color, mockup_id=None, smart_object_uuid=None):
                     }
                 }
             ],
-            "format": "png",
-            "width": 1500,
+            "format": RENDER_FORMAT,
+            "width": RENDER_WIDTH,
             "transparent_background": True
         }
         
-        response = requests.post(
+        response = api_request(
+            'POST',
             'https://app.dynamicmockups.com/api/v1/renders',
             json=request_data,
             headers={
@@ -134,23 +186,25 @@ def generate_mockup(image_url, color, mockup_id=None, smart_object_uuid=None):
         st.error(f"Error generating mockup: {e}")
         return None
 
-def batch_generate_mockups(image_url, colors, mockup_id=None, smart_object_uuid=None, delay=1):
+def batch_generate_mockups(image_url, colors, mockup_id=None, smart_object_uuid=None, delay=None):
     """
     Generate multiple mockups in sequence using the Dynamic Mockups API
     
+    Requests are paced by the shared API rate limiter rather than fixed sleeps.
+    
     Args:
         image_url (str): URL of the image to use for all mockups
         colors (list): List of hex color codes to generate mockups for
         mockup_id (str, optional): ID of the mockup to use
         smart_object_uuid (str, optional): UUID of the smart object to use
-        delay (int, optional): Delay between API requests in seconds
+        delay (int, optional): Deprecated and ignored; kept for backward compatibility
         
     Returns:
         list: List of mockup data if successful, empty list otherwise
     """
     results = []
     
-    for i, color in enumerate(colors):
+    for color in colors:
         # Generate the mockup for this color
         mockup_data = generate_mockup_api_call(
             image_url, 
@@ -161,10 +215,6 @@ def batch_generate_mockups(image_url, colors, mockup_id=None, smart_object_uuid=
         
         if mockup_data:
             results.append(mockup_data)
-        
-        # Add a delay between requests to avoid rate limiting, except for the last color
-        if i < len(colors) - 1:
-            time.sleep(delay)
     
     return results
 
@@ -205,7 +255,8 @@ def generate_mockup_with_color(image_url, mockup_id, color_hex=None, output_form
         st.write(f"Sending API request to generate mockup with template: {mockup_id}")
         
         # Call the render API
-        response = requests.post(
+        response = api_request(
+            'POST',
             f"{API_BASE_URL}/render",
             headers={
                 "Authorization": f"Bearer {API_KEY}",
@@ -249,7 +300,8 @@ def get_mockup_details(mockup_id):
         dict: Mockup details or None if error occurs
     """
     try:
-        response = requests.get(
+        response = api_request(
+            'GET',
             f"{API_BASE_URL}/mockups/{mockup_id}",
             headers={"Authorization": f"Bearer {API_KEY}"}
         )
@@ -295,8 +347,11 @@ def upload_psd_template(psd_file_path, name, category=None, tags=None):
                 'metadata': (None, json.dumps(metadata), 'application/json')
             }
             
-            response = requests.post(
+            # The file handle is consumed by the first attempt, so never retry
+            response = api_request(
+                'POST',
                 f"{API_BASE_URL}/psd/upload",
+                max_retries=0,
                 headers={"Authorization": f"Bearer {API_KEY}"},
                 files=files
             )
@@ -344,9 +399,6 @@ def generate_mockup_for_all_templates(image_url, colors, mockup_ids, smart_objec
             
             if mockup_data:
                 template_results.append(mockup_data)
-                
-            # Add a small delay to avoid rate limiting
-            time.sleep(0.5)
         
         # Store results for this template
         if template_results:
@@ -388,8 +440,8 @@ def generate_mockup_api_call(image_url, color, mockup_id, smart_object_uuid):
                     }
                 }
             ],
-            "format": "png",
-            "width": 1500,
+            "format": RENDER_FORMAT,
+            "width": RENDER_WIDTH,
             "transparent_background": True
         }
         
@@ -397,7 +449,8 @@ def generate_mockup_api_call(image_url, color, mockup_id, smart_object_uuid):
         print(f"Request data for mockup {MOCKUP_UUID}, smart object {SMART_OBJECT_UUID}:")
         print(json.dumps(request_data, indent=2))
         
-        response = requests.post(
+        response = api_request(
+            'POST',
             'https://app.dynamicmockups.com/api/v1/renders',
             json=request_data,
             headers={
@@ -1,5 +1,66 @@
 import pandas as pd
 from utils.api import is_s3_url
+from utils.variants import expand_mockups_by_color, match_mockup_urls, marketplace_titles
+
+# Fields every prepared export row carries (before renaming)
+REQUIRED_EXPORT_FIELDS = [
+    'product_name', 'item_sku', 'parent_child', 'parent_sku',
+    'size', 'color', 'image_url', 'market_place_title', 'category'
+]
+
+# Column order of the exported CSV
+EXPORT_COLUMNS = [
+    'Product Name', 'Item SKU', 'Parent/Child', 'Parent SKU',
+    'Size', 'Colour', 'Image URL', 'Marketplace Title',
+    'Woocommerce Product Category', 'Tax Class', 'Qty', 'Price'
+]
+
+def prepare_export_rows(df):
+    """
+    Turn database rows into export rows
+    
+    Generated products are split into one row per mockup color with the matching
+    mockup image, flagged as children, categorised by product name and given a
+    "name - size - color" marketplace title. Every row depends only on its own
+    product, so this can be applied chunk by chunk.
+    
+    Args:
+        df (DataFrame): Products with a product_type column
+        
+    Returns:
+        DataFrame: Export rows, REQUIRED_EXPORT_FIELDS first
+    """
+    mask_mockups = pd.Series(False, index=df.index)
+    if 'product_type' in df.columns and 'mockup_urls' in df.columns:
+        mask_mockups = (df['product_type'] == 'Generated') & df['mockup_urls'].notna() & (df['mockup_urls'].astype(str) != '')
+    export_df = expand_mockups_by_color(df, mask=mask_mockups)
+    
+    for field in REQUIRED_EXPORT_FIELDS:
+        if field not in export_df.columns:
+            export_df[field] = ''
+            
+    if 'product_type' in export_df.columns:
+        mask_regular = export_df['product_type'] == 'Regular'
+        mask_generated = export_df['product_type'] == 'Generated'
+        
+        export_df.loc[mask_regular, 'parent_child'] = 'Parent'
+        export_df.loc[mask_generated, 'parent_child'] = 'Child'
+        export_df.loc[mask_generated, 'category'] = export_df.loc[mask_generated, 'product_name']
+        
+        if any(mask_generated):
+            export_df.loc[mask_generated, 'market_place_title'] = marketplace_titles(export_df.loc[mask_generated])
+            
+        # Point each color variant at the mockup for its color
+        if 'mockup_urls' in export_df.columns:
+            mask_with_mockups = mask_generated & export_df['mockup_urls'].notna() & (export_df['mockup_urls'] != '')
+            matched_urls = match_mockup_urls(
+                export_df.loc[mask_with_mockups, 'color'],
+                export_df.loc[mask_with_mockups, 'mockup_urls']
+            ).dropna()
+            export_df.loc[matched_urls.index, 'image_url'] = matched_urls
+            
+    all_fields = REQUIRED_EXPORT_FIELDS + [col for col in export_df.columns if col not in REQUIRED_EXPORT_FIELDS]
+    return export_df[all_fields]
 
 def format_products_for_export(df):
     """
@@ -54,15 +115,8 @@ def format_products_for_export(df):
     
     export_df = export_df.rename(columns=column_mapping)
     
-    # Ensure columns are in the correct order
-    ordered_columns = [
-        'Product Name', 'Item SKU', 'Parent/Child', 'Parent SKU',
-        'Size', 'Colour', 'Image URL', 'Marketplace Title',
-        'Woocommerce Product Category', 'Tax Class', 'Qty', 'Price'
-    ]
-    
-    # Only include columns that exist in the DataFrame
-    valid_columns = [col for col in ordered_columns if col in export_df.columns]
+    # Only include columns that exist in the DataFrame, in export order
+    valid_columns = [col for col in EXPORT_COLUMNS if col in export_df.columns]
     export_df = export_df[valid_columns]
     
     return export_df
@@ -83,6 +137,50 @@ def export_to_csv(df):
     # Convert to CSV
     return export_df.to_csv(index=False).encode('utf-8')
 
+def iter_csv_export(chunks, prepare=True):
+    """
+    Produce a CSV export incrementally
+    
+    Each chunk is prepared, formatted and encoded on its own, so memory use is
+    bounded by the chunk size rather than the catalog size. Every block has
+    the full EXPORT_COLUMNS layout; the header is only written once.
+    
+    Args:
+        chunks (iterable): DataFrames of products, e.g. from Database.iter_export_products
+        prepare (bool): Apply prepare_export_rows to each chunk first
+        
+    Yields:
+        bytes: UTF-8 encoded CSV blocks
+    """
+    header = True
+    for chunk in chunks:
+        if prepare:
+            chunk = prepare_export_rows(chunk)
+        formatted = format_products_for_export(chunk).reindex(columns=EXPORT_COLUMNS, fill_value='')
+        yield formatted.to_csv(index=False, header=header).encode('utf-8')
+        header = False
+        
+    if header:
+        yield pd.DataFrame(columns=EXPORT_COLUMNS).to_csv(index=False).encode('utf-8')
+
+def write_csv_export(chunks, sink, prepare=True):
+    """
+    Write a CSV export to a binary file-like sink
+    
+    Args:
+        chunks (iterable): DataFrames of products
+        sink: Binary file-like object (open file, BytesIO, socket wrapper, ...)
+        prepare (bool): Apply prepare_export_rows to each chunk first
+        
+    Returns:
+        int: Number of bytes written
+    """
+    written = 0
+    for block in iter_csv_export(chunks, prepare=prepare):
+        sink.write(block)
+        written += len(block)
+    return written
+
 def verify_export_functionality(test_data=None):
     """
     Verify that export functionality works correctly
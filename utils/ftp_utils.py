@@ -1,16 +1,180 @@
-import os
 import ftplib
 import io
+import time
 import streamlit as st
-from datetime import datetime
-import tempfile
+from config import FTP_BLOCKSIZE, FTP_MAX_RETRIES
+
+class IterableReader(io.RawIOBase):
+    """Read-only file object over an iterable of bytes (or str) chunks"""
+
+    def __init__(self, chunks, encoding='utf-8'):
+        self._chunks = iter(chunks)
+        self._encoding = encoding
+        self._buffer = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, target):
+        while not self._buffer:
+            try:
+                chunk = next(self._chunks)
+            except StopIteration:
+                return 0
+            self._buffer = chunk.encode(self._encoding) if isinstance(chunk, str) else bytes(chunk)
+
+        size = min(len(target), len(self._buffer))
+        target[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+def _as_reader(data):
+    """Wrap str, bytes, file objects or iterables of chunks in a binary reader"""
+    if isinstance(data, str):
+        return io.BytesIO(data.encode('utf-8'))
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return io.BytesIO(data)
+    if hasattr(data, 'read'):
+        return data
+    return io.BufferedReader(IterableReader(data), buffer_size=FTP_BLOCKSIZE)
+
+def _is_seekable(reader):
+    try:
+        return reader.seekable()
+    except (AttributeError, ValueError):
+        return False
+
+def _connect(ftp_settings, timeout):
+    """Open an authenticated FTP session"""
+    ftp = ftplib.FTP()
+    ftp.connect(
+        host=ftp_settings['host'],
+        port=int(ftp_settings['port']),
+        timeout=timeout
+    )
+    ftp.login(
+        user=ftp_settings['username'],
+        passwd=ftp_settings['password']
+    )
+    return ftp
+
+def _ftp_error_message(error):
+    """Turn an FTP exception into a user-friendly message"""
+    error_message = str(error)
+    
+    # Provide more user-friendly error messages for common issues
+    if "connection" in error_message.lower():
+        return f"Failed to connect to FTP server: {error_message}"
+    elif "login" in error_message.lower() or "authentication" in error_message.lower():
+        return f"FTP authentication failed: {error_message}"
+    elif "permission" in error_message.lower():
+        return f"FTP permission denied: {error_message}"
+    else:
+        return f"FTP error: {error_message}"
+
+def _format_size(num_bytes):
+    return f"{num_bytes / (1024 * 1024):.1f} MB"
+
+def stream_to_ftp(data, filename, ftp_settings, blocksize=None, max_retries=None,
+                  timeout=30, on_progress=None, on_connect=None):
+    """
+    Stream data to an FTP server, resuming interrupted uploads
+    
+    The payload goes straight from its source to `storbinary` without a temporary
+    file. If the connection drops and the source is seekable (an open file,
+    BytesIO, str or bytes), the upload reconnects, asks the server how much of the
+    file arrived (SIZE) and continues from there with REST. Iterables are streamed
+    once and cannot be resumed.
+    
+    Does not call Streamlit, so it can run outside a page.
+    
+    Args:
+        data: str, bytes, a binary file object or an iterable of bytes/str chunks
+        filename (str): Name of the file to create on the FTP server
+        ftp_settings (dict): host, port, username and password
+        blocksize (int, optional): Bytes per write, defaults to FTP_BLOCKSIZE
+        max_retries (int, optional): Resume attempts, defaults to FTP_MAX_RETRIES
+        timeout (int): Socket timeout in seconds
+        on_progress (callable, optional): Called as on_progress(bytes_sent, bytes_per_second)
+        on_connect (callable, optional): Called with the server welcome message
+        
+    Returns:
+        tuple: (success, message, stats) where stats has bytes, seconds and bytes_per_second
+    """
+    blocksize = blocksize or FTP_BLOCKSIZE
+    max_retries = FTP_MAX_RETRIES if max_retries is None else max_retries
+    
+    reader = _as_reader(data)
+    seekable = _is_seekable(reader)
+    start_position = reader.tell() if seekable else 0
+    
+    started = time.monotonic()
+    transferred = 0
+    uploaded = 0
+    last_error = None
+    
+    def callback(block):
+        nonlocal transferred
+        transferred += len(block)
+        if on_progress:
+            elapsed = max(time.monotonic() - started, 1e-6)
+            on_progress(transferred, transferred / elapsed)
+    
+    for attempt in range(max_retries + 1):
+        if attempt:
+            time.sleep(min(2 ** (attempt - 1), 10))
+            
+        try:
+            with _connect(ftp_settings, timeout) as ftp:
+                if on_connect and attempt == 0:
+                    on_connect(ftp.getwelcome())
+                    
+                ftp.voidcmd('TYPE I')
+                
+                offset = 0
+                if attempt:
+                    # Continue from what the server already has
+                    try:
+                        offset = ftp.size(filename) or 0
+                    except ftplib.error_perm:
+                        offset = 0
+                    reader.seek(start_position + offset)
+                    
+                ftp.storbinary(f'STOR {filename}', reader, blocksize, callback, rest=offset or None)
+                uploaded = reader.tell() - start_position if seekable else transferred
+                
+            elapsed = max(time.monotonic() - started, 1e-6)
+            stats = {
+                'bytes': uploaded,
+                'seconds': elapsed,
+                'bytes_per_second': transferred / elapsed
+            }
+            resumed = f", resumed {attempt} time(s)" if attempt else ""
+            message = (
+                f"File '{filename}' uploaded successfully to {ftp_settings['host']} "
+                f"({_format_size(uploaded)} at {_format_size(stats['bytes_per_second'])}/s{resumed})"
+            )
+            return True, message, stats
+        except ftplib.error_perm as e:
+            # Permanent errors (bad login, no permission) will not go away on retry
+            last_error = e
+            break
+        except ftplib.all_errors as e:
+            last_error = e
+            if not seekable:
+                break
+                
+    elapsed = max(time.monotonic() - started, 1e-6)
+    stats = {'bytes': uploaded, 'seconds': elapsed, 'bytes_per_second': transferred / elapsed}
+    return False, _ftp_error_message(last_error), stats
 
 def upload_to_ftp(data, filename, ftp_settings):
     """
     Upload data to an FTP server
     
     Args:
-        data (str or bytes): CSV data or other content to upload
+        data (str, bytes, file or iterable): CSV data or other content to upload;
+            file objects and iterables of chunks are streamed
         filename (str): Name of the file to create on the FTP server
         ftp_settings (dict): Dictionary containing FTP credentials
             - host: FTP server hostname
@@ -25,62 +189,13 @@ def upload_to_ftp(data, filename, ftp_settings):
         return False, "No FTP settings provided"
     
     try:
-        # Connect to the FTP server
-        with ftplib.FTP() as ftp:
-            # Connect with timeout
-            ftp.connect(
-                host=ftp_settings['host'],
-                port=int(ftp_settings['port']),
-                timeout=30
-            )
-            
-            # Login
-            ftp.login(
-                user=ftp_settings['username'],
-                passwd=ftp_settings['password']
-            )
-            
-            # Log welcome message
-            welcome_msg = ftp.getwelcome()
-            st.info(f"Connected to FTP server: {welcome_msg}")
-            
-            # Check if data is string or bytes and handle accordingly
-            if isinstance(data, str):
-                # Create a temporary file in text mode for string data
-                with tempfile.NamedTemporaryFile(mode='w+', encoding='utf-8', delete=False) as temp_file:
-                    temp_file.write(data)
-                    temp_file.flush()
-                    temp_file_path = temp_file.name
-            else:
-                # Create a temporary file in binary mode for bytes data
-                with tempfile.NamedTemporaryFile(mode='wb+', delete=False) as temp_file:
-                    temp_file.write(data)
-                    temp_file.flush()
-                    temp_file_path = temp_file.name
-            
-            # Upload the file
-            with open(temp_file_path, 'rb') as file:
-                ftp.storbinary(f'STOR {filename}', file)
-            
-            # Clean up temporary file
-            try:
-                os.unlink(temp_file_path)
-            except Exception:
-                pass
-                
-            return True, f"File '{filename}' uploaded successfully to {ftp_settings['host']}"
-    except ftplib.all_errors as e:
-        error_message = str(e)
-        
-        # Provide more user-friendly error messages for common issues
-        if "connection" in error_message.lower():
-            return False, f"Failed to connect to FTP server: {error_message}"
-        elif "login" in error_message.lower() or "authentication" in error_message.lower():
-            return False, f"FTP authentication failed: {error_message}"
-        elif "permission" in error_message.lower():
-            return False, f"FTP permission denied: {error_message}"
-        else:
-            return False, f"FTP error: {error_message}"
+        success, message, _ = stream_to_ftp(
+            data,
+            filename,
+            ftp_settings,
+            on_connect=lambda welcome_msg: st.info(f"Connected to FTP server: {welcome_msg}")
+        )
+        return success, message
     except Exception as e:
         return False, f"Unexpected error: {str(e)}"
 
@@ -121,16 +236,6 @@ def test_ftp_connection(ftp_settings):
             
             return True, f"Connected successfully to {ftp_settings['host']}. Server message: {welcome_msg}"
     except ftplib.all_errors as e:
-        error_message = str(e)
-        
-        # Provide more user-friendly error messages for common issues
-        if "connection" in error_message.lower():
-            return False, f"Failed to connect to FTP server: {error_message}"
-        elif "login" in error_message.lower() or "authentication" in error_message.lower():
-            return False, f"FTP authentication failed: {error_message}"
-        elif "permission" in error_message.lower():
-            return False, f"FTP permission denied: {error_message}"
-        else:
-            return False, f"FTP error: {error_message}"
+        return False, _ftp_error_message(e)
     except Exception as e:
         return False, f"Unexpected error: {str(e)}"
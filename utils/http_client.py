@@ -0,0 +1,67 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config import (
+    HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE, HTTP_CONNECT_TIMEOUT,
+    HTTP_READ_TIMEOUT, HTTP_MAX_RETRIES
+)
+
+class PooledSession(requests.Session):
+    """Session that applies a default timeout to every request"""
+
+    def __init__(self, timeout):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return super().request(method, url, **kwargs)
+
+_session = None
+_session_lock = threading.Lock()
+
+def _build_session():
+    """Create a keep-alive session with tuned connection pools and retries"""
+    # Transport-level retries only cover idempotent requests; API throttling
+    # (429/5xx on POST renders) is handled by utils.dynamic_mockups.api_request
+    retry = Retry(
+        total=HTTP_MAX_RETRIES,
+        connect=HTTP_MAX_RETRIES,
+        read=HTTP_MAX_RETRIES,
+        status=HTTP_MAX_RETRIES,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        backoff_factor=0.5,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_POOL_CONNECTIONS,
+        pool_maxsize=HTTP_POOL_MAXSIZE,
+        max_retries=retry,
+    )
+    
+    session = PooledSession(timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def get_http_session():
+    """
+    Get the process-wide pooled HTTP session
+    
+    Connections to the Dynamic Mockups API and S3 are kept alive and reused
+    across requests and threads instead of paying a TCP+TLS handshake per call.
+    
+    Returns:
+        PooledSession: Shared session
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
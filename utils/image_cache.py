@@ -0,0 +1,237 @@
+"""
+Local cache for images we keep downloading from S3
+
+Two tiers:
+- disk: image bytes stored once per content hash under IMAGE_CACHE_DIR/blobs,
+  with a small JSON entry per URL (digest, ETag, last check) under urls/.
+  Entries younger than IMAGE_CACHE_REVALIDATE_SECONDS are served without a
+  request; older ones are revalidated with If-None-Match, so an unchanged
+  object costs a 304 instead of a full GET. The least recently used blobs are
+  evicted once the directory grows past IMAGE_CACHE_MAX_MB.
+- memory: an LRU of decoded PIL images keyed by content hash, so repeated
+  previews skip decoding as well.
+
+Nothing here touches Streamlit; failures raise and callers report them.
+"""
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from PIL import Image
+
+from config import IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_MB, IMAGE_CACHE_REVALIDATE_SECONDS, IMAGE_CACHE_MEMORY_ITEMS
+from utils.http_client import get_http_session
+
+# Evict down to this share of the size limit so eviction does not run on every write
+EVICTION_TARGET = 0.9
+
+BLOB_DIR = os.path.join(IMAGE_CACHE_DIR, 'blobs')
+URL_DIR = os.path.join(IMAGE_CACHE_DIR, 'urls')
+
+_lock = threading.Lock()
+_disk_usage = None
+_decoded = OrderedDict()
+
+def _url_key(url):
+    return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+def _blob_path(digest):
+    return os.path.join(BLOB_DIR, digest)
+
+def _entry_path(url):
+    return os.path.join(URL_DIR, f"{_url_key(url)}.json")
+
+def _write_atomic(path, data):
+    """Write a file so concurrent readers never see it half written"""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as tmp_file:
+        tmp_file.write(data)
+    os.replace(tmp_path, path)
+
+def _read_entry(url):
+    try:
+        with open(_entry_path(url), 'r', encoding='utf-8') as entry_file:
+            return json.load(entry_file)
+    except (OSError, ValueError):
+        return None
+
+def _write_entry(url, digest, etag):
+    entry = {'url': url, 'digest': digest, 'etag': etag, 'checked_at': time.time()}
+    _write_atomic(_entry_path(url), json.dumps(entry).encode('utf-8'))
+    return entry
+
+def _scan_disk_usage():
+    total = 0
+    with os.scandir(BLOB_DIR) as entries:
+        for entry in entries:
+            if entry.is_file() and not entry.name.endswith('.tmp'):
+                total += entry.stat().st_size
+    return total
+
+def _evict(keep=None):
+    """Drop the least recently used blobs, except `keep`, until the cache is under its limit"""
+    global _disk_usage
+    limit = IMAGE_CACHE_MAX_MB * 1024 * 1024
+    with _lock:
+        if _disk_usage is None:
+            _disk_usage = _scan_disk_usage()
+        if _disk_usage <= limit:
+            return
+
+        blobs = []
+        with os.scandir(BLOB_DIR) as entries:
+            for entry in entries:
+                if entry.is_file() and not entry.name.endswith('.tmp') and entry.path != keep:
+                    stat = entry.stat()
+                    blobs.append((stat.st_mtime, stat.st_size, entry.path))
+        blobs.sort()
+
+        # Recount from disk; other processes may share the directory
+        usage = sum(size for _, size, _ in blobs)
+        if keep and os.path.exists(keep):
+            usage += os.path.getsize(keep)
+        for _, size, path in blobs:
+            if usage <= limit * EVICTION_TARGET:
+                break
+            try:
+                os.remove(path)
+                usage -= size
+            except OSError:
+                pass
+        _disk_usage = usage
+
+def _store_blob(content):
+    """Save content under its hash, returning the digest"""
+    global _disk_usage
+    digest = hashlib.sha256(content).hexdigest()
+    path = _blob_path(digest)
+    if not os.path.exists(path):
+        _write_atomic(path, content)
+        with _lock:
+            if _disk_usage is not None:
+                _disk_usage += len(content)
+        _evict(keep=path)
+    return digest
+
+def _touch(path):
+    """Mark a blob as recently used for LRU eviction"""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+def _resolve(url):
+    """
+    Make sure the current content of a URL is on disk
+
+    Returns:
+        str: Path of the cached blob
+
+    Raises:
+        IOError: If the image cannot be downloaded and there is no cached copy
+    """
+    os.makedirs(BLOB_DIR, exist_ok=True)
+    os.makedirs(URL_DIR, exist_ok=True)
+
+    entry = _read_entry(url)
+    cached_path = _blob_path(entry['digest']) if entry else None
+    if cached_path and not os.path.exists(cached_path):
+        # The blob was evicted; the ETag is useless without the body
+        entry, cached_path = None, None
+
+    if entry and time.time() - entry.get('checked_at', 0) < IMAGE_CACHE_REVALIDATE_SECONDS:
+        _touch(cached_path)
+        return cached_path
+
+    headers = {}
+    if entry and entry.get('etag'):
+        headers['If-None-Match'] = entry['etag']
+
+    try:
+        response = get_http_session().get(url, headers=headers)
+    except Exception as e:
+        if cached_path:
+            print(f"Could not revalidate {url}, serving cached copy: {e}")
+            _touch(cached_path)
+            return cached_path
+        raise
+
+    if response.status_code == 304 and cached_path:
+        _write_entry(url, entry['digest'], entry.get('etag'))
+        _touch(cached_path)
+        return cached_path
+
+    if response.status_code != 200:
+        raise IOError(f"Status code {response.status_code}")
+
+    digest = _store_blob(response.content)
+    _write_entry(url, digest, response.headers.get('ETag'))
+    return _blob_path(digest)
+
+def _read(url):
+    """Resolve a URL and read its blob, retrying once if it was evicted in between"""
+    for attempt in range(2):
+        path = _resolve(url)
+        try:
+            with open(path, 'rb') as blob:
+                return os.path.basename(path), blob.read()
+        except FileNotFoundError:
+            if attempt:
+                raise
+
+def get_image_bytes(url):
+    """
+    Image bytes of a URL, from the disk cache when it is still current
+
+    Args:
+        url (str): Image URL
+
+    Returns:
+        bytes: Image content
+
+    Raises:
+        IOError: If the image cannot be downloaded and there is no cached copy
+    """
+    return _read(url)[1]
+
+def get_image(url):
+    """
+    Decoded image of a URL, reusing recent decodes of the same content
+
+    Args:
+        url (str): Image URL
+
+    Returns:
+        Image: A copy the caller may modify
+
+    Raises:
+        IOError: If the image cannot be downloaded and there is no cached copy
+    """
+    path = _resolve(url)
+    digest = os.path.basename(path)
+
+    with _lock:
+        image = _decoded.get(digest)
+        if image is not None:
+            _decoded.move_to_end(digest)
+            return image.copy()
+
+    try:
+        with open(path, 'rb') as blob:
+            content = blob.read()
+    except FileNotFoundError:
+        digest, content = _read(url)
+
+    image = Image.open(io.BytesIO(content))
+    image.load()
+
+    with _lock:
+        _decoded[digest] = image
+        _decoded.move_to_end(digest)
+        while len(_decoded) > IMAGE_CACHE_MEMORY_ITEMS:
+            _decoded.popitem(last=False)
+    return image.copy()
@@ -0,0 +1,482 @@
+"""
+Versioned schema migrations
+
+Migrations run once per deploy, not on every connection:
+
+    python -m utils.migrations            # apply pending migrations
+    python -m utils.migrations --status   # list applied and pending migrations
+
+Applied versions are recorded in the schema_version table. Every migration is
+idempotent, so re-running one against a database that already has its changes
+(for example one created by the old connection-time setup) is a no-op.
+"""
+import argparse
+import os
+import sys
+
+import mysql.connector
+from mysql.connector import Error
+
+from config import DB_CONFIG
+from utils.variant_store import replace_variants, replace_product_templates
+
+# Name of the advisory lock that keeps two deploys from migrating at once
+MIGRATION_LOCK = 'demo_image_app_migrations'
+
+def _column_exists(cursor, table, column):
+    cursor.execute(
+        "SELECT COUNT(*) AS count FROM information_schema.columns "
+        "WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s",
+        (table, column)
+    )
+    return cursor.fetchone()['count'] > 0
+
+def _column_type(cursor, table, column):
+    cursor.execute(
+        "SELECT data_type FROM information_schema.columns "
+        "WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s",
+        (table, column)
+    )
+    row = cursor.fetchone()
+    return row['data_type'].lower() if row else None
+
+def _index_exists(cursor, table, index):
+    cursor.execute(
+        "SELECT COUNT(*) AS count FROM information_schema.statistics "
+        "WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s",
+        (table, index)
+    )
+    return cursor.fetchone()['count'] > 0
+
+def _add_column(cursor, table, column, definition):
+    if not _column_exists(cursor, table, column):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+def _add_index(cursor, table, index, columns):
+    if not _index_exists(cursor, table, index):
+        cursor.execute(f"ALTER TABLE {table} ADD INDEX {index} ({columns})")
+
+def _create_base_tables(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS products (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        product_name VARCHAR(255) NOT NULL,
+        item_sku VARCHAR(100) NOT NULL,
+        parent_child ENUM('Parent', 'Child') NOT NULL,
+        parent_sku VARCHAR(100) NULL,
+        size TEXT NULL,
+        color TEXT NULL,
+        image_url TEXT NULL,
+        marketplace_title TEXT NULL,
+        category VARCHAR(1000) NULL,
+        tax_class VARCHAR(50) NULL,
+        quantity INT NOT NULL DEFAULT 0,
+        price DECIMAL(10, 2) NOT NULL DEFAULT 0.00,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        mockup_id VARCHAR(100) NULL,
+        smart_object_uuid VARCHAR(100) NULL,
+        mockup_ids TEXT NULL,
+        smart_object_uuids TEXT NULL
+    )
+    """)
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS generated_products (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        product_name VARCHAR(255) NOT NULL,
+        item_sku VARCHAR(100) NULL,
+        marketplace_title TEXT NULL,
+        size TEXT NULL,
+        color TEXT NULL,
+        original_design_url TEXT NULL,
+        mockup_urls TEXT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        is_published BOOLEAN DEFAULT FALSE,
+        parent_product_id INT NULL,
+        parent_sku VARCHAR(100) NULL,
+        parent_child VARCHAR(10) DEFAULT 'Child',
+
+        INDEX idx_item_sku (item_sku),
+        INDEX idx_parent_sku (parent_sku),
+        INDEX idx_created_at (created_at),
+        INDEX idx_is_published (is_published),
+        INDEX idx_parent_product_id (parent_product_id)
+    )
+    """)
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS ftp_settings (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        host VARCHAR(255) NOT NULL,
+        port INT NOT NULL DEFAULT 21,
+        username VARCHAR(255) NOT NULL,
+        password VARCHAR(255) NOT NULL,
+        is_default BOOLEAN DEFAULT FALSE,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    )
+    """)
+
+def _add_mockup_and_sku_columns(cursor):
+    # Columns added after the first tables went live
+    _add_column(cursor, 'products', 'mockup_id', 'VARCHAR(255) NULL')
+    _add_column(cursor, 'products', 'smart_object_uuid', 'VARCHAR(255) NULL')
+    _add_column(cursor, 'products', 'mockup_ids', 'TEXT NULL')
+    _add_column(cursor, 'products', 'smart_object_uuids', 'TEXT NULL')
+    _add_column(cursor, 'generated_products', 'item_sku', 'VARCHAR(100) NULL')
+    _add_index(cursor, 'generated_products', 'idx_item_sku', 'item_sku')
+    _add_column(cursor, 'generated_products', 'parent_sku', 'VARCHAR(100) NULL')
+
+def _widen_size_and_color(cursor):
+    # Older databases created size/color as VARCHAR(100); only rebuild the
+    # table when a column actually needs widening
+    for column in ('size', 'color'):
+        if _column_type(cursor, 'products', column) not in (None, 'text'):
+            cursor.execute(f"ALTER TABLE products MODIFY COLUMN {column} TEXT")
+
+def _create_render_cache(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS render_cache (
+        cache_key CHAR(64) PRIMARY KEY,
+        design_hash CHAR(64) NOT NULL,
+        mockup_uuid VARCHAR(100) NOT NULL,
+        smart_object_uuid VARCHAR(100) NOT NULL,
+        color VARCHAR(20) NOT NULL,
+        format VARCHAR(10) NOT NULL,
+        width INT NOT NULL,
+        image_url TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+        INDEX idx_design_hash (design_hash)
+    )
+    """)
+
+def _create_variant_tables(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS product_template (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        product_id INT NOT NULL,
+        position INT NOT NULL DEFAULT 0,
+        mockup_uuid VARCHAR(100) NOT NULL,
+        smart_object_uuid VARCHAR(100) NULL,
+
+        UNIQUE KEY uq_product_template (product_id, mockup_uuid),
+        INDEX idx_mockup_uuid (mockup_uuid, product_id),
+        CONSTRAINT fk_product_template_product FOREIGN KEY (product_id)
+            REFERENCES products (id) ON DELETE CASCADE
+    )
+    """)
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS variant (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        generated_product_id INT NOT NULL,
+        parent_product_id INT NULL,
+        size VARCHAR(100) NOT NULL DEFAULT '',
+        color VARCHAR(50) NOT NULL DEFAULT '',
+        position INT NOT NULL DEFAULT 0,
+
+        UNIQUE KEY uq_variant (generated_product_id, size, color),
+        INDEX idx_parent_color_size (parent_product_id, color, size),
+        INDEX idx_color_size (color, size),
+        CONSTRAINT fk_variant_generated_product FOREIGN KEY (generated_product_id)
+            REFERENCES generated_products (id) ON DELETE CASCADE
+    )
+    """)
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS variant_mockup (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        variant_id INT NOT NULL,
+        position INT NOT NULL DEFAULT 0,
+        mockup_uuid VARCHAR(100) NULL,
+        image_url TEXT NOT NULL,
+
+        UNIQUE KEY uq_variant_mockup (variant_id, position),
+        INDEX idx_mockup_uuid (mockup_uuid, variant_id),
+        CONSTRAINT fk_variant_mockup_variant FOREIGN KEY (variant_id)
+            REFERENCES variant (id) ON DELETE CASCADE
+    )
+    """)
+
+def _backfill_variant_tables(cursor, batch_size=500):
+    # Rewrites the rows of every product in id order, a batch at a time, so
+    # re-running it is safe; the whole backfill commits with its version row
+    last_id = 0
+    while True:
+        cursor.execute(
+            "SELECT id, parent_product_id, size, color, mockup_urls FROM generated_products "
+            "WHERE id > %s ORDER BY id LIMIT %s",
+            (last_id, batch_size)
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        replace_variants(cursor, [
+            (row['id'], row['parent_product_id'], row['size'], row['color'], row['mockup_urls'], None)
+            for row in rows
+        ])
+        last_id = rows[-1]['id']
+
+    last_id = 0
+    while True:
+        cursor.execute(
+            "SELECT id, mockup_ids, smart_object_uuids, mockup_id, smart_object_uuid FROM products "
+            "WHERE id > %s ORDER BY id LIMIT %s",
+            (last_id, batch_size)
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        replace_product_templates(cursor, [
+            (row['id'], row['mockup_ids'], row['smart_object_uuids'], row['mockup_id'], row['smart_object_uuid'])
+            for row in rows
+        ])
+        last_id = rows[-1]['id']
+
+def _add_design_key(cursor):
+    _add_column(cursor, 'generated_products', 'design_key', 'CHAR(64) NULL')
+    _add_index(cursor, 'generated_products', 'idx_design_key', 'design_key')
+    # Same value as utils.database.design_key() computes on insert
+    cursor.execute(
+        "UPDATE generated_products SET design_key = SHA2(original_design_url, 256) "
+        "WHERE design_key IS NULL AND original_design_url IS NOT NULL AND original_design_url != ''"
+    )
+
+def _create_sku_sequences(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS sku_sequences (
+        prefix VARCHAR(64) PRIMARY KEY,
+        next_value BIGINT NOT NULL
+    )
+    """)
+
+    # Start every existing prefix after the highest number already used, so
+    # allocated SKUs never collide with ones created before the sequences.
+    # Regular products use PREFIX-NNNN; generated variants use their own
+    # PREFIX:variant sequence for the number in PREFIX-NNNN-SIZE-COLOR.
+    for table, suffix in (('products', ''), ('generated_products', ':variant')):
+        cursor.execute(f"""
+            INSERT INTO sku_sequences (prefix, next_value)
+            SELECT CONCAT(UPPER(SUBSTRING_INDEX(item_sku, '-', 1)), %s),
+                   MAX(CAST(SUBSTRING_INDEX(SUBSTRING_INDEX(item_sku, '-', 2), '-', -1) AS UNSIGNED)) + 1
+            FROM {table}
+            WHERE item_sku REGEXP '^[A-Za-z]+-[0-9]+'
+            GROUP BY UPPER(SUBSTRING_INDEX(item_sku, '-', 1))
+            ON DUPLICATE KEY UPDATE next_value = GREATEST(next_value, VALUES(next_value))
+        """, (suffix,))
+
+def _unique_generated_item_skus(cursor):
+    # Refuse to build the index over duplicates rather than rewrite SKUs that
+    # may already be listed somewhere; an operator has to resolve them first.
+    # GROUP BY uses the column collation, so it finds exactly what the index rejects.
+    cursor.execute("""
+        SELECT item_sku, GROUP_CONCAT(id ORDER BY id) AS ids
+        FROM generated_products
+        WHERE item_sku IS NOT NULL AND item_sku <> ''
+        GROUP BY item_sku HAVING COUNT(*) > 1
+        ORDER BY item_sku
+    """)
+    duplicates = cursor.fetchall()
+    if duplicates:
+        details = "; ".join(f"{row['item_sku']} (ids {row['ids']})" for row in duplicates)
+        raise Error(
+            f"generated_products has {len(duplicates)} duplicate item_sku value(s); "
+            f"resolve them and re-run the migration: {details}"
+        )
+
+    # An empty SKU means none; NULLs may repeat under a unique index
+    cursor.execute("UPDATE generated_products SET item_sku = NULL WHERE item_sku = ''")
+    if not _index_exists(cursor, 'generated_products', 'uq_item_sku'):
+        cursor.execute("ALTER TABLE generated_products ADD UNIQUE INDEX uq_item_sku (item_sku)")
+    # The unique index also serves lookups, so the plain one is redundant
+    if _index_exists(cursor, 'generated_products', 'idx_item_sku'):
+        cursor.execute("ALTER TABLE generated_products DROP INDEX idx_item_sku")
+
+def _create_image_thumbnails(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS image_thumbnail (
+        source_key CHAR(64) NOT NULL,
+        width SMALLINT UNSIGNED NOT NULL,
+        thumbnail_url VARCHAR(1024) NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+        PRIMARY KEY (source_key, width)
+    )
+    """)
+
+# Ordered (version, description, migration) entries. Never edit or reorder an
+# entry once it has shipped; add a new one instead.
+MIGRATIONS = [
+    (1, "Create products, generated_products and ftp_settings tables", _create_base_tables),
+    (2, "Add mockup and SKU columns", _add_mockup_and_sku_columns),
+    (3, "Widen products size and color to TEXT", _widen_size_and_color),
+    (4, "Create render_cache table", _create_render_cache),
+    (5, "Create product_template, variant and variant_mockup tables", _create_variant_tables),
+    (6, "Backfill variants, variant mockups and product templates from JSON columns", _backfill_variant_tables),
+    (7, "Add indexed design_key to generated_products", _add_design_key),
+    (8, "Create and seed sku_sequences", _create_sku_sequences),
+    (9, "Add unique item_sku index to generated_products", _unique_generated_item_skus),
+    (10, "Create image_thumbnail table", _create_image_thumbnails),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def connect():
+    """
+    Open a direct database connection for running migrations
+
+    Tries SSL with verification, SSL without verification and a plain
+    connection in turn, like the application does.
+
+    Returns:
+        MySQLConnection: Open connection
+
+    Raises:
+        Error: If every connection attempt failed
+    """
+    base_config = {
+        'host': DB_CONFIG['host'],
+        'port': DB_CONFIG.get('port', 3306),
+        'database': DB_CONFIG['database'],
+        'user': DB_CONFIG['user'],
+        'password': DB_CONFIG['password'],
+    }
+
+    attempts = []
+    if DB_CONFIG.get('ssl_mode') == 'REQUIRED' and os.path.exists(DB_CONFIG.get('ssl_ca', '')):
+        attempts.append({'ssl_ca': DB_CONFIG['ssl_ca'], 'ssl_verify_cert': DB_CONFIG.get('ssl_verify', True)})
+        attempts.append({'ssl_ca': DB_CONFIG['ssl_ca'], 'ssl_verify_cert': False})
+    attempts.append({'use_pure': True})
+
+    last_error = None
+    for extra in attempts:
+        try:
+            connection = mysql.connector.connect(**base_config, **extra)
+            if connection.is_connected():
+                return connection
+        except Error as e:
+            last_error = e
+    raise last_error or Error("Could not connect to the database")
+
+def _ensure_version_table(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INT PRIMARY KEY,
+        description VARCHAR(255) NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+def applied_versions(cursor):
+    """
+    Get the migration versions already applied
+
+    Args:
+        cursor: Dictionary cursor
+
+    Returns:
+        set: Applied version numbers (empty if schema_version does not exist yet)
+    """
+    cursor.execute(
+        "SELECT COUNT(*) AS count FROM information_schema.tables "
+        "WHERE table_schema = DATABASE() AND table_name = 'schema_version'"
+    )
+    if cursor.fetchone()['count'] == 0:
+        return set()
+    cursor.execute("SELECT version FROM schema_version")
+    return {row['version'] for row in cursor.fetchall()}
+
+def pending_migrations(cursor):
+    """
+    Get the migrations that have not been applied yet
+
+    Args:
+        cursor: Dictionary cursor
+
+    Returns:
+        list: (version, description, migration) entries in order
+    """
+    applied = applied_versions(cursor)
+    return [migration for migration in MIGRATIONS if migration[0] not in applied]
+
+def run_migrations(connection, log=print):
+    """
+    Apply every pending migration in order
+
+    An advisory lock serializes concurrent runs. Each migration is recorded in
+    schema_version as soon as it succeeds, so a failed run resumes from the
+    migration that failed.
+
+    Args:
+        connection: Open database connection
+        log (callable): Receives one progress message per migration
+
+    Returns:
+        list: Versions applied by this run
+
+    Raises:
+        Error: If a migration fails or the lock cannot be taken
+    """
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute("SELECT GET_LOCK(%s, 60) AS locked", (MIGRATION_LOCK,))
+        if not cursor.fetchone()['locked']:
+            raise Error("Timed out waiting for another migration run to finish")
+
+        try:
+            _ensure_version_table(cursor)
+            applied = []
+            for version, description, migrate in pending_migrations(cursor):
+                log(f"Applying migration {version}: {description}")
+                migrate(cursor)
+                cursor.execute(
+                    "INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                    (version, description)
+                )
+                connection.commit()
+                applied.append(version)
+            return applied
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s) AS released", (MIGRATION_LOCK,))
+            cursor.fetchone()
+    finally:
+        cursor.close()
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Apply database schema migrations")
+    parser.add_argument('--status', action='store_true', help="list applied and pending migrations without applying them")
+    args = parser.parse_args(argv)
+
+    try:
+        connection = connect()
+    except Error as e:
+        print(f"Error connecting to database: {e}")
+        return 1
+
+    try:
+        if args.status:
+            cursor = connection.cursor(dictionary=True)
+            applied = applied_versions(cursor)
+            cursor.close()
+            for version, description, _ in MIGRATIONS:
+                state = "applied" if version in applied else "pending"
+                print(f"{version:>4}  {state:<8} {description}")
+            return 0
+
+        applied = run_migrations(connection)
+        if applied:
+            print(f"Applied {len(applied)} migration(s); schema is at version {LATEST_VERSION}")
+        else:
+            print(f"Schema is up to date (version {LATEST_VERSION})")
+        return 0
+    except Error as e:
+        print(f"Migration failed: {e}")
+        return 1
+    finally:
+        connection.close()
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,216 @@
+"""
+Process-wide cache of the DynamicMockups template catalog
+
+The catalog is kept in memory and mirrored to a JSON file so a restart does not
+have to wait for the API. Once it is older than MOCKUP_CATALOG_TTL the cached
+copy is still served while a single background thread fetches a new one
+(stale-while-revalidate). Nothing here touches Streamlit, so the refresh thread
+is safe; callers decide how to surface an empty catalog.
+"""
+import json
+import os
+import threading
+import time
+
+from config import MOCKUP_CATALOG_TTL, MOCKUP_CATALOG_CACHE_FILE
+from utils.dynamic_mockups import fetch_mockups
+
+# Seconds to wait before retrying a background refresh that failed
+REFRESH_RETRY_DELAY = 60
+
+_lock = threading.Lock()
+_catalog = None
+_refreshing = False
+_last_failure = 0.0
+
+def mockup_key(mockup):
+    """Template UUID of a mockup as returned by the API"""
+    return mockup.get('id', mockup.get('uuid', ''))
+
+def _build_option_index(mockups):
+    """
+    Build the mockup picker options and what each option stands for
+
+    Option text is "<smart object> - <mockup>" for every printable (non
+    Background) smart object, or "No printable objects - <mockup>" when a
+    mockup has none.
+
+    Args:
+        mockups (list): Mockup data from the API
+
+    Returns:
+        tuple: (options, index) where options is the list shown in the picker,
+               starting with an empty choice, and index maps option text to a
+               dict with mockup_id, mockup_name, smart_object_name and
+               smart_object_uuid (None for mockups without printable objects)
+    """
+    options = [""]
+    index = {}
+    for mockup in mockups:
+        mockup_id = mockup_key(mockup)
+        mockup_name = mockup.get('name', 'Unnamed Mockup')
+        printable = [so for so in mockup.get('smart_objects', []) if 'Background' not in so.get('name', '')]
+
+        # The first smart object of a given name wins, as in the old lookup loop
+        uuids_by_name = {}
+        for so in printable:
+            uuids_by_name.setdefault(so.get('name', ''), so.get('uuid'))
+
+        for so in printable:
+            so_name = so.get('name', 'Unnamed')
+            option_text = f"{so_name} - {mockup_name}"
+            options.append(option_text)
+            index[option_text] = {
+                'mockup_id': mockup_id,
+                'mockup_name': mockup_name,
+                'smart_object_name': so_name,
+                'smart_object_uuid': uuids_by_name.get(so.get('name', '')),
+            }
+
+        if not printable and 'Background' not in mockup_name:
+            option_text = f"No printable objects - {mockup_name}"
+            options.append(option_text)
+            index[option_text] = {
+                'mockup_id': mockup_id,
+                'mockup_name': mockup_name,
+                'smart_object_name': None,
+                'smart_object_uuid': None,
+            }
+    return options, index
+
+def _build_catalog(mockups, fetched_at, version):
+    """
+    Wrap a mockup list with its option index
+
+    The index is built here, once per catalog version, and shared read-only by
+    every session.
+
+    Args:
+        mockups (list): Mockup data from the API
+        fetched_at (float): Unix time the data was fetched
+        version (int): Catalog version, bumped on every refresh
+
+    Returns:
+        dict: version, fetched_at, mockups, options and option_index
+              (see _build_option_index)
+    """
+    options, option_index = _build_option_index(mockups)
+    return {
+        'version': version,
+        'fetched_at': fetched_at,
+        'mockups': mockups,
+        'options': options,
+        'option_index': option_index,
+    }
+
+def _load_from_disk():
+    """Read the persisted catalog, returning (mockups, fetched_at) or None"""
+    try:
+        with open(MOCKUP_CATALOG_CACHE_FILE, 'r', encoding='utf-8') as cache_file:
+            data = json.load(cache_file)
+        if isinstance(data.get('mockups'), list):
+            return data['mockups'], float(data.get('fetched_at', 0))
+    except (OSError, ValueError, AttributeError, TypeError):
+        pass
+    return None
+
+def _save_to_disk(mockups, fetched_at):
+    """Persist the catalog atomically so readers never see a partial file"""
+    try:
+        os.makedirs(os.path.dirname(MOCKUP_CATALOG_CACHE_FILE) or '.', exist_ok=True)
+        tmp_path = f"{MOCKUP_CATALOG_CACHE_FILE}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as cache_file:
+            json.dump({'fetched_at': fetched_at, 'mockups': mockups}, cache_file)
+        os.replace(tmp_path, MOCKUP_CATALOG_CACHE_FILE)
+    except OSError as e:
+        print(f"Could not write mockup catalog cache: {e}")
+
+def _store(mockups, fetched_at):
+    """Install a freshly fetched mockup list as the current catalog"""
+    global _catalog
+    with _lock:
+        version = (_catalog['version'] + 1) if _catalog else 1
+        _catalog = _build_catalog(mockups, fetched_at, version)
+        catalog = _catalog
+    _save_to_disk(mockups, fetched_at)
+    return catalog
+
+def _refresh_in_background():
+    global _refreshing, _last_failure
+    try:
+        _store(fetch_mockups(), time.time())
+    except Exception as e:
+        print(f"Background mockup catalog refresh failed: {e}")
+        with _lock:
+            _last_failure = time.monotonic()
+    finally:
+        with _lock:
+            _refreshing = False
+
+def _schedule_refresh():
+    """Start one refresh thread unless one is running or the last one just failed"""
+    global _refreshing
+    with _lock:
+        if _refreshing or time.monotonic() - _last_failure < REFRESH_RETRY_DELAY:
+            return
+        _refreshing = True
+    threading.Thread(target=_refresh_in_background, name="mockup-catalog-refresh", daemon=True).start()
+
+def get_catalog(force_refresh=False):
+    """
+    Return the mockup catalog, fetching it only when nothing is cached
+
+    Args:
+        force_refresh (bool): Fetch from the API synchronously, ignoring the cache
+
+    Returns:
+        dict: Catalog as built by _build_catalog
+
+    Raises:
+        Exception: When there is no cached copy and the API request fails
+    """
+    global _catalog
+    if force_refresh:
+        return _store(fetch_mockups(), time.time())
+
+    with _lock:
+        catalog = _catalog
+
+    if catalog is None:
+        persisted = _load_from_disk()
+        if persisted is None:
+            return _store(fetch_mockups(), time.time())
+        with _lock:
+            if _catalog is None:
+                _catalog = _build_catalog(persisted[0], persisted[1], 1)
+            catalog = _catalog
+
+    if time.time() - catalog['fetched_at'] > MOCKUP_CATALOG_TTL:
+        _schedule_refresh()
+    return catalog
+
+def get_cached_mockups():
+    """
+    Mockup list from the catalog
+
+    Returns:
+        list: Mockup data, empty if the catalog could not be loaded
+    """
+    try:
+        return get_catalog()['mockups']
+    except Exception as e:
+        print(f"Error loading mockup catalog: {e}")
+        return []
+
+def option_entry(catalog, option_text):
+    """
+    Look up what a picker option refers to
+
+    Args:
+        catalog (dict): Catalog from get_catalog()
+        option_text (str): Option as shown in the mockup picker
+
+    Returns:
+        dict: Index entry (see _build_option_index), or None for unknown options
+    """
+    return catalog['option_index'].get(option_text)
@@ -0,0 +1,134 @@
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+from config import RENDER_REQUESTS_PER_SECOND
+
+# Status codes that mean the server wants us to slow down
+THROTTLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+class TokenBucket:
+    """
+    Thread-safe token bucket with adaptive backoff
+    
+    Tokens refill at `rate` per second up to `capacity`. When the server
+    answers 429/5xx the bucket pauses every caller (for `Retry-After` when
+    given, otherwise an exponential backoff) and halves its rate; each
+    successful response then recovers the rate gradually toward the configured
+    maximum.
+    """
+
+    def __init__(self, rate, capacity=None, min_rate=0.2, max_backoff=60.0):
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity else max(1.0, float(rate))
+        self.min_rate = min(min_rate, self.max_rate)
+        self.max_backoff = max_backoff
+        
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._backoff = 1.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    def acquire(self):
+        """Block until a token is available and no backoff is in effect"""
+        if self.rate <= 0:
+            return
+            
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    wait = self._blocked_until - now
+                else:
+                    self._refill(now)
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def report(self, status_code, retry_after=None):
+        """
+        Feed a response status back into the limiter
+        
+        Args:
+            status_code (int): HTTP status code of the response
+            retry_after (float, optional): Seconds from the Retry-After header
+        """
+        if self.max_rate <= 0:
+            return
+            
+        with self._lock:
+            now = time.monotonic()
+            if status_code in THROTTLE_STATUS_CODES:
+                delay = retry_after if retry_after is not None else self._backoff
+                self._blocked_until = max(self._blocked_until, now + min(delay, self.max_backoff))
+                self._backoff = min(self._backoff * 2, self.max_backoff)
+                self._refill(now)
+                self.rate = max(self.min_rate, self.rate / 2)
+                self._tokens = 0.0
+            else:
+                self._backoff = 1.0
+                if self.rate < self.max_rate:
+                    self._refill(now)
+                    self.rate = min(self.max_rate, self.rate + self.max_rate * 0.1)
+
+def parse_retry_after(value):
+    """
+    Parse a Retry-After header value
+    
+    Args:
+        value (str): Header value, either delay-seconds or an HTTP date
+        
+    Returns:
+        float: Seconds to wait, or None if the header is missing or invalid
+    """
+    if not value:
+        return None
+        
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+        
+    try:
+        retry_at = parsedate_to_datetime(value)
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+# One limiter per host, shared by every thread in the process
+_host_limiters = {}
+_host_limiters_lock = threading.Lock()
+
+def get_host_limiter(url_or_host, rate=None):
+    """
+    Get the shared rate limiter for a host
+    
+    Args:
+        url_or_host (str): Full URL or bare host name
+        rate (float, optional): Requests per second, only used when the limiter is first created
+        
+    Returns:
+        TokenBucket: Limiter shared by all callers talking to that host
+    """
+    host = urlparse(url_or_host).netloc or url_or_host
+    
+    with _host_limiters_lock:
+        limiter = _host_limiters.get(host)
+        if limiter is None:
+            limiter = TokenBucket(rate if rate is not None else RENDER_REQUESTS_PER_SECOND)
+            _host_limiters[host] = limiter
+        return limiter
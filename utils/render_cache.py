@@ -0,0 +1,192 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from config import RENDER_CACHE_MAX_ENTRIES
+from utils.dynamic_mockups import RENDER_FORMAT, RENDER_WIDTH
+from utils.s3_storage import store_url_in_s3, schedule_thumbnails, MOCKUP_FOLDER
+
+# Process-wide LRU of cache_key -> rendered image URL, shared by all sessions
+_memory_cache = OrderedDict()
+_memory_lock = threading.Lock()
+
+def design_hash(content):
+    """
+    Hash the bytes of a design image
+
+    Args:
+        content (bytes): Raw design image content
+
+    Returns:
+        str: Hex SHA-256 digest of the content
+    """
+    return hashlib.sha256(content).hexdigest()
+
+def render_cache_key(design_digest, mockup_id, smart_object_uuid, color, fmt=RENDER_FORMAT, width=RENDER_WIDTH):
+    """
+    Build the content-addressed key for one render
+
+    Args:
+        design_digest (str): Hash of the design image bytes
+        mockup_id (str): Mockup template UUID
+        smart_object_uuid (str): Smart object UUID (None uses the API default)
+        color (str): Hex color code
+        fmt (str): Output format
+        width (int): Output width in pixels
+
+    Returns:
+        str: Hex SHA-256 cache key
+    """
+    parts = [design_digest, mockup_id or "", smart_object_uuid or "", (color or "").lower(), fmt, str(width)]
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+def _memory_get(cache_key):
+    with _memory_lock:
+        image_url = _memory_cache.get(cache_key)
+        if image_url is not None:
+            _memory_cache.move_to_end(cache_key)
+        return image_url
+
+def _memory_put(cache_key, image_url):
+    with _memory_lock:
+        _memory_cache[cache_key] = image_url
+        _memory_cache.move_to_end(cache_key)
+        while len(_memory_cache) > RENDER_CACHE_MAX_ENTRIES:
+            _memory_cache.popitem(last=False)
+
+class RenderCache:
+    """
+    Render cache for one design image
+
+    Lookups check the in-memory LRU first and then the render_cache table in a
+    single query. Fresh renders are copied into our own bucket before they are
+    cached, so cached URLs do not depend on the render API keeping its exports.
+    """
+
+    def __init__(self, db, design_digest, s3_client):
+        """
+        Args:
+            db: Database instance used for the render_cache table (may be None)
+            design_digest (str): Hash of the design image bytes
+            s3_client: boto3 S3 client used to persist renders
+        """
+        self.db = db
+        self.design_digest = design_digest
+        self.s3_client = s3_client
+
+    def key(self, mockup_id, smart_object_uuid, color):
+        """Cache key for a (template, color) render of this design"""
+        return render_cache_key(self.design_digest, mockup_id, smart_object_uuid, color)
+
+    def get_many(self, jobs):
+        """
+        Look up cached renders
+
+        Call from the Streamlit thread; it may query the database.
+
+        Args:
+            jobs (list): (mockup_id, smart_object_uuid, color) tuples
+
+        Returns:
+            dict: Mapping of job tuple to mockup data for every cache hit
+        """
+        hits = {}
+        missing = {}
+        for job in jobs:
+            cache_key = self.key(*job)
+            image_url = _memory_get(cache_key)
+            if image_url:
+                hits[job] = {'rendered_image_url': image_url, 'color': job[2]}
+            else:
+                missing[cache_key] = job
+
+        if missing and self.db is not None:
+            stored = self.db.get_render_cache_entries(list(missing.keys()))
+            for cache_key, image_url in stored.items():
+                job = missing[cache_key]
+                _memory_put(cache_key, image_url)
+                hits[job] = {'rendered_image_url': image_url, 'color': job[2]}
+
+        return hits
+
+    def persist(self, mockup_id, smart_object_uuid, color, result):
+        """
+        Copy a fresh render into S3
+
+        Safe to call from worker threads; it touches neither Streamlit nor the database.
+
+        Args:
+            mockup_id (str): Mockup template UUID
+            smart_object_uuid (str): Smart object UUID
+            color (str): Hex color code
+            result (dict): Mockup data returned by the render call
+
+        Returns:
+            tuple: (result, entry) where result points at the S3 copy when it succeeded
+                   and entry is the row to cache, or None if the render could not be stored
+        """
+        if not result or not self.s3_client:
+            return result, None
+
+        cache_key = self.key(mockup_id, smart_object_uuid, color)
+        s3_key = f"{MOCKUP_FOLDER}/renders/{cache_key}.{RENDER_FORMAT}"
+        image_url = store_url_in_s3(
+            result['rendered_image_url'], s3_key, self.s3_client,
+            content_type=f"image/{RENDER_FORMAT}"
+        )
+        if not image_url:
+            return result, None
+
+        result = dict(result, rendered_image_url=image_url)
+        entry = {
+            'cache_key': cache_key,
+            'design_hash': self.design_digest,
+            'mockup_uuid': mockup_id,
+            'smart_object_uuid': smart_object_uuid or "",
+            'color': color,
+            'format': RENDER_FORMAT,
+            'width': RENDER_WIDTH,
+            'image_url': image_url
+        }
+        return result, entry
+
+    def put_many(self, entries):
+        """
+        Record persisted renders in memory and in the database
+
+        Call from the Streamlit thread. Thumbnails of the renders are queued
+        with schedule_thumbnails().
+
+        Args:
+            entries (list): Entries returned by persist()
+        """
+        entries = [entry for entry in entries if entry]
+        for entry in entries:
+            _memory_put(entry['cache_key'], entry['image_url'])
+        if entries and self.db is not None:
+            self.db.save_render_cache_entries(entries)
+            schedule_thumbnails([entry['image_url'] for entry in entries], self.s3_client, db=self.db)
+
+    def render_one(self, render_fn, image_url, color, mockup_id, smart_object_uuid):
+        """
+        Return a cached render, rendering and caching it on a miss
+
+        Args:
+            render_fn (callable): Called as render_fn(image_url, color, mockup_id, smart_object_uuid)
+            image_url (str): URL of the design image
+            color (str): Hex color code
+            mockup_id (str): Mockup template UUID
+            smart_object_uuid (str): Smart object UUID
+
+        Returns:
+            dict: Mockup data or None if the render failed
+        """
+        job = (mockup_id, smart_object_uuid, color)
+        hit = self.get_many([job]).get(job)
+        if hit:
+            return hit
+
+        result = render_fn(image_url, color, mockup_id, smart_object_uuid)
+        result, entry = self.persist(mockup_id, smart_object_uuid, color, result)
+        self.put_many([entry])
+        return result
@@ -0,0 +1,120 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from config import RENDER_MAX_WORKERS
+from utils.dynamic_mockups import generate_mockup_api_call
+
+def _render_job(render_fn, image_url, color, mockup_id, smart_object_uuid):
+    """Run a single render, turning unexpected errors into a failed result"""
+    try:
+        return render_fn(image_url, color, mockup_id, smart_object_uuid)
+    except Exception as e:
+        print(f"Error rendering mockup {mockup_id} ({color}): {e}")
+        return None
+
+def _render_and_persist(cache, render_fn, image_url, color, mockup_id, smart_object_uuid):
+    """Render a single job and copy the result into S3 for the render cache"""
+    result = _render_job(render_fn, image_url, color, mockup_id, smart_object_uuid)
+    try:
+        return cache.persist(mockup_id, smart_object_uuid, color, result)
+    except Exception as e:
+        print(f"Error caching mockup {mockup_id} ({color}): {e}")
+        return result, None
+
+def render_all_mockups(image_url, templates, colors, on_progress=None, max_workers=None, render_fn=None, cache=None):
+    """
+    Render every (template x color) pair concurrently
+    
+    Renders run on a bounded thread pool; each API call is paced by the shared
+    per-host rate limiter in utils.dynamic_mockups. Worker threads never touch
+    Streamlit; `on_progress` is called from the calling thread as each render
+    finishes, in completion order. With a `cache`, previously rendered pairs are
+    served without an API call and fresh renders are stored for next time.
+    
+    Args:
+        image_url (str): URL of the design image
+        templates (list): List of (mockup_id, smart_object_uuid) tuples
+        colors (list): List of hex color codes
+        on_progress (callable, optional): Called as on_progress(completed, total, mockup_id, color, result)
+        max_workers (int, optional): Concurrency limit, defaults to RENDER_MAX_WORKERS
+        render_fn (callable, optional): Render function, defaults to generate_mockup_api_call
+        cache (RenderCache, optional): Render cache; hits are reported first and only
+                                       misses are sent to the API
+        
+    Returns:
+        list: One {'mockup_id', 'smart_object_uuid', 'results'} dict per template that
+              produced at least one mockup, in template order with results in color order
+    """
+    render_fn = render_fn or generate_mockup_api_call
+    max_workers = max(1, max_workers or RENDER_MAX_WORKERS)
+    
+    total = len(templates) * len(colors)
+    if total == 0:
+        return []
+    
+    results = [[None] * len(colors) for _ in templates]
+    completed = 0
+    
+    pending = []
+    for template_idx, (mockup_id, smart_object_uuid) in enumerate(templates):
+        for color_idx, color in enumerate(colors):
+            pending.append((template_idx, color_idx))
+    
+    if cache is not None:
+        jobs = [(templates[t][0], templates[t][1], colors[c]) for t, c in pending]
+        hits = cache.get_many(jobs)
+        misses = []
+        for (template_idx, color_idx), job in zip(pending, jobs):
+            hit = hits.get(job)
+            if not hit:
+                misses.append((template_idx, color_idx))
+                continue
+            results[template_idx][color_idx] = hit
+            completed += 1
+            if on_progress:
+                on_progress(completed, total, job[0], job[2], hit)
+        pending = misses
+    
+    new_entries = []
+    if pending:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(pending)), thread_name_prefix="render") as executor:
+            futures = {}
+            for template_idx, color_idx in pending:
+                mockup_id, smart_object_uuid = templates[template_idx]
+                if cache is not None:
+                    future = executor.submit(
+                        _render_and_persist, cache, render_fn, image_url, colors[color_idx], mockup_id, smart_object_uuid
+                    )
+                else:
+                    future = executor.submit(
+                        _render_job, render_fn, image_url, colors[color_idx], mockup_id, smart_object_uuid
+                    )
+                futures[future] = (template_idx, color_idx)
+            
+            for future in as_completed(futures):
+                template_idx, color_idx = futures[future]
+                result = future.result()
+                if cache is not None:
+                    result, entry = result
+                    if entry:
+                        new_entries.append(entry)
+                results[template_idx][color_idx] = result
+                completed += 1
+                
+                if on_progress:
+                    mockup_id = templates[template_idx][0]
+                    on_progress(completed, total, mockup_id, colors[color_idx], result)
+    
+    if cache is not None and new_entries:
+        cache.put_many(new_entries)
+    
+    all_results = []
+    for (mockup_id, smart_object_uuid), template_results in zip(templates, results):
+        template_results = [result for result in template_results if result]
+        if template_results:
+            all_results.append({
+                'mockup_id': mockup_id,
+                'smart_object_uuid': smart_object_uuid,
+                'results': template_results
+            })
+    
+    return all_results
@@ -1,12 +1,24 @@
+import atexit
 import boto3
+import hashlib
+import threading
 import os
 import uuid
 import io
+import time
 import streamlit as st
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from boto3.s3.transfer import TransferConfig, create_transfer_manager
+from botocore.config import Config
 from botocore.exceptions import ClientError
 from dotenv import load_dotenv
-import requests
 from PIL import Image
+from utils.http_client import get_http_session
+from utils.image_cache import get_image
+from config import (
+    TRANSFER_MAX_WORKERS, TRANSFER_MAX_RETRIES, THUMBNAIL_WIDTHS, THUMBNAIL_MAX_WORKERS,
+    S3_MULTIPART_THRESHOLD_MB, S3_MULTIPART_CHUNKSIZE_MB, S3_UPLOAD_CONCURRENCY, S3_MAX_POOL_CONNECTIONS
+)
 
 # Load environment variables
 load_dotenv()
@@ -20,29 +32,399 @@ S3_BUCKET_NAME = os.getenv('S3_BUCKET_NAME')
 # Folder structure in S3
 ORIGINAL_FOLDER = 'original'
 MOCKUP_FOLDER = 'mockups'
+THUMBNAIL_FOLDER = 'thumbs'
+
+# WebP quality of list-view thumbnails
+THUMBNAIL_QUALITY = 80
+
+# Shared by every managed transfer: files above the threshold are sent as
+# parallel multipart uploads and read from the source one part at a time.
+# max_concurrency sizes the shared transfer manager's worker pool, so it is the
+# number of parts in flight across all uploads of the process.
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=S3_MULTIPART_THRESHOLD_MB * 1024 * 1024,
+    multipart_chunksize=S3_MULTIPART_CHUNKSIZE_MB * 1024 * 1024,
+    max_concurrency=S3_UPLOAD_CONCURRENCY
+)
+# Concurrent transfers may all be reading their source at the same time
+TRANSFER_CONFIG.max_submission_concurrency = TRANSFER_MAX_WORKERS
+
+_s3_client = None
+_transfer_manager = None
+_thumbnail_executor = None
+_s3_lock = threading.Lock()
+
+def shared_s3_client():
+    """
+    The process-wide S3 client
+    
+    boto3 clients are thread-safe, so one client (and its connection pool of
+    S3_MAX_POOL_CONNECTIONS) is shared by every page, worker thread and script
+    instead of each building its own. Does not touch Streamlit.
+    
+    Returns:
+        S3 client, or None when the AWS credentials or bucket are not configured
+        
+    Raises:
+        Exception: If the client cannot be created
+    """
+    global _s3_client
+    if _s3_client is None:
+        if not all([AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, S3_BUCKET_NAME]):
+            return None
+        with _s3_lock:
+            if _s3_client is None:
+                _s3_client = boto3.client(
+                    's3',
+                    aws_access_key_id=AWS_ACCESS_KEY_ID,
+                    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+                    region_name=AWS_REGION,
+                    config=Config(
+                        max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+                        retries={'max_attempts': 5, 'mode': 'standard'}
+                    )
+                )
+    return _s3_client
+
+def get_transfer_manager():
+    """
+    The process-wide transfer manager bound to the shared client
+    
+    Returns:
+        TransferManager, or None when S3 is not configured
+    """
+    global _transfer_manager
+    if _transfer_manager is None:
+        client = shared_s3_client()
+        if client is None:
+            return None
+        with _s3_lock:
+            if _transfer_manager is None:
+                _transfer_manager = create_transfer_manager(client, TRANSFER_CONFIG)
+                atexit.register(_transfer_manager.shutdown)
+    return _transfer_manager
 
-@st.cache_resource
 def get_s3_client():
-    """Get a cached S3 client connection"""
+    """Get the shared S3 client, reporting configuration problems in Streamlit"""
     try:
-        if not all([AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, S3_BUCKET_NAME]):
+        client = shared_s3_client()
+        if client is None:
             st.error("AWS S3 credentials not fully configured. Check your .env file.")
-            return None
-            
-        return boto3.client(
-            's3',
-            aws_access_key_id=AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-            region_name=AWS_REGION
-        )
+        return client
     except Exception as e:
         st.error(f"Error connecting to AWS S3: {e}")
         return None
 
+def _upload_fileobj(client, fileobj, bucket_name, s3_key, content_type):
+    """
+    Managed upload of a file object, through the shared transfer manager when
+    the shared client is used
+    """
+    if client is _s3_client and get_transfer_manager() is not None:
+        future = _transfer_manager.upload(fileobj, bucket_name, s3_key, extra_args={'ContentType': content_type})
+        future.result()
+    else:
+        client.upload_fileobj(fileobj, bucket_name, s3_key, ExtraArgs={'ContentType': content_type}, Config=TRANSFER_CONFIG)
+
+def s3_object_url(s3_key, bucket_name=None, region=None):
+    """Public URL of an object in the bucket"""
+    return f"https://{bucket_name or S3_BUCKET_NAME}.s3.{region or AWS_REGION}.amazonaws.com/{s3_key}"
+
+def s3_key_from_url(s3_url, bucket_name=None, region=None):
+    """
+    Object key of a URL in our bucket
+    
+    Returns:
+        str: Key, or None when the URL points somewhere else
+    """
+    prefix = s3_object_url("", bucket_name, region)
+    if not s3_url or not s3_url.startswith(prefix):
+        return None
+    return s3_url[len(prefix):] or None
+
+def thumbnail_key(s3_key, width):
+    """Key of the WebP thumbnail of an object, e.g. thumbs/96/mockups/abc.webp"""
+    return f"{THUMBNAIL_FOLDER}/{width}/{os.path.splitext(s3_key)[0]}.webp"
+
+def thumbnail_url(s3_url, width, bucket_name=None, region=None):
+    """
+    URL the thumbnail of an image in our bucket is stored at
+    
+    This only derives the URL; use Database.get_thumbnail_urls() to find
+    thumbnails that were actually created.
+    
+    Args:
+        s3_url: URL of the original image
+        width: Thumbnail width in pixels
+        
+    Returns:
+        str: Thumbnail URL, or None for images outside the bucket
+    """
+    s3_key = s3_key_from_url(s3_url, bucket_name, region)
+    if not s3_key:
+        return None
+    return s3_object_url(thumbnail_key(s3_key, width), bucket_name, region)
+
+def render_thumbnails(content, widths=None):
+    """
+    Downscale an image to WebP thumbnails
+    
+    Args:
+        content: Encoded image bytes or a readable, seekable file object
+        widths: Thumbnail widths, defaults to THUMBNAIL_WIDTHS
+        
+    Returns:
+        dict: Mapping of width to WebP bytes; images are never upscaled
+    """
+    image = Image.open(io.BytesIO(content) if isinstance(content, (bytes, bytearray)) else content)
+    image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if image.mode in ('LA', 'P', 'PA') else 'RGB')
+    
+    # Largest first, so each step resizes the previous (smaller) result
+    thumbnails = {}
+    for width in sorted(set(widths or THUMBNAIL_WIDTHS), reverse=True):
+        if image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, format='WEBP', quality=THUMBNAIL_QUALITY, method=4)
+        thumbnails[width] = buffer.getvalue()
+    return thumbnails
+
+def upload_thumbnails(content, s3_key, s3_client, bucket_name=None, region=None):
+    """
+    Create the thumbnails of an uploaded image under the thumbs/ prefix
+    
+    Safe to call from worker threads; errors are printed and leave the
+    original upload alone.
+    
+    Args:
+        content: Encoded bytes of the original image, or a seekable file object
+        s3_key: Key the original was stored under
+        s3_client: boto3 S3 client
+        bucket_name: Destination bucket, defaults to S3_BUCKET_NAME
+        region: Bucket region used to build URLs, defaults to AWS_REGION
+        
+    Returns:
+        dict: Mapping of width to thumbnail URL, empty if they could not be created
+    """
+    if not s3_client or not THUMBNAIL_WIDTHS:
+        return {}
+    
+    try:
+        rendered = render_thumbnails(content)
+    except Exception as e:
+        print(f"Could not create thumbnails for {s3_key}: {e}")
+        return {}
+    
+    thumbnails = {}
+    for width, body in rendered.items():
+        key = thumbnail_key(s3_key, width)
+        try:
+            s3_client.put_object(
+                Body=body,
+                Bucket=bucket_name or S3_BUCKET_NAME,
+                Key=key,
+                ContentType='image/webp',
+                CacheControl='public, max-age=31536000, immutable'
+            )
+            thumbnails[width] = s3_object_url(key, bucket_name, region)
+        except Exception as e:
+            print(f"Error uploading thumbnail {key}: {e}")
+    return thumbnails
+
+def record_thumbnails(thumbnails_by_url, db=None):
+    """
+    Save thumbnail URLs so list pages can find them
+    
+    Call from the Streamlit thread, or pass `db` to call it from a worker.
+    
+    Args:
+        thumbnails_by_url: Mapping of source image URL to {width: thumbnail URL}
+        db: Database instance, defaults to the shared connection
+    """
+    thumbnails_by_url = {url: thumbs for url, thumbs in thumbnails_by_url.items() if url and thumbs}
+    if not thumbnails_by_url:
+        return
+    
+    try:
+        if db is None:
+            from utils.database import get_database_connection
+            db = get_database_connection()
+        db.save_thumbnails(thumbnails_by_url)
+    except Exception as e:
+        print(f"Error recording thumbnails: {e}")
+
+def thumbnails_from_s3(s3_url, s3_client, bucket_name=None, region=None):
+    """
+    Read a stored original back from S3 and upload its thumbnails
+    
+    Safe to call from worker threads; errors are printed.
+    
+    Args:
+        s3_url: URL of an image in our bucket
+        s3_client: boto3 S3 client
+        bucket_name: Bucket holding the image, defaults to S3_BUCKET_NAME
+        region: Bucket region used to build URLs, defaults to AWS_REGION
+        
+    Returns:
+        dict: Mapping of width to thumbnail URL, empty if they could not be created
+    """
+    s3_key = s3_key_from_url(s3_url, bucket_name, region)
+    if not s3_client or not s3_key:
+        return {}
+    
+    try:
+        body = s3_client.get_object(Bucket=bucket_name or S3_BUCKET_NAME, Key=s3_key)['Body']
+        try:
+            content = body.read()
+        finally:
+            body.close()
+    except Exception as e:
+        print(f"Error reading {s3_key} for thumbnails: {e}")
+        return {}
+    return upload_thumbnails(content, s3_key, s3_client, bucket_name, region)
+
+def _thumbnail_job(s3_url, s3_client, db, bucket_name, region):
+    record_thumbnails({s3_url: thumbnails_from_s3(s3_url, s3_client, bucket_name, region)}, db)
+
+def _get_thumbnail_executor():
+    global _thumbnail_executor
+    with _s3_lock:
+        if _thumbnail_executor is None:
+            _thumbnail_executor = ThreadPoolExecutor(
+                max_workers=max(1, THUMBNAIL_MAX_WORKERS), thread_name_prefix="thumbnails"
+            )
+        return _thumbnail_executor
+
+def schedule_thumbnails(s3_urls, s3_client, db=None, bucket_name=None, region=None):
+    """
+    Create thumbnails of images already stored in S3, in the background
+    
+    Streamed copies never hold a whole image, so thumbnails are made afterwards
+    by THUMBNAIL_MAX_WORKERS background workers that read each original back
+    from S3. Only that many images are in memory at once, however many
+    transfers finished. List pages fall back to the original until the
+    thumbnails are recorded.
+    
+    Call from the Streamlit thread, which resolves the database connection.
+    
+    Args:
+        s3_urls: URLs of images in our bucket
+        s3_client: boto3 S3 client
+        db: Database instance, defaults to the shared connection
+        bucket_name: Bucket holding the images, defaults to S3_BUCKET_NAME
+        region: Bucket region used to build URLs, defaults to AWS_REGION
+    """
+    s3_urls = [url for url in dict.fromkeys(s3_urls) if url]
+    if not s3_client or not THUMBNAIL_WIDTHS or not s3_urls:
+        return
+    
+    if db is None:
+        try:
+            from utils.database import get_database_connection
+            db = get_database_connection()
+        except Exception as e:
+            print(f"Error recording thumbnails: {e}")
+            return
+    
+    executor = _get_thumbnail_executor()
+    for s3_url in s3_urls:
+        executor.submit(_thumbnail_job, s3_url, s3_client, db, bucket_name, region)
+
+class _ReadOnlyStream:
+    """Exposes only read(), so a managed transfer can neither seek nor close the caller's file"""
+    
+    def __init__(self, stream):
+        self.stream = stream
+    
+    def read(self, size=-1):
+        return self.stream.read(size)
+
+class _HashingReader(_ReadOnlyStream):
+    """Read-only file wrapper that hashes everything read through it"""
+    
+    def __init__(self, stream):
+        super().__init__(stream)
+        self.sha256 = hashlib.sha256()
+    
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        self.sha256.update(data)
+        return data
+
+def file_digest(fileobj, chunk_size=1024 * 1024):
+    """
+    SHA-256 of a file object, read in chunks from its current position
+    
+    Returns:
+        str: Hex digest
+    """
+    sha256 = hashlib.sha256()
+    for chunk in iter(lambda: fileobj.read(chunk_size), b''):
+        sha256.update(chunk)
+    return sha256.hexdigest()
+
+def content_key(folder, digest, file_extension):
+    """Content-addressed key: identical bytes always map to the same object"""
+    return f"{folder}/{digest}{file_extension}"
+
+def object_exists(s3_client, s3_key, bucket_name=None):
+    """
+    Check for an object with a HEAD request
+    
+    Returns:
+        bool: True if the object exists
+        
+    Raises:
+        ClientError: For errors other than a missing object
+    """
+    try:
+        s3_client.head_object(Bucket=bucket_name or S3_BUCKET_NAME, Key=s3_key)
+        return True
+    except ClientError as e:
+        # Without s3:ListBucket S3 answers 403 instead of 404 for missing keys
+        if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound', '403'):
+            return False
+        raise
+
+def upload_stream_to_s3(fileobj, s3_key, content_type, s3_client, bucket_name=None, region=None, digest=None):
+    """
+    Stream a file object into S3, hashing it in the same pass
+    
+    The managed transfer reads the source one part at a time using
+    TRANSFER_CONFIG, so the file is never copied into memory as a whole. The
+    file is wrapped so that only read() is visible: parts are then read exactly
+    once, in order, which keeps the running hash correct, and the transfer
+    cannot close a file the caller still uses.
+    
+    Args:
+        fileobj: Readable file object positioned at the start of the data
+        s3_key: Destination key within the bucket
+        content_type: MIME type to store with the object
+        s3_client: boto3 S3 client
+        bucket_name: Destination bucket, defaults to S3_BUCKET_NAME
+        region: Bucket region used to build the URL, defaults to AWS_REGION
+        digest: SHA-256 computed earlier, skips hashing
+        
+    Returns:
+        tuple: (S3 URL, hex SHA-256 of the uploaded bytes)
+        
+    Raises:
+        ClientError: If S3 rejects the upload
+    """
+    reader = _HashingReader(fileobj) if digest is None else _ReadOnlyStream(fileobj)
+    _upload_fileobj(s3_client, reader, bucket_name or S3_BUCKET_NAME, s3_key, content_type)
+    return s3_object_url(s3_key, bucket_name, region), digest or reader.sha256.hexdigest()
+
 def upload_file_to_s3(file_content, folder, file_extension='.jpg', content_type='image/jpeg'):
     """
     Upload a file to S3 bucket
     
+    The key is the SHA-256 of the content; when that object already exists the
+    upload is skipped and its URL returned.
+    
     Args:
         file_content: Binary content of the file
         folder: Folder within the bucket (original or mockups)
@@ -58,9 +440,11 @@ def upload_file_to_s3(file_content, folder, file_extension='.jpg', content_type=
         return None
         
     try:
-        # Generate a unique filename
-        filename = f"{uuid.uuid4()}{file_extension}"
-        s3_key = f"{folder}/{filename}"
+        # Name the object after its content so identical files are stored once
+        s3_key = content_key(folder, hashlib.sha256(file_content).hexdigest(), file_extension)
+        url = s3_object_url(s3_key)
+        if object_exists(s3_client, s3_key):
+            return url
         
         # Upload to S3
         s3_client.put_object(
@@ -70,62 +454,72 @@ def upload_file_to_s3(file_content, folder, file_extension='.jpg', content_type=
             ContentType=content_type
         )
         
-        # Generate the URL
-        url = f"https://{S3_BUCKET_NAME}.s3.{AWS_REGION}.amazonaws.com/{s3_key}"
+        # Small WebP copies for list views
+        if content_type and content_type.startswith('image/'):
+            record_thumbnails({url: upload_thumbnails(file_content, s3_key, s3_client)})
         return url
     except Exception as e:
         st.error(f"Error uploading to S3: {e}")
         return None
 
-def upload_image_file_to_s3(file, folder=ORIGINAL_FOLDER):
+def upload_image_file_to_s3(file, folder=ORIGINAL_FOLDER, return_digest=False):
     """
     Upload a Streamlit uploaded image file to S3
     
+    The file is streamed from its buffer with a managed multipart transfer
+    instead of being copied into memory with getvalue(). Its key is the SHA-256
+    of the content (hashed from the same buffer first), so identical files are
+    stored once and a re-upload returns the existing URL.
+    
     Args:
         file: Streamlit UploadedFile object
         folder: S3 folder to store in
+        return_digest: Also return the SHA-256 of the file content
         
     Returns:
-        str: S3 URL if successful, None otherwise
+        str: S3 URL if successful, None otherwise. With return_digest, a
+             (url, digest) tuple, (None, None) on failure
     """
+    failed = (None, None) if return_digest else None
     if not file:
-        return None
+        return failed
     
     # Verify AWS credentials before attempting upload
     if not all([AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, S3_BUCKET_NAME, AWS_REGION]):
         st.error("AWS credentials are missing or incomplete. Check your .env file.")
-        return None
+        return failed
     
     # Debug information to help troubleshoot (remove in production)
     st.info(f"Using bucket: {S3_BUCKET_NAME} in region: {AWS_REGION}")
     
     try:
         # Get file details
-        content = file.getvalue()
         file_extension = os.path.splitext(file.name)[1].lower()
         content_type = file.type
         
         s3_client = get_s3_client()
         if not s3_client:
             st.error("Failed to initialize S3 client. Check AWS credentials.")
-            return None
-        
-        # Generate a unique filename
-        filename = f"{uuid.uuid4()}{file_extension}"
-        s3_key = f"{folder}/{filename}"
+            return failed
         
         # Upload to S3 with explicit error handling
         try:
-            s3_client.put_object(
-                Body=content,
-                Bucket=S3_BUCKET_NAME,
-                Key=s3_key,
-                ContentType=content_type
-            )
+            # Name the object after its content; a re-upload of the same
+            # artwork finds the existing object and skips the PUT
+            file.seek(0)
+            digest = file_digest(file)
+            s3_key = content_key(folder, digest, file_extension)
+            url = s3_object_url(s3_key)
             
-            # Generate the URL
-            url = f"https://{S3_BUCKET_NAME}.s3.{AWS_REGION}.amazonaws.com/{s3_key}"
-            return url
+            if not object_exists(s3_client, s3_key):
+                file.seek(0)
+                upload_stream_to_s3(file, s3_key, content_type, s3_client, digest=digest)
+                # Decoding a large design for its thumbnails would undo the
+                # streaming, so they are made in the background
+                schedule_thumbnails([url], s3_client)
+
+            file.seek(0)
+            return (url, digest) if return_digest else url
         except ClientError as e:
             error_code = e.response.get('Error', {}).get('Code', 'Unknown')
             error_message = e.response.get('Error', {}).get('Message', str(e))
@@ -136,10 +530,10 @@ def upload_image_file_to_s3(file, folder=ORIGINAL_FOLDER):
             elif error_code == 'NoSuchBucket':
                 st.warning(f"The bucket '{S3_BUCKET_NAME}' does not exist or you don't have permission to access it.")
             
-            return None
+            return failed
     except Exception as e:
         st.error(f"Error processing uploaded file: {e}")
-        return None
+        return failed
 
 def upload_mockup_to_s3(image_path_or_url, is_url=False):
     """
@@ -155,7 +549,7 @@ def upload_mockup_to_s3(image_path_or_url, is_url=False):
     try:
         if is_url:
             # Download from URL
-            response = requests.get(image_path_or_url)
+            response = get_http_session().get(image_path_or_url)
             if response.status_code != 200:
                 st.error(f"Error downloading image: Status code {response.status_code}")
                 return None
@@ -182,10 +576,126 @@ def upload_mockup_to_s3(image_path_or_url, is_url=False):
         st.error(f"Error uploading mockup to S3: {e}")
         return None
 
+def store_url_in_s3(url, s3_key, s3_client, content_type='image/png', bucket_name=None, region=None, max_retries=0):
+    """
+    Stream a remote file into S3 under a fixed key
+    
+    Safe to call from worker threads: it reports errors with print rather than
+    Streamlit, and the body is streamed from the HTTP response into S3
+    without being written to disk. Failed transfers are retried from the start.
+    
+    Args:
+        url: URL of the file to copy
+        s3_key: Destination key within the bucket
+        s3_client: boto3 S3 client (resolve it on the Streamlit thread)
+        content_type: MIME type to store with the object
+        bucket_name: Destination bucket, defaults to S3_BUCKET_NAME
+        region: Bucket region used to build the URL, defaults to AWS_REGION
+        max_retries: Extra attempts after a failed download or upload
+        
+    Returns:
+        str: S3 URL if successful, None otherwise
+    """
+    if not s3_client:
+        return None
+    
+    bucket_name = bucket_name or S3_BUCKET_NAME
+    
+    for attempt in range(max_retries + 1):
+        if attempt:
+            time.sleep(min(2 ** (attempt - 1), 8))
+            
+        try:
+            with get_http_session().get(url, stream=True) as response:
+                if response.status_code != 200:
+                    print(f"Error downloading {url}: Status code {response.status_code}")
+                    if response.status_code < 500 and response.status_code != 429:
+                        return None
+                    continue
+                    
+                response.raw.decode_content = True
+                _upload_fileobj(s3_client, _ReadOnlyStream(response.raw), bucket_name, s3_key, content_type)
+                
+            return s3_object_url(s3_key, bucket_name, region)
+        except Exception as e:
+            print(f"Error storing {url} in S3 (attempt {attempt + 1}): {e}")
+            
+    return None
+
+def transfer_urls_to_s3(items, s3_client, bucket_name=None, region=None, content_type='image/png',
+                        max_workers=None, max_retries=None, on_progress=None):
+    """
+    Copy many remote files into S3 concurrently
+    
+    Each file is streamed from its URL straight into S3 on a bounded thread
+    pool, with per-item retries. Files that already live in the destination
+    bucket are not copied again. `on_progress` is called from the calling
+    thread as each transfer finishes, so it may update Streamlit widgets.
+    Thumbnails of the copied files are queued with schedule_thumbnails().
+    
+    Args:
+        items: List of (source_url, s3_key) tuples
+        s3_client: boto3 S3 client
+        bucket_name: Destination bucket, defaults to S3_BUCKET_NAME
+        region: Bucket region used to build URLs, defaults to AWS_REGION
+        content_type: MIME type to store with each object
+        max_workers: Concurrency limit, defaults to TRANSFER_MAX_WORKERS
+        max_retries: Retries per item, defaults to TRANSFER_MAX_RETRIES
+        on_progress: Called as on_progress(completed, total, s3_key, s3_url)
+        
+    Returns:
+        dict: Mapping of s3_key to S3 URL, or None for transfers that failed
+    """
+    max_workers = max(1, max_workers or TRANSFER_MAX_WORKERS)
+    max_retries = TRANSFER_MAX_RETRIES if max_retries is None else max_retries
+    bucket_prefix = s3_object_url("", bucket_name, region)
+    
+    results = {}
+    to_transfer = []
+    for url, s3_key in items:
+        if url and url.startswith(bucket_prefix):
+            results[s3_key] = url
+        else:
+            to_transfer.append((url, s3_key))
+    
+    total = len(items)
+    completed = 0
+    if on_progress:
+        for s3_key, s3_url in list(results.items()):
+            completed += 1
+            on_progress(completed, total, s3_key, s3_url)
+    
+    if not to_transfer:
+        return results
+    
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(to_transfer)), thread_name_prefix="s3-transfer") as executor:
+        futures = {
+            executor.submit(
+                store_url_in_s3, url, s3_key, s3_client, content_type,
+                bucket_name, region, max_retries
+            ): s3_key
+            for url, s3_key in to_transfer
+        }
+        
+        for future in as_completed(futures):
+            s3_key = futures[future]
+            results[s3_key] = future.result()
+            completed += 1
+            if on_progress:
+                on_progress(completed, total, s3_key, results[s3_key])
+    
+    schedule_thumbnails(
+        [results[s3_key] for _, s3_key in to_transfer if results[s3_key]],
+        s3_client, bucket_name=bucket_name, region=region
+    )
+    return results
+
 def get_image_from_s3_url(s3_url):
     """
     Display an image from S3 URL in Streamlit
     
+    Served from the local image cache (utils.image_cache) when possible.
+    
     Args:
         s3_url: S3 URL of the image
         
@@ -196,12 +706,10 @@ def get_image_from_s3_url(s3_url):
         return None
         
     try:
-        response = requests.get(s3_url)
-        if response.status_code == 200:
-            return Image.open(io.BytesIO(response.content))
-        else:
-            st.error(f"Error fetching image: Status code {response.status_code}")
-            return None
+        return get_image(s3_url)
+    except IOError as e:
+        st.error(f"Error fetching image: {e}")
+        return None
     except Exception as e:
         st.error(f"Error processing image from S3: {e}")
         return None
@@ -210,6 +718,9 @@ def delete_image_from_s3(s3_url):
     """
     Delete an image from S3 using its URL
     
+    Uploads are content-addressed, so other records may point at the same
+    object; only delete images nothing else references.
+    
     Args:
         s3_url: S3 URL of the image to delete
         
@@ -238,6 +749,13 @@ def delete_image_from_s3(s3_url):
             Bucket=S3_BUCKET_NAME,
             Key=s3_key
         )
+        
+        # Its thumbnails go with it
+        if THUMBNAIL_WIDTHS:
+            s3_client.delete_objects(
+                Bucket=S3_BUCKET_NAME,
+                Delete={'Objects': [{'Key': thumbnail_key(s3_key, width)} for width in THUMBNAIL_WIDTHS], 'Quiet': True}
+            )
         return True
     except Exception as e:
         st.error(f"Error deleting image from S3: {e}")
@@ -301,7 +819,7 @@ def verify_s3_upload_functionality():
         test_url = f"https://{S3_BUCKET_NAME}.s3.{AWS_REGION}.amazonaws.com/{test_key}"
         
         # Verify we can access the image
-        response = requests.head(test_url)
+        response = get_http_session().head(test_url)
         if response.status_code == 200:
             # Clean up the test image
             s3_client.delete_object(Bucket=S3_BUCKET_NAME, Key=test_key)
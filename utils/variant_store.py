@@ -0,0 +1,224 @@
+"""
+Normalized storage for variants, their mockups and product templates
+
+generated_products and products keep their JSON-in-TEXT columns for
+compatibility; these helpers turn those values into rows of the variant,
+variant_mockup and product_template tables so they can be filtered and joined
+in SQL. They work on a plain DB-API cursor and are shared by the Database
+write-through and the backfill migration.
+"""
+import json
+
+def _load_json(value):
+    """Decode a JSON cell, returning None when it is empty or not JSON"""
+    if isinstance(value, (dict, list)):
+        return value
+    if not isinstance(value, str) or not value.strip().startswith(('[', '{')):
+        return None
+    try:
+        return json.loads(value)
+    except ValueError:
+        return None
+
+def _as_list(value):
+    """Turn a size/color cell (JSON array or plain value) into a list of strings"""
+    data = _load_json(value)
+    if isinstance(data, list):
+        items = [item.get('name') if isinstance(item, dict) else item for item in data]
+        return [str(item).strip() for item in items if item not in (None, '')]
+    if data is None and isinstance(value, str) and value.strip():
+        return [value.strip()]
+    return []
+
+def _split_urls(urls):
+    """Mockup URLs of one color, stored either as a list or a comma separated string"""
+    if isinstance(urls, list):
+        return [str(url).strip() for url in urls if url]
+    if isinstance(urls, dict):
+        return [str(url).strip() for url in urls.values() if url]
+    if isinstance(urls, str):
+        return [url.strip() for url in urls.split(',') if url.strip()]
+    return []
+
+def _color_key(color):
+    return str(color).lstrip('#').lower()
+
+def _variant_key(product_id, size, color):
+    """
+    Identity of a variant as the uq_variant index sees it
+
+    size and color use a case-insensitive, PAD SPACE collation, so "#ff0000"
+    and "#FF0000", or "M" and "M ", are the same variant there.
+    """
+    return product_id, size.strip().upper(), color.strip().upper()
+
+def variant_records(size, color, mockup_urls, mockup_ids=None):
+    """
+    Expand one generated product into its (size, color) variants
+
+    Every size is combined with every color. Mockups stored under a color key
+    belong to the variants of that color; a plain list of mockup URLs belongs
+    to every variant. When the colors are empty the mockup color keys are used.
+
+    Args:
+        size: size column value (JSON array or plain value)
+        color: color column value (JSON array of hex codes or plain value)
+        mockup_urls: mockup_urls column value ({color: urls} or a list of URLs)
+        mockup_ids: Optional JSON array of template UUIDs in the same order as
+                    each color's URLs
+
+    Returns:
+        list: Dicts with size, color and mockups, a list of (mockup_uuid, image_url)
+    """
+    urls = _load_json(mockup_urls)
+    template_ids = _load_json(mockup_ids) if mockup_ids else None
+    template_ids = template_ids if isinstance(template_ids, list) else []
+
+    by_color = {}
+    shared = []
+    if isinstance(urls, dict):
+        for key, value in urls.items():
+            by_color.setdefault(_color_key(key), []).extend(_split_urls(value))
+    elif isinstance(urls, list):
+        shared = _split_urls(urls)
+    elif isinstance(mockup_urls, str) and mockup_urls.startswith('http'):
+        shared = [mockup_urls.strip()]
+
+    sizes = _as_list(size) or ['']
+    colors = _as_list(color)
+    if not colors and isinstance(urls, dict):
+        colors = list(urls.keys())
+    colors = colors or ['']
+
+    records = []
+    for size_value in sizes:
+        for color_value in colors:
+            image_urls = by_color.get(_color_key(color_value), shared) if color_value else shared
+            mockups = [
+                (template_ids[i] if i < len(template_ids) and len(template_ids) == len(image_urls) else None, url)
+                for i, url in enumerate(image_urls)
+            ]
+            records.append({'size': size_value[:100].strip(), 'color': color_value[:50].strip(), 'mockups': mockups})
+    return records
+
+def template_records(mockup_ids, smart_object_uuids, mockup_id=None, smart_object_uuid=None):
+    """
+    List the mockup templates of a product
+
+    Args:
+        mockup_ids: JSON array of template UUIDs
+        smart_object_uuids: JSON array of smart object UUIDs, aligned with mockup_ids
+        mockup_id (str, optional): Single template UUID used when there is no list
+        smart_object_uuid (str, optional): Smart object UUID of the single template
+
+    Returns:
+        list: (mockup_uuid, smart_object_uuid) tuples without duplicates, in order
+    """
+    ids = _load_json(mockup_ids)
+    uuids = _load_json(smart_object_uuids)
+    ids = [str(item) for item in ids if item] if isinstance(ids, list) else []
+    uuids = uuids if isinstance(uuids, list) else []
+
+    if not ids and mockup_id:
+        ids = [mockup_id]
+        uuids = [smart_object_uuid]
+
+    records = []
+    seen = set()
+    for i, template_id in enumerate(ids):
+        if template_id in seen:
+            continue
+        seen.add(template_id)
+        records.append((template_id, uuids[i] if i < len(uuids) else None))
+    return records
+
+def replace_variants(cursor, products):
+    """
+    Rewrite the variant and variant_mockup rows of generated products
+
+    Args:
+        cursor: Dictionary cursor inside the caller's transaction
+        products (list): (generated_product_id, parent_product_id, size, color,
+                         mockup_urls, mockup_ids) tuples
+
+    Returns:
+        int: Number of variants written
+    """
+    if not products:
+        return 0
+
+    product_ids = [product[0] for product in products]
+    placeholders = ", ".join(["%s"] * len(product_ids))
+    # Mockups go with their variants through ON DELETE CASCADE
+    cursor.execute(f"DELETE FROM variant WHERE generated_product_id IN ({placeholders})", tuple(product_ids))
+
+    variant_rows = []
+    mockups_by_variant = {}
+    for product_id, parent_id, size, color, mockup_urls, mockup_ids in products:
+        for position, record in enumerate(variant_records(size, color, mockup_urls, mockup_ids)):
+            # The first spelling of a variant wins, as the unique key would allow only one
+            key = _variant_key(product_id, record['size'], record['color'])
+            if key in mockups_by_variant:
+                continue
+            variant_rows.append((product_id, parent_id, record['size'], record['color'], position))
+            mockups_by_variant[key] = record['mockups']
+
+    if not variant_rows:
+        return 0
+
+    cursor.executemany(
+        "INSERT INTO variant (generated_product_id, parent_product_id, size, color, position) "
+        "VALUES (%s, %s, %s, %s, %s)",
+        variant_rows
+    )
+
+    cursor.execute(
+        f"SELECT id, generated_product_id, size, color FROM variant WHERE generated_product_id IN ({placeholders})",
+        tuple(product_ids)
+    )
+    mockup_rows = []
+    for row in cursor.fetchall():
+        mockups = mockups_by_variant.get(_variant_key(row['generated_product_id'], row['size'], row['color']), [])
+        for position, (mockup_uuid, image_url) in enumerate(mockups):
+            mockup_rows.append((row['id'], position, mockup_uuid, image_url))
+
+    if mockup_rows:
+        cursor.executemany(
+            "INSERT INTO variant_mockup (variant_id, position, mockup_uuid, image_url) VALUES (%s, %s, %s, %s)",
+            mockup_rows
+        )
+    return len(variant_rows)
+
+def replace_product_templates(cursor, products):
+    """
+    Rewrite the product_template rows of regular products
+
+    Args:
+        cursor: Cursor inside the caller's transaction
+        products (list): (product_id, mockup_ids, smart_object_uuids, mockup_id,
+                         smart_object_uuid) tuples
+
+    Returns:
+        int: Number of templates written
+    """
+    if not products:
+        return 0
+
+    product_ids = [product[0] for product in products]
+    placeholders = ", ".join(["%s"] * len(product_ids))
+    cursor.execute(f"DELETE FROM product_template WHERE product_id IN ({placeholders})", tuple(product_ids))
+
+    rows = []
+    for product_id, mockup_ids, smart_object_uuids, mockup_id, smart_object_uuid in products:
+        for position, (template_id, object_uuid) in enumerate(
+            template_records(mockup_ids, smart_object_uuids, mockup_id, smart_object_uuid)
+        ):
+            rows.append((product_id, position, template_id[:100], object_uuid))
+
+    if rows:
+        cursor.executemany(
+            "INSERT INTO product_template (product_id, position, mockup_uuid, smart_object_uuid) "
+            "VALUES (%s, %s, %s, %s)",
+            rows
+        )
+    return len(rows)
@@ -0,0 +1,410 @@
+import json
+import numpy as np
+import pandas as pd
+from utils.color_utils import hex_to_color_name
+
+def _parse_json_value(value, prefixes):
+    """Parse a single JSON cell, returning None when it is empty or not JSON"""
+    if isinstance(value, (dict, list)):
+        return value
+    if not isinstance(value, str) or not value.startswith(prefixes):
+        return None
+    try:
+        return json.loads(value)
+    except ValueError:
+        return None
+
+def parse_json_column(series, prefixes=('[', '{')):
+    """
+    Parse a column of JSON strings, decoding each distinct value only once
+
+    Args:
+        series (Series): Column of JSON strings (already-decoded dicts/lists are kept)
+        prefixes (tuple): Leading characters that mark a value as JSON
+
+    Returns:
+        Series: Decoded values, None where the cell is empty, not JSON or invalid
+    """
+    cache = {}
+
+    def parse(value):
+        if isinstance(value, str):
+            if value not in cache:
+                cache[value] = _parse_json_value(value, prefixes)
+            return cache[value]
+        return _parse_json_value(value, prefixes)
+
+    return series.map(parse)
+
+def color_names(series):
+    """
+    Convert a column of hex codes to friendly color names
+
+    Args:
+        series (Series): Hex color codes
+
+    Returns:
+        Series: Color names (hex_to_color_name is called once per distinct code)
+    """
+    unique_codes = pd.unique(series.dropna())
+    names = {code: hex_to_color_name(code) for code in unique_codes}
+    return series.map(names)
+
+def _is_present(series):
+    """Mask of cells that are neither missing nor empty"""
+    return series.notna() & (series.astype(str) != '')
+
+def _to_list(value, named_items):
+    """Turn one size/color cell into a list of strings"""
+    if value is None or (not isinstance(value, (list, dict)) and pd.isna(value)) or not value:
+        return []
+    if isinstance(value, str) and value.startswith(('[', '{')):
+        try:
+            data = json.loads(value)
+        except ValueError:
+            return [value]
+        if isinstance(data, list):
+            if named_items and all(isinstance(item, dict) and 'name' in item for item in data):
+                return [item['name'] for item in data]
+            return [str(item).strip('"\'') for item in data]
+        return [str(data)]
+    return [str(value)]
+
+def parse_list_column(series, named_items=False):
+    """
+    Parse a size or color column into lists of values
+
+    JSON arrays are decoded (using each item's 'name' when `named_items` is set and
+    every item has one), plain values become a one-item list and empty cells an
+    empty list. Each distinct value is parsed once.
+
+    Args:
+        series (Series): Column of JSON arrays or plain values
+        named_items (bool): Use the 'name' key of dict items
+
+    Returns:
+        Series: Lists of strings
+    """
+    cache = {}
+
+    def parse(value):
+        if isinstance(value, str):
+            if value not in cache:
+                cache[value] = _to_list(value, named_items)
+            return cache[value]
+        return _to_list(value, named_items)
+
+    return series.map(parse)
+
+def expand_mockups_by_color(df, mask=None, column='mockup_urls'):
+    """
+    Give every mockup color its own row
+
+    Rows whose mockup column holds a {color: url} object are exploded into one
+    row per color with image_url, colour, color and original_hex set. Rows
+    holding a list of URLs take the first URL as image_url. All other rows are
+    returned unchanged. Row order is preserved.
+
+    Args:
+        df (DataFrame): Products to expand
+        mask (Series, optional): Only expand rows where this is True
+        column (str): Column holding the mockup JSON
+
+    Returns:
+        DataFrame: Expanded rows with a fresh RangeIndex
+    """
+    if df.empty or column not in df.columns:
+        return df.reset_index(drop=True)
+
+    parsed = parse_json_column(df[column])
+    if mask is not None:
+        parsed = parsed.where(mask, None)
+
+    out = df.copy()
+
+    first_url = parsed.map(lambda data: data[0] if isinstance(data, list) and data else None)
+    has_list = first_url.notna()
+    if has_list.any():
+        out.loc[has_list, 'image_url'] = first_url[has_list]
+
+    out['_mockup_item'] = parsed.map(lambda data: list(data.items()) if isinstance(data, dict) and data else None)
+    out = out.explode('_mockup_item', ignore_index=True)
+
+    exploded = out['_mockup_item'].notna()
+    if exploded.any():
+        items = out.loc[exploded, '_mockup_item']
+        codes = items.str[0]
+        names = color_names(codes)
+        out.loc[exploded, 'image_url'] = items.str[1]
+        out.loc[exploded, 'colour'] = names
+        out.loc[exploded, 'color'] = names
+        out.loc[exploded, 'original_hex'] = codes.where(~codes.str.startswith('#'), codes.str.replace('#', '', regex=False))
+
+    return out.drop(columns=['_mockup_item'])
+
+def _explode_values(df, values, column):
+    """Explode `values` (lists) into `column`, keeping rows with an empty list unchanged"""
+    out = df.assign(**{column: values}).explode(column, ignore_index=True)
+    return out
+
+def _has_mockups(df):
+    """Generated products that carry mockup JSON"""
+    if 'mockup_urls' not in df.columns or 'product_type' not in df.columns:
+        return pd.Series(False, index=df.index)
+    return (df['product_type'] == 'Generated') & _is_present(df['mockup_urls'])
+
+def order_parents_and_children(parents, children):
+    """
+    Order export rows as each parent followed by its children
+
+    Children are matched to the first parent whose item_sku equals their
+    parent_sku and sorted by item_sku; a parent with children takes the
+    product name of its first child. Unmatched children come last, also
+    sorted by item_sku.
+
+    Args:
+        parents (DataFrame): Parent rows in display order
+        children (DataFrame): Child rows in display order
+
+    Returns:
+        DataFrame: Combined rows with a fresh RangeIndex
+    """
+    parents = parents.reset_index(drop=True)
+    children = children.reset_index(drop=True)
+
+    if not children.empty:
+        child_skus = children['item_sku'].fillna('').astype(str) if 'item_sku' in children.columns else pd.Series('', index=children.index)
+        children = children.iloc[np.argsort(child_skus.to_numpy(), kind='stable')].reset_index(drop=True)
+
+    parent_rank = pd.Series(np.arange(len(parents)), index=parents.index)
+    child_rank = pd.Series(float(len(parents)), index=children.index)
+
+    if not parents.empty and not children.empty:
+        parent_skus = parents['item_sku'] if 'item_sku' in parents.columns else pd.Series('', index=parents.index)
+        child_parent_skus = children['parent_sku'] if 'parent_sku' in children.columns else pd.Series('', index=children.index)
+
+        first_parent = parent_skus.notna() & ~parent_skus.duplicated()
+        rank_by_sku = pd.Series(parent_rank[first_parent].to_numpy(), index=parent_skus[first_parent].to_numpy())
+        child_rank = child_parent_skus.map(rank_by_sku).fillna(float(len(parents)))
+
+        # A parent with children takes the product name of its first child
+        matched = child_rank < len(parents)
+        if matched.any() and 'product_name' in children.columns:
+            first_children = children.loc[matched, ['product_name']].assign(_rank=child_rank[matched].astype(int))
+            first_children = first_children.drop_duplicates('_rank')
+            parents.loc[first_children['_rank'].to_numpy(), 'product_name'] = first_children['product_name'].to_numpy()
+
+    combined = pd.concat([
+        parents.assign(_rank=parent_rank.astype(float), _kind=0),
+        children.assign(_rank=child_rank, _kind=1)
+    ], ignore_index=True)
+    combined = combined.sort_values(['_rank', '_kind'], kind='stable')
+    return combined.drop(columns=['_rank', '_kind']).reset_index(drop=True)
+
+def expand_variants(df):
+    """
+    Expand products into one export row per size/color variant
+
+    Parent rows have size and color cleared (generated parents still get one row
+    per mockup color). Child rows are exploded across their sizes; generated
+    children are then split per mockup color, other children across their colors.
+    The result is ordered with order_parents_and_children.
+
+    Args:
+        df (DataFrame): Regular and generated products (with a product_type column)
+
+    Returns:
+        DataFrame: One row per variant
+    """
+    if df.empty:
+        return df.copy()
+
+    df = df.reset_index(drop=True)
+    is_parent = df['parent_child'] == 'Parent' if 'parent_child' in df.columns else pd.Series(False, index=df.index)
+    has_mockups = _has_mockups(df)
+
+    parents = df[is_parent].copy()
+    parents['size'] = ''
+    parents['colour'] = ''
+    parents['color'] = ''
+    parents = expand_mockups_by_color(parents, mask=has_mockups[is_parent])
+
+    children = df[~is_parent].copy()
+    children['_row'] = np.arange(len(children))
+    sizes = parse_list_column(children['size'], named_items=True) if 'size' in children.columns else pd.Series([[]] * len(children), index=children.index)
+    if 'colour' in children.columns:
+        color_source = children['colour'].where(children['colour'].notna(), children.get('color'))
+    else:
+        color_source = children.get('color', pd.Series(None, index=children.index))
+    colors = parse_list_column(color_source)
+    child_mockups = has_mockups[~is_parent]
+
+    # Generated children with mockups: one row per size, then one per mockup color
+    generated = _explode_values(children[child_mockups], sizes[child_mockups], '_size')
+    has_size = generated['_size'].notna()
+    generated.loc[has_size, 'size'] = generated.loc[has_size, '_size']
+    generated = expand_mockups_by_color(generated.drop(columns=['_size']))
+
+    # Other children: the cross product of their sizes and colors
+    others = children[~child_mockups].assign(_color=colors[~child_mockups])
+    others = _explode_values(others, sizes[~child_mockups], '_size').explode('_color', ignore_index=True)
+    has_size = others['_size'].notna()
+    has_color = others['_color'].notna()
+    others.loc[has_size, 'size'] = others.loc[has_size, '_size']
+    others.loc[has_color, 'colour'] = others.loc[has_color, '_color']
+    others.loc[has_color, 'color'] = others.loc[has_color, '_color']
+    others = others.drop(columns=['_size', '_color'])
+
+    children = pd.concat([generated, others], ignore_index=True)
+    children = children.sort_values('_row', kind='stable').drop(columns=['_row'])
+
+    return order_parents_and_children(parents, children)
+
+def expand_display_variants(df):
+    """
+    Expand generated products into the rows shown in the Product List
+
+    Products with {color: urls} mockups get one row per color (current_color,
+    color_name, current_mockup_url) and, when their size is a JSON list, one row
+    per size (current_size). Products with a list of mockups get one row per URL
+    (current_mockup_url, mockup_variant). Other rows are unchanged.
+
+    Args:
+        df (DataFrame): Generated products
+
+    Returns:
+        DataFrame: Display rows with a fresh RangeIndex
+    """
+    if df.empty:
+        return df.reset_index(drop=True)
+
+    out = df.reset_index(drop=True)
+    parsed = parse_json_column(out['mockup_urls']) if 'mockup_urls' in out.columns else pd.Series(None, index=out.index)
+    parsed = parsed.where(_has_mockups(out), None)
+
+    out['_mockup_item'] = parsed.map(
+        lambda data: list(data.items()) if isinstance(data, dict) and data
+        else [(None, url) for url in data] if isinstance(data, list) and data
+        else None
+    )
+    out['_is_list'] = parsed.map(lambda data: isinstance(data, list))
+    out['_variant'] = out['_mockup_item'].map(lambda items: list(range(1, len(items) + 1)) if items else None)
+    out = out.explode(['_mockup_item', '_variant'], ignore_index=True)
+
+    by_color = out['_mockup_item'].notna() & ~out['_is_list']
+    by_list = out['_mockup_item'].notna() & out['_is_list']
+
+    if by_list.any():
+        out.loc[by_list, 'current_mockup_url'] = out.loc[by_list, '_mockup_item'].str[1]
+        out.loc[by_list, 'mockup_variant'] = out.loc[by_list, '_variant']
+
+    if by_color.any():
+        items = out.loc[by_color, '_mockup_item']
+        current_colors = '#' + items.str[0].str.lstrip('#')
+        urls = items.str[1].map(lambda urls: (urls.split(',')[0].strip() if isinstance(urls, str) else urls))
+        out.loc[by_color, 'current_color'] = current_colors
+        out.loc[by_color, 'color_name'] = color_names(current_colors)
+        out.loc[by_color, 'current_mockup_url'] = urls
+
+        sizes = parse_json_column(out['size']) if 'size' in out.columns else pd.Series(None, index=out.index)
+        sizes = sizes.map(lambda data: [item['name'] if isinstance(item, dict) and 'name' in item else item for item in data] if isinstance(data, list) and data else None)
+        out['_size'] = sizes.where(by_color, None)
+        out = out.explode('_size', ignore_index=True)
+        has_size = out['_size'].notna()
+        out.loc[has_size, 'current_size'] = out.loc[has_size, '_size']
+        out = out.drop(columns=['_size'])
+
+    return out.drop(columns=['_mockup_item', '_is_list', '_variant'])
+
+def first_mockup_urls(mockup_urls):
+    """
+    Pick the first mockup URL of each product
+
+    Args:
+        mockup_urls (Series): Mockup JSON per product
+
+    Returns:
+        Series: First URL of the first color (or of the list), the raw value when it
+                is not JSON, and '' when it is empty or cannot be parsed
+    """
+    parsed = parse_json_column(mockup_urls)
+
+    def first(raw, data):
+        if data is None:
+            if isinstance(raw, str) and raw.startswith(('[', '{')):
+                return ''
+            return raw if isinstance(raw, str) and raw else ''
+        if isinstance(data, dict) and data:
+            urls = next(iter(data.values()))
+            url_list = [url.strip() for url in urls.split(',')] if isinstance(urls, str) else [urls]
+            return url_list[0] if url_list else ''
+        if isinstance(data, list) and data:
+            return data[0]
+        return raw
+
+    return pd.Series([first(raw, data) for raw, data in zip(mockup_urls, parsed)], index=mockup_urls.index, dtype=object)
+
+def match_mockup_urls(colors, mockup_urls):
+    """
+    Find the mockup URL that belongs to each row's color
+
+    A row's color is looked up among the keys of its {color: url} mockups, trying
+    in order an exact key, the key with/without '#', a case-insensitive match and
+    finally the friendly color name of each key.
+
+    Args:
+        colors (Series): Color of each row (hex code or color name)
+        mockup_urls (Series): Mockup JSON of each row, aligned with `colors`
+
+    Returns:
+        Series: Matched URL per row, NaN where nothing matched
+    """
+    result = pd.Series(np.nan, index=colors.index, dtype=object)
+    parsed = parse_json_column(mockup_urls)
+    valid = parsed.map(lambda data: isinstance(data, dict) and bool(data)) & _is_present(colors)
+    if not valid.any():
+        return result
+
+    pairs = pd.DataFrame({
+        '_pos': np.flatnonzero(valid.to_numpy()),
+        'color': colors[valid].astype(str).to_numpy(),
+        'items': parsed[valid].map(lambda data: list(data.items())).to_numpy()
+    })
+    pairs['_order'] = pairs['items'].map(lambda items: list(range(len(items))))
+    pairs = pairs.explode(['items', '_order'], ignore_index=True)
+    keys = pairs['items'].str[0].astype(str)
+    color = pairs['color']
+
+    priority = np.select(
+        [
+            keys == color,
+            ~color.str.startswith('#') & (keys == '#' + color),
+            color.str.startswith('#') & (keys == color.str.replace('#', '', regex=False)),
+            keys.str.lower().str.replace('#', '', regex=False) == color.str.lower().str.replace('#', '', regex=False),
+            color_names(keys).str.lower() == color.str.lower(),
+        ],
+        [0, 1, 2, 3, 4],
+        default=5
+    )
+    pairs['_priority'] = priority
+    best = pairs[pairs['_priority'] < 5].sort_values(['_pos', '_priority', '_order'], kind='stable').drop_duplicates('_pos')
+
+    result.iloc[best['_pos'].to_numpy()] = best['items'].str[1].to_numpy()
+    return result
+
+def marketplace_titles(df):
+    """
+    Build "name - size - color" marketplace titles from the available parts
+
+    Args:
+        df (DataFrame): Rows with product_name, size and color columns
+
+    Returns:
+        Series: Titles joined with ' - ', skipping empty parts
+    """
+    parts = [
+        df[column].where(df[column].notna(), '').astype(str) if column in df.columns else pd.Series('', index=df.index)
+        for column in ('product_name', 'size', 'color')
+    ]
+    titles = [' - '.join(part for part in row if part) for row in zip(*parts)]
+    return pd.Series(titles, index=df.index, dtype=object)